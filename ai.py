@@ -1,196 +1,190 @@
+import os
 import random
-import time
-import copy
+import sys
 import multiprocessing
-from typing import Dict, List, Tuple, Optional, Any
-import pickle
-import os
-
-
-# Simple transposition table implementation
-class SimpleTranspositionTable:
-    def __init__(self, size_mb: int = 64):
-        self.size = (size_mb * 1024 * 1024) // 24  # Estimate entry size
-        self.table: Dict[int, Tuple[int, int, str, Any]] = {}
-        self.hits = 0
-        self.stores = 0
-
-    def save_to_file(self, filename="assets/transposition_table/tt.pkl"):
-        with open(filename, "wb") as f:
-            pickle.dump(self.table, f)
-
-    def lookup(self, key: int, depth: int) -> Optional[Tuple[int, str, Any]]:
-        if key in self.table:
-            stored_score, stored_depth, stored_flag, stored_move = self.table[key]
-            if stored_depth >= depth:
-                self.hits += 1
-                return stored_score, stored_flag, stored_move
-        return None
-
-    def store(self, key: int, score: int, depth: int, flag: str, best_move: Any = None):
-        if len(self.table) >= self.size:
-            # Simple replacement: remove random entry
-            key_to_remove = random.choice(list(self.table.keys()))
-            del self.table[key_to_remove]
-
-        self.table[key] = (score, depth, flag, best_move)
-        self.stores += 1
-
-    def load_from_file(self, filename="assets/transposition_table/tt.pkl"):
-        if os.path.exists(filename) and os.path.getsize(filename) > 0:
-            with open(filename, "rb") as f:
-                self.table = pickle.load(f)
-        else:
-            self.table = {}  # Start fresh
-
-    def clear(self):
-        self.table.clear()
-        self.hits = 0
-        self.stores = 0
-
-
-# Simple position hashing
-def simple_position_hash(gs) -> int:
-    """Create a simple hash of the board position."""
-    hash_value = 0
-    for row in range(8):
-        for col in range(8):
-            piece = gs.board[row][col]
-            if piece != "--":
-                # Simple hash combining piece type, color, and position
-                piece_hash = hash(piece) ^ hash((row, col))
-                hash_value ^= piece_hash
-
-    # Include turn to move
-    hash_value ^= hash(gs.white_to_move)
-    return hash_value
-
-
-# Global instances
-tt = SimpleTranspositionTable(64)  # 64MB transposition table
-tt.load_from_file()
-
-piece_score = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'p': 1}
-
-white_knight_scores = [[-50, -40, -30, -30, -30, -30, -40, -50],
-                       [-40, -20, 0, 0, 0, 0, -20, -40],
-                       [-30, 0, 10, 15, 15, 10, 0, -30],
-                       [-30, 5, 15, 20, 20, 15, 5, -30],
-                       [-30, 0, 15, 20, 20, 15, 0, -30],
-                       [-30, 5, 10, 15, 15, 10, 5, -30],
-                       [-40, -20, 0, 5, 5, 0, -20, -40],
-                       [-50, -40, -30, -30, -30, -30, -40, -50]]
-
-black_knight_scores = [[-50, -40, -30, -30, -30, -30, -40, -50],
-                       [-40, -20, 0, 5, 5, 0, -20, -40],
-                       [-30, 5, 10, 15, 15, 10, 5, -30],
-                       [-30, 0, 15, 20, 20, 15, 0, -30],
-                       [-30, 5, 15, 20, 20, 15, 5, -30],
-                       [-30, 0, 10, 15, 15, 10, 0, -30],
-                       [-40, -20, 0, 0, 0, 0, -20, -40],
-                       [-50, -40, -30, -30, -30, -30, -40, -50]]
-
-white_bishop_scores = [[-20, -10, -10, -10, -10, -10, -10, -20],
-                       [-10, 0, 0, 0, 0, 0, 0, -10],
-                       [-10, 0, 5, 10, 10, 5, 0, -10],
-                       [-10, 5, 5, 10, 10, 5, 5, -10],
-                       [-10, 0, 10, 10, 10, 10, 0, -10],
-                       [-10, 10, 10, 10, 10, 10, 10, -10],
-                       [-10, 5, 0, 0, 0, 0, 5, -10],
-                       [-20, -10, -10, -10, -10, -10, -10, -20]]
-
-black_bishop_scores = [[-20, -10, -10, -10, -10, -10, -10, -20],
-                       [-10, 5, 0, 0, 0, 0, 5, -10],
-                       [-10, 10, 10, 10, 10, 10, 10, -10],
-                       [-10, 0, 10, 10, 10, 10, 0, -10],
-                       [-10, 5, 5, 10, 10, 5, 5, -10],
-                       [-10, 0, 5, 10, 10, 5, 0, -10],
-                       [-10, 0, 0, 0, 0, 0, 0, -10],
-                       [-20, -10, -10, -10, -10, -10, -10, -20]]
-
-white_queen_scores = [[-20, -10, -10, -5, -5, -10, -10, -20],
-                      [-10, 0, 0, 0, 0, 0, 0, -10],
-                      [-10, 0, 5, 5, 5, 5, 0, -10],
-                      [-5, 0, 5, 5, 5, 5, 0, -5],
-                      [0, 0, 5, 5, 5, 5, 0, -5],
-                      [-10, 5, 5, 5, 5, 5, 0, -10],
-                      [-10, 0, 5, 0, 0, 0, 0, -10],
-                      [-20, -10, -10, -5, -5, -10, -10, -20]]
-
-black_queen_scores = [[-20, -10, -10, -5, -5, -10, -10, -20],
-                      [-10, 0, 5, 0, 0, 0, 0, -10],
-                      [-10, 5, 5, 5, 5, 5, 0, -10],
-                      [0, 0, 5, 5, 5, 5, 0, -5],
-                      [-5, 0, 5, 5, 5, 5, 0, -5],
-                      [-10, 0, 5, 5, 5, 5, 0, -10],
-                      [-10, 0, 0, 0, 0, 0, 0, -10],
-                      [-20, -10, -10, -5, -5, -10, -10, -20]]
-
-black_rook_scores = [[0, 0, 0, 5, 5, 0, 0, 0],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [5, 10, 10, 10, 10, 10, 10, 5],
-                     [0, 0, 0, 0, 0, 0, 0, 0]]
-
-white_rook_scores = [[0, 0, 0, 0, 0, 0, 0, 0],
-                     [5, 10, 10, 10, 10, 10, 10, 5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [-5, 0, 0, 0, 0, 0, 0, -5],
-                     [0, 0, 0, 5, 5, 0, 0, 0]]
-
-white_pawn_scores = [[0, 0, 0, 0, 0, 0, 0, 0],
-                     [50, 50, 50, 50, 50, 50, 50, 50],
-                     [10, 10, 20, 30, 30, 20, 10, 10],
-                     [5, 5, 10, 25, 25, 10, 5, 5],
-                     [0, 0, 0, 20, 20, 0, 0, 0],
-                     [5, -5, -10, 0, 0, -10, -5, 5],
-                     [5, 10, 10, -20, -20, 10, 10, 5],
-                     [0, 0, 0, 0, 0, 0, 0, 0]]
-
-black_pawn_scores = [[0, 0, 0, 0, 0, 0, 0, 0],
-                     [5, 10, 10, -20, -20, 10, 10, 5],
-                     [5, -5, -10, 0, 0, -10, -5, 5],
-                     [0, 0, 0, 20, 20, 0, 0, 0],
-                     [5, 5, 10, 25, 25, 10, 5, 5],
-                     [10, 10, 20, 30, 30, 20, 10, 10],
-                     [50, 50, 50, 50, 50, 50, 50, 50],
-                     [0, 0, 0, 0, 0, 0, 0, 0]]
-
-piece_position_scores = {
-    "w": {"p": white_pawn_scores, "N": white_knight_scores, "B": white_bishop_scores,
-          "R": white_rook_scores, "Q": white_queen_scores},
-    "b": {"p": black_pawn_scores, "N": black_knight_scores, "B": black_bishop_scores,
-          "R": black_rook_scores, "Q": black_queen_scores}
-}
+from typing import List, Optional, Any
+
+import engine
+from move import Move, SHORT_MASK, TACTICAL_MASK
+from move_picker import MovePicker, QUIETS, STAGE_NAMES, capture_score
+from transposition_table import TranspositionTable, PersistentTranspositionTable, SharedTranspositionTable
+from time_manager import SearchLimits, TimeManager
+from book import OpeningBook, BOOK_FILE
+from bitbase import Bitbases, open_bitbases
+
+TT_FILE = "assets/transposition_table/tt.bin"
+TT_SIZE_MB = 64
+TT_CHECKPOINT_SECONDS = 30.0  # None to only checkpoint at the end of a search
+
+
+def open_transposition_table(filename: Optional[str] = TT_FILE, size_mb: int = TT_SIZE_MB) -> TranspositionTable:
+    """Map the persistent table, falling back to an in-memory one if the file can't be used."""
+    if filename:
+        try:
+            return PersistentTranspositionTable(filename, size_mb, checkpoint_interval=TT_CHECKPOINT_SECONDS)
+        except (OSError, ValueError) as e:
+            print(f"Persistent transposition table unavailable ({e}), using an in-memory table")
+    return TranspositionTable(size_mb)
+
+
+def open_book(filename: Optional[str] = BOOK_FILE) -> Optional[OpeningBook]:
+    """Map the opening book, or None if there is none (build one with book.py) or it can't be used."""
+    if filename and os.path.exists(filename):
+        try:
+            return OpeningBook(filename)
+        except (OSError, ValueError) as e:
+            print(f"Opening book unavailable ({e})")
+    return None
+
+
+# Global instances, opened on first use (see shared_table) so importing ai touches no files. Assign
+# one before then to use something else, as the benchmarks do with an in-memory table.
+tt = None
+book = None
+bitbases = None  # Endgame tables generated by bitbase.py, if any
+_book_opened = False
+
+
+def shared_table() -> TranspositionTable:
+    """The module's transposition table, mapped from TT_FILE the first time it is needed."""
+    global tt
+    if tt is None:
+        tt = open_transposition_table()
+    return tt
+
+
+def shared_book() -> Optional[OpeningBook]:
+    """The module's opening book (None without one), opened the first time it is needed."""
+    global book, _book_opened
+    if book is None and not _book_opened:
+        book = open_book()
+    _book_opened = True
+    return book
+
+
+def shared_bitbases() -> Bitbases:
+    """The module's bitbases, loaded the first time they are needed."""
+    global bitbases
+    if bitbases is None:
+        bitbases = open_bitbases()
+    return bitbases
 
 # Global variables
 next_move = None
 counter = 0
-find_book_move = False  # Disabled for now
+find_book_move = True  # Play book moves instantly while the position is in book
 
 CHECKMATE = 100000
 STALEMATE = 0
-DEPTH = 4
+DEPTH = 6
+MAX_PLY = 64
+HISTORY_LIMIT = 1 << 20  # History scores are halved once one reaches this, so old cutoffs fade
+
+# Null-move pruning: the opponent moves twice and the position is searched this much shallower
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+# Late move reductions: quiet moves this far down the order, at this depth or more, are searched shallower
+LMR_MIN_MOVES = 3
+LMR_MIN_DEPTH = 3
+# Aspiration windows: from this depth on, search within this many centipawns of the last score first,
+# widening the failed side by ASPIRATION_GROWTH each time the score falls outside
+ASPIRATION_MIN_DEPTH = 3
+ASPIRATION_WINDOW = 50
+ASPIRATION_GROWTH = 4
+CHECK_INTERVAL = 256  # Nodes between checks of the clock, node limit and stop flags
+BITBASE_WIN = CHECKMATE - 2000  # A bitbase win without a distance to mate, kept below the mate scores
+MATE_BOUND = CHECKMATE - 1000  # Scores beyond this are mates, counted in plies from the root
+
+
+def score_to_table(score: int, ply: int) -> int:
+    """A search score as stored in the table: mates counted from the node ply plies below the root rather
+    than from the root, so the entry is right for any search that reaches the position."""
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score: int, ply: int) -> int:
+    """The inverse of score_to_table for a node ply plies below the current root."""
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
 
 
 class ChessAI:
     """Chess AI Engine with optimizations for higher depth search."""
 
-    def __init__(self, depth: int = 4, time_limit: float = 30.0):
-        self.depth = depth
+    def __init__(self, depth: int = DEPTH, time_limit: float = 30.0, backend: Optional[str] = None,
+                 null_move: bool = True, late_move_reductions: bool = True, pvs: bool = True, workers: int = 1,
+                 table: Optional[TranspositionTable] = None, book: Optional[OpeningBook] = None,
+                 bitbases: Optional[Bitbases] = None):
+        self.depth = depth  # Limits of a get_best_move call that doesn't pass SearchLimits
         self.time_limit = time_limit
+        self.book = book  # Override the module's book and bitbases
+        self.bitbases = bitbases if bitbases is not None else shared_bitbases()
+        self.backend = backend  # Move generation backend to search with (None: whatever gs uses)
         self.nodes_searched = 0
-        self.start_time = 0
-
-    def get_best_move(self, gs, use_iterative_deepening: bool = True) -> Any:
-        """Get the best move for the current position."""
-        global tt, counter, next_move
+        self.next_check = CHECK_INTERVAL
+        self.time_manager = TimeManager(SearchLimits(), True)  # Unlimited until get_best_move sets the limits
+        self.stopped = False  # Abort flag: the search unwinds and its unfinished iteration is discarded
+        self.completed_depth = 0  # Deepest iteration the last search finished, and its score
+        self.best_score = 0
+
+        # Lazy SMP: with workers > 1, workers - 1 helper processes search the same root at the same
+        # time, sharing a table in shared memory (see _start_helpers). table overrides the module's tt.
+        self.workers = workers
+        self.table = table
+        self.tt = table if table is not None else shared_table()
+        self.helper_id = 0  # 0 in the main process; helpers vary their depths and root order by it
+        self.stop_event = None  # Set by the main process to stop a helper, or by the GUI to cancel a search
+
+        # Pondering: searching the predicted position on the opponent's time, without a time limit until
+        # ponder_hit is set (the opponent played the predicted move). The deadlines then count from the start
+        # of the ponder search, so the time already spent is credited to it.
+        self.pondering = False
+        self.ponder_hit = None
+        self.helpers = []
+        self.helper_nodes = 0  # Nodes searched by the helpers during the last search
+        self.on_iteration = None  # Called as on_iteration(depth, score, seconds) after each completed iteration
+
+        # Triangular PV table: row ply holds the best line found from ply on, the last completed
+        # iteration's line is pv_line. root_nodes counts the nodes below each root move (by packed move).
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        self.pv_line = []
+        self.root_nodes = {}
+
+        # Selective search features, switchable to measure what each one saves
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.pvs = pvs  # Null window searches after the first move, at the root and interior nodes
+
+        # Quiet move ordering: two killer slots per ply, butterfly history per side (indexed by the
+        # from/to bits of a packed move), and the quiet reply that refuted each previous move
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+        self.counter_moves = [0] * 4096
+
+        # Move ordering statistics: how often, and by which picker stage, beta cutoffs happen
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stage_cutoffs = [0] * len(STAGE_NAMES)
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.aspiration_researches = 0
+        self.bitbase_hits = 0
+
+    def get_best_move(self, gs, use_iterative_deepening: bool = True, limits: Optional[SearchLimits] = None) -> Any:
+        """Get the best move for the current position, within limits (default: self.depth and self.time_limit)."""
+        global counter, next_move
+
+        if limits is None:
+            limits = SearchLimits(depth=self.depth, movetime=self.time_limit)
+        self.time_manager = TimeManager(limits, gs.white_to_move)
 
         valid_moves = gs.get_valid_moves()
         if not valid_moves:
@@ -200,41 +194,203 @@ class ChessAI:
         counter = 0
         next_move = None
         self.nodes_searched = 0
+        self.next_check = CHECK_INTERVAL
+        self.new_search()
 
         if len(valid_moves) == 1:
             print("Only one legal move available")
             return valid_moves[0]
 
+        opening_book = self.book if self.book is not None or not find_book_move else shared_book()
+        if find_book_move and opening_book is not None:
+            code = opening_book.pick_move(gs)
+            if code:
+                print(f"Book move {Move.from_code(code).get_chess_notation()}")
+                return next(move for move in valid_moves if move.code == code)
+
+        search_gs, search_moves = gs, valid_moves
+        if self.backend is not None and gs.backend != self.backend:
+            # Search a copy of the position on the requested backend, then map the result back onto gs
+            search_gs = engine.new_game_state(gs.get_fen(), self.backend)
+            search_moves = search_gs.get_valid_moves()
+
+        if self.workers > 1 and not self.helpers:
+            self._start_helpers()
+        self.tt = self.table if self.table is not None else shared_table()
+        self.tt.new_search()
+        for jobs, _ in self.helpers:
+            jobs.put((search_gs.get_fen(), search_gs.backend, limits,
+                      (self.null_move, self.late_move_reductions, self.pvs)))
+
         if use_iterative_deepening:
-            return self._iterative_deepening_search(gs, valid_moves)
+            best_move = self._iterative_deepening_search(search_gs, search_moves)
         else:
-            return self._fixed_depth_search(gs, valid_moves)
+            best_move = self._fixed_depth_search(search_gs, search_moves)
+
+        if self.helpers:
+            best_move = self._collect_helper_results(search_moves, best_move)
+        self.tt.end_search()
+        if best_move is not None and search_gs is not gs:
+            notation = best_move.get_chess_notation()
+            best_move = next(move for move in valid_moves if move.get_chess_notation() == notation)
+        return best_move
+
+    def _start_helpers(self):
+        """Start the helper processes, which are kept for later searches, on the shared table passed in or a
+        new one."""
+        if not isinstance(self.table, SharedTranspositionTable):
+            self.table = SharedTranspositionTable(TT_SIZE_MB)
+        self.results = multiprocessing.Queue()
+        self.helper_stop = multiprocessing.Event()
+        for helper_id in range(1, self.workers):
+            jobs = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_lazy_smp_helper, daemon=True,
+                                              args=(helper_id, self.table, jobs, self.results, self.helper_stop))
+            process.start()
+            self.helpers.append((jobs, process))
+
+    def _collect_helper_results(self, search_moves, best_move):
+        """Stop the helpers and return the best move of the deepest iteration any process completed."""
+        self.helper_stop.set()
+        best_depth = self.completed_depth
+        self.helper_nodes = 0
+        for _ in self.helpers:
+            helper_id, depth, code, score, nodes = self.results.get()
+            self.helper_nodes += nodes
+            if depth > best_depth and code:
+                helper_move = next((move for move in search_moves if move.code == code), None)
+                if helper_move is not None:
+                    print(f"Helper {helper_id} reached depth {depth}: {helper_move} ({score})")
+                    best_depth, best_move = depth, helper_move
+                    self.completed_depth, self.best_score = depth, score
+        self.helper_stop.clear()
+        return best_move
+
+    def close(self):
+        """Stop the helper processes and free the shared table (parallel search only)."""
+        for jobs, _ in self.helpers:
+            jobs.put(None)
+        for _, process in self.helpers:
+            process.join()
+        self.helpers = []
+        if isinstance(self.table, SharedTranspositionTable) and self.table.owner:
+            self.table.close()
+            self.table = None
+
+    def new_search(self):
+        """Reset per-search ordering state; history is kept but decayed so it adapts to the new position."""
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.counter_moves = [0] * 4096
+        for table in self.history:
+            for i in range(4096):
+                table[i] >>= 1
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stage_cutoffs = [0] * len(STAGE_NAMES)
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.aspiration_researches = 0
+        self.bitbase_hits = 0
+        self.stopped = False
+        self.completed_depth = 0
+        self.pv_line = []
+        self.root_nodes = {}
+
+    def ordering_stats(self) -> dict:
+        """Beta cutoff counts, the share that came from the first move tried, and cutoffs per picker stage."""
+        return {"cutoffs": self.cutoffs, "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+                "stage_cutoffs": dict(zip(STAGE_NAMES, self.stage_cutoffs))}
+
+    def pruning_stats(self) -> dict:
+        """Null-move cutoffs, reduced searches, searches repeated at full depth or width, root searches
+        repeated because the score fell outside the aspiration window, and nodes answered by a bitbase."""
+        return {"null_move_cutoffs": self.null_move_cutoffs, "reductions": self.reductions,
+                "re_searches": self.re_searches, "aspiration_researches": self.aspiration_researches,
+                "bitbase_hits": self.bitbase_hits}
+
+    def principal_variation(self) -> List[str]:
+        """The last completed iteration's principal variation in coordinate notation."""
+        return [Move.from_code(move).get_chess_notation() for move in self.pv_line]
 
     def _iterative_deepening_search(self, gs, valid_moves) -> Any:
-        """Perform iterative deepening with time management."""
+        """Perform iterative deepening with time management.
+
+        Each depth is searched in an aspiration window around the previous score, and the root moves
+        are reordered between depths: the previous best move first, then by the size of their subtrees.
+        The move played is the best move of the last completed depth; one cut short by the time manager
+        or stop() is discarded.
+        """
         global next_move
 
-        self.start_time = time.time()
+        time_manager = self.time_manager
         best_move = None
-
-        for current_depth in range(1, self.depth + 1):
-            print(f"Searching depth {current_depth}...")
-
-            # Check time limit
-            if time.time() - self.start_time > self.time_limit * 0.8:
+        score = 0
+        stable_iterations = 0
+        root_moves = self._order_root_moves(gs, valid_moves)
+
+        # Helpers search slightly differently from the main process so they don't all duplicate its work:
+        # odd helpers one ply deeper, and each starts from a rotated root order
+        depth_offset = self.helper_id % 2
+        if self.helper_id:
+            rotation = self.helper_id % len(root_moves)
+            root_moves = root_moves[rotation:] + root_moves[:rotation]
+
+        max_depth = time_manager.max_depth(MAX_PLY - 1)
+        for current_depth in range(1 + depth_offset, max_depth + 1 + depth_offset):
+            # Another iteration is only worth starting if it is likely to finish
+            if best_move is not None and (self._should_stop() or (
+                    not self.pondering and time_manager.soft_stop(self.nodes_searched, stable_iterations))):
                 print(f"Time limit approaching, stopping at depth {current_depth - 1}")
                 break
+            print(f"Searching depth {current_depth}...")
 
-            # Search at current depth
-            self._search_root(gs, valid_moves, current_depth)
+            delta = ASPIRATION_WINDOW
+            if current_depth >= ASPIRATION_MIN_DEPTH and abs(score) < CHECKMATE - 1000:
+                alpha, beta = max(score - delta, -CHECKMATE), min(score + delta, CHECKMATE)
+            else:
+                alpha, beta = -CHECKMATE, CHECKMATE
+
+            while True:
+                result, move = self._search_root(gs, root_moves, current_depth, alpha, beta)
+                if self.stopped:
+                    break
+                if result <= alpha and alpha > -CHECKMATE:
+                    delta *= ASPIRATION_GROWTH
+                    alpha = max(score - delta, -CHECKMATE)
+                elif result >= beta and beta < CHECKMATE:
+                    delta *= ASPIRATION_GROWTH
+                    beta = min(score + delta, CHECKMATE)
+                else:
+                    break
+                self.aspiration_researches += 1
+                print(f"Score {result} outside the aspiration window, searching ({alpha}, {beta})")
+
+            if self.stopped:
+                if best_move is None:
+                    best_move = move if move is not None else root_moves[0]
+                break
 
-            if next_move:
-                best_move = next_move
-                elapsed = time.time() - self.start_time
-                print(f"Depth {current_depth} completed in {elapsed:.2f}s, nodes: {counter}")
+            stable_iterations = stable_iterations + 1 if move == best_move else 0
+            best_move = move if move is not None else best_move
+            next_move = best_move
+            score = result
+            self.completed_depth, self.best_score = current_depth, score
+            self.pv_line = self.pv_table[0]
+            root_moves.sort(key=lambda root_move: self.root_nodes.get(root_move.code, 0), reverse=True)
+            root_moves.sort(key=lambda root_move: root_move != best_move)  # Stable: best first, then by nodes
+
+            elapsed = time_manager.elapsed()
+            stats = self.ordering_stats()
+            print(f"Depth {current_depth} completed in {elapsed:.2f}s, score: {score}, nodes: {counter}, "
+                  f"first move cutoffs: {stats['first_move_cutoff_rate']:.1%}, "
+                  f"pv: {' '.join(self.principal_variation())}")
+            if self.on_iteration is not None:
+                self.on_iteration(current_depth, score, elapsed)
 
             # If we found a checkmate, no need to search deeper
-            if abs(counter) > CHECKMATE - 1000:
+            if abs(score) > CHECKMATE - 1000:
                 print("Checkmate found, stopping search")
                 break
 
@@ -242,34 +398,33 @@ class ChessAI:
 
     def _fixed_depth_search(self, gs, valid_moves) -> Any:
         """Perform fixed depth search."""
-        self.start_time = time.time()
-        self._search_root(gs, valid_moves, self.depth)
-        return next_move
+        _, best_move = self._search_root(gs, self._order_root_moves(gs, valid_moves), self.depth)
+        self.pv_line = self.pv_table[0]
+        return best_move
 
-    def _search_root(self, gs, valid_moves, depth):
-        """Root search function."""
-        global next_move, counter
+    def _search_root(self, gs, root_moves, depth, alpha: int = -CHECKMATE, beta: int = CHECKMATE):
+        """Search root_moves in order and return (score, best move).
 
-        # Order moves for better pruning
-        ordered_moves = self._order_moves_advanced(gs, valid_moves)
+        Fail-hard like _search: if no move beats alpha the score is alpha and the best move None, and the
+        search stops at the first move that reaches beta.
+        """
+        global counter
 
-        alpha = -CHECKMATE
-        beta = CHECKMATE
         turn_multiplier = 1 if gs.white_to_move else -1
-
-        best_score = -CHECKMATE
+        self.pv_table[0] = []
         best_move = None
 
-        for i, move in enumerate(ordered_moves):
-            # Check time limit periodically
-            if i % 10 == 0 and time.time() - self.start_time > self.time_limit:
+        for i, move in enumerate(root_moves):
+            if self._should_stop():
+                self.stopped = True
                 print("Time limit reached during search")
                 break
 
+            nodes_before = counter
             gs.make_move(move)
 
             # Use full window for first move, then narrow window for others
-            if i == 0:
+            if i == 0 or not self.pvs:
                 score = -self._search(gs, depth - 1, -beta, -alpha, -turn_multiplier)
             else:
                 # Try null window search first
@@ -279,33 +434,89 @@ class ChessAI:
                     score = -self._search(gs, depth - 1, -beta, -alpha, -turn_multiplier)
 
             gs.undo_move()
+            self.root_nodes[move.code] = counter - nodes_before
 
             print(f"Move {move}: {score}")
 
-            if score > best_score:
-                best_score = score
+            if score > alpha and not self.stopped:
+                alpha = score
                 best_move = move
-                next_move = move
-
-                if score > alpha:
-                    alpha = score
-
-    def _search(self, gs, depth: int, alpha: int, beta: int, turn_multiplier: int) -> int:
-        """Main minimax search with optimizations."""
+                self.pv_table[0] = [move.code] + self.pv_table[1]
+                if alpha >= beta:
+                    break
+
+        return alpha, best_move
+
+    def stop(self):
+        """Abort the search in progress (safe to call from another thread); get_best_move then returns the
+        best move of the last completed iteration."""
+        self.stopped = True
+
+    def _should_stop(self) -> bool:
+        """Whether the search must stop now: stopped, or out of time or nodes (never while pondering)."""
+        if self.stopped or (self.stop_event is not None and self.stop_event.is_set()):
+            return True
+        if self.pondering:
+            if self.ponder_hit is None or not self.ponder_hit.is_set():
+                return False
+            self.pondering = False  # Ponder hit: carry on as the real search
+        return self.time_manager.hard_stop(self.nodes_searched)
+
+    def ponder_move(self, gs, best_move) -> int:
+        """The reply the search expects to best_move in gs (packed, 0 if unknown): the principal variation's
+        second move, else the table's move for the position after best_move."""
+        code = best_move if best_move.__class__ is int else best_move.code
+        if len(self.pv_line) >= 2 and self.pv_line[0] == code:
+            return self.pv_line[1]
+        table = self.tt if self.tt is not None else shared_table()
+        gs.make_move(code)
+        stored = table.best_move(gs.zobrist_key)
+        reply = gs.legal_move_from_code(stored) if stored else 0
+        gs.undo_move()
+        return reply
+
+    def _search(self, gs, depth: int, alpha: int, beta: int, turn_multiplier: int, ply: int = 1,
+                allow_null: bool = True) -> int:
+        """Alpha-beta search of gs, ply half-moves below the root.
+
+        Null-move pruning, late move reductions and principal variation search (see __init__) make it
+        selective; allow_null is False right after a null move so two are never made in a row.
+        """
         global counter
         counter += 1
         self.nodes_searched += 1
 
-        # Check time limit
-        if self.nodes_searched % 1000 == 0:
-            if time.time() - self.start_time > self.time_limit:
-                return turn_multiplier * self._evaluate_position(gs)
+        if self.nodes_searched >= self.next_check:
+            self.next_check = self.nodes_searched + CHECK_INTERVAL
+            self.tt.maybe_checkpoint()
+            if self._should_stop():
+                self.stopped = True
+        if self.stopped:
+            return 0  # Unwinding: the unfinished iteration is thrown away, so the score doesn't matter
+
+        pv_table = self.pv_table
+        if ply < MAX_PLY:
+            pv_table[ply] = []
+
+        # Two kings and a queen, rook or pawn: the bitbase knows the result, so nothing below needs searching
+        if gs.piece_count == 3:
+            entry = self.bitbases.probe(gs) if self.bitbases else None
+            if entry is not None:
+                self.bitbase_hits += 1
+                result, distance = entry
+                if result == 0:
+                    return STALEMATE
+                if distance is None:
+                    # Won but no distance stored: the static eval steers towards progress
+                    return result * BITBASE_WIN + turn_multiplier * (gs.material_score + gs.positional_score)
+                return result * (CHECKMATE - ply - distance)
 
         # Transposition table lookup
-        pos_hash = simple_position_hash(gs)
-        tt_entry = tt.lookup(pos_hash, depth)
+        pos_hash = gs.zobrist_key
+        tt_entry = self.tt.lookup(pos_hash, depth)
         if tt_entry:
             score, flag, stored_move = tt_entry
+            score = score_from_table(score, ply)
             if flag == "EXACT":
                 return score
             elif flag == "ALPHA" and score <= alpha:
@@ -317,26 +528,70 @@ class ChessAI:
         if depth == 0:
             return self._quiescence_search(gs, alpha, beta, turn_multiplier)
 
-        # Check for checkmate/stalemate
-        valid_moves = gs.get_valid_moves()
-        if not valid_moves:
-            if gs.checkmate:
-                return -CHECKMATE + (DEPTH - depth)  # Prefer faster mates
-            else:
-                return STALEMATE
+        gs.update_attack_info()
+        in_check = gs.in_check
+
+        # Null move: if passing still leaves us at or above beta, a real move almost certainly would too.
+        # Not in check (passing would be illegal), and not with only pawns left, where zugzwang is common.
+        if self.null_move and allow_null and depth >= NULL_MOVE_MIN_DEPTH and beta - alpha == 1 and \
+                not in_check and beta < CHECKMATE - 1000 and \
+                turn_multiplier * (gs.material_score + gs.positional_score) >= beta and gs.has_non_pawn_material():
+            reduction = NULL_MOVE_REDUCTION + (depth >= 6)
+            gs.make_null_move()
+            score = -self._search(gs, max(depth - 1 - reduction, 0), -beta, -beta + 1, -turn_multiplier,
+                                  ply + 1, False)
+            gs.undo_null_move()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                self.null_move_cutoffs += 1
+                return beta
 
         # Main search
         original_alpha = alpha
         best_move = None
         best_score = -CHECKMATE
 
-        # Order moves
-        ordered_moves = self._order_moves_advanced(gs, valid_moves, tt_entry[2] if tt_entry else None)
-
-        for move in ordered_moves:
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        history = self.history[0 if gs.white_to_move else 1]
+        # make_null_move leaves move_log alone, so right after one (the only time allow_null is False)
+        # its last entry is the move before the pass, which this one isn't a reply to
+        previous = gs.move_log[-1] & 0xFFF if gs.move_log and allow_null else -1
+        counter_move = self.counter_moves[previous] if previous >= 0 else 0
+
+        # Along the previous iteration's principal variation its next move is tried first, even if the
+        # table entry that held it has been overwritten
+        hash_move = self.tt.best_move(pos_hash)
+        pv_line = self.pv_line
+        if ply < len(pv_line) and gs.move_log[-ply:] == pv_line[:ply]:
+            hash_move = pv_line[ply] & SHORT_MASK
+
+        # Moves are generated stage by stage, so a cutoff by the hash move or a capture skips the rest
+        picker = MovePicker(gs, hash_move, killers, counter_move, history)
+        quiets_tried = []
+        for move_number, move in enumerate(picker):
             gs.make_move(move)
-            score = -self._search(gs, depth - 1, -beta, -alpha, -turn_multiplier)
+            if move_number == 0:
+                score = -self._search(gs, depth - 1, -beta, -alpha, -turn_multiplier, ply + 1)
+            else:
+                # Late quiet moves rarely matter: search them shallower and only look again if one beats alpha
+                reduction = 0
+                if self.late_move_reductions and depth >= LMR_MIN_DEPTH and move_number >= LMR_MIN_MOVES and \
+                        not in_check and picker.stage == QUIETS:
+                    reduction = min(1 if move_number < 6 else 2, depth - 2)
+                    self.reductions += 1
+                window = alpha + 1 if self.pvs else beta
+                score = -self._search(gs, depth - 1 - reduction, -window, -alpha, -turn_multiplier, ply + 1)
+                if reduction and score > alpha:
+                    self.re_searches += 1
+                    score = -self._search(gs, depth - 1, -window, -alpha, -turn_multiplier, ply + 1)
+                if window != beta and alpha < score < beta:
+                    self.re_searches += 1
+                    score = -self._search(gs, depth - 1, -beta, -alpha, -turn_multiplier, ply + 1)
             gs.undo_move()
+            if self.stopped:
+                # The child's score is a placeholder: no table entry, ordering update or PV comes from it
+                return 0
 
             if score > best_score:
                 best_score = score
@@ -344,9 +599,26 @@ class ChessAI:
 
             if score > alpha:
                 alpha = score
+                if ply < MAX_PLY:
+                    pv_table[ply] = [move] + pv_table[ply + 1]
 
+            quiet = not move & TACTICAL_MASK
             if alpha >= beta:
+                self.cutoffs += 1
+                if move_number == 0:
+                    self.first_move_cutoffs += 1
+                self.stage_cutoffs[picker.stage] += 1
+                if quiet:
+                    self._update_quiet_ordering(move & SHORT_MASK, quiets_tried, depth, killers, history, previous)
                 break  # Beta cutoff
+            if quiet:
+                quiets_tried.append(move & SHORT_MASK)
+
+        # No legal moves: checkmate or stalemate
+        if best_move is None:
+            if in_check:
+                return -CHECKMATE + ply  # Prefer faster mates
+            return STALEMATE
 
         # Store in transposition table
         if best_score <= original_alpha:
@@ -356,15 +628,33 @@ class ChessAI:
         else:
             flag = "EXACT"
 
-        tt.store(pos_hash, best_score, depth, flag, best_move)
-        tt.save_to_file()
+        self.tt.store(pos_hash, score_to_table(best_score, ply), depth, flag,
+                      best_move & SHORT_MASK if best_move else 0)
 
         return best_score
 
+    def _update_quiet_ordering(self, code: int, quiets_tried: List[int], depth: int, killers, history,
+                               previous: int):
+        """Reward a quiet move that caused a cutoff, and penalise the quiet moves tried before it."""
+        if killers and killers[0] != code:
+            killers[1] = killers[0]
+            killers[0] = code
+        if previous >= 0:
+            self.counter_moves[previous] = code
+
+        bonus = depth * depth
+        history[code & 0xFFF] += bonus
+        for tried in quiets_tried:
+            history[tried & 0xFFF] -= bonus
+        if history[code & 0xFFF] >= HISTORY_LIMIT:
+            for i in range(4096):
+                history[i] //= 2
+
     def _quiescence_search(self, gs, alpha: int, beta: int, turn_multiplier: int) -> int:
         """Quiescence search to avoid horizon effect."""
         global counter
         counter += 1
+        self.nodes_searched += 1
 
         stand_pat = turn_multiplier * self._evaluate_position(gs)
 
@@ -374,12 +664,9 @@ class ChessAI:
         if alpha < stand_pat:
             alpha = stand_pat
 
-        # Only consider captures in quiescence
-        all_moves = gs.get_valid_moves()
-        captures = [move for move in all_moves if self._is_capture(move)]
-
-        # Order captures by MVV-LVA
-        captures = self._order_moves_advanced(gs, captures)
+        # Only captures and promotions, generated directly rather than filtered from every legal move
+        captures = gs.generate_captures()
+        captures.sort(key=capture_score, reverse=True)
 
         for move in captures:
             gs.make_move(move)
@@ -394,96 +681,42 @@ class ChessAI:
 
         return alpha
 
-    def _order_moves_advanced(self, gs, moves: List[Any], hash_move: Any = None) -> List[Any]:
-        """Advanced move ordering for better pruning."""
-        if not moves:
-            return []
-
-        move_scores = []
-
-        for move in moves:
-            score = 0
-
-            # Hash move gets highest priority
-            if hash_move and move == hash_move:
-                score += 10000
-
-            # Captures (MVV-LVA)
-            if self._is_capture(move):
-                victim = self._get_captured_piece_value(move)
-                attacker = self._get_moving_piece_value(move)
-                score += 1000 + (victim * 10 - attacker)
-
-            # Promotions
-            if self._is_promotion(move):
-                score += 900
-
-            # Checks (if we can detect them easily)
-            # This would require making/unmaking the move, so skip for now
-
-            # Killer moves (would require killer move table)
-            # History heuristic (would require history table)
-
-            move_scores.append((move, score))
-
-        # Sort by score descending
-        move_scores.sort(key=lambda x: x[1], reverse=True)
-        return [move for move, score in move_scores]
-
-    def _is_capture(self, move) -> bool:
-        """Check if move is a capture."""
-        return hasattr(move, 'piece_captured') and move.piece_captured != "--"
-
-    def _is_promotion(self, move) -> bool:
-        """Check if move is a pawn promotion."""
-        return hasattr(move, 'is_pawn_promotion') and move.is_pawn_promotion
-
-    def _get_captured_piece_value(self, move) -> int:
-        """Get value of captured piece."""
-        if not self._is_capture(move):
-            return 0
-        piece_type = move.piece_captured[1] if len(move.piece_captured) > 1 else move.piece_captured
-        return piece_score.get(piece_type, 0)
-
-    def _get_moving_piece_value(self, move) -> int:
-        """Get value of moving piece."""
-        piece_type = move.piece_moved[1] if len(move.piece_moved) > 1 else move.piece_moved
-        return piece_score.get(piece_type, 0)
+    def _order_root_moves(self, gs, moves: List[Any]) -> List[Any]:
+        """The root moves in the order MovePicker gives them: the table's move, captures by MVV-LVA, then
+        quiet moves by history."""
+        by_code = {move.code: move for move in moves}
+        history = self.history[0 if gs.white_to_move else 1]
+        ordered = [by_code.pop(code) for code in MovePicker(gs, self.tt.best_move(gs.zobrist_key), history=history)
+                   if code in by_code]
+        return ordered + list(by_code.values())
 
     def _evaluate_position(self, gs) -> int:
-        """Evaluate the current position."""
+        """Evaluate the current position in centipawns from white's point of view."""
         if gs.checkmate:
             return -CHECKMATE if gs.white_to_move else CHECKMATE
         elif gs.stalemate:
             return STALEMATE
 
-        score = 0
-
-        # Material and positional evaluation
-        for row in range(8):
-            for col in range(8):
-                piece = gs.board[row][col]
-                if piece != "--":
-                    color = piece[0]
-                    piece_type = piece[1]
-
-                    if piece_type in piece_score:
-                        material_value = piece_score[piece_type]
+        # Material and piece-square totals are kept up to date by make_move/undo_move
+        return gs.material_score + gs.positional_score
 
-                        # Positional value
-                        positional_value = 0
-                        if (piece_type != "K" and color in piece_position_scores
-                                and piece_type in piece_position_scores[color]):
-                            positional_value = piece_position_scores[color][piece_type][row][col] * 0.01
 
-                        total_value = material_value + positional_value
-
-                        if color == "w":
-                            score += total_value
-                        else:
-                            score -= total_value
-
-        return score
+def _lazy_smp_helper(helper_id: int, table: TranspositionTable, jobs, results, stop_event):
+    """Helper process of a parallel search: search each (fen, backend, search limits, features) job
+    until it finishes or stop_event is set, then report (helper id, completed depth, packed best move,
+    score, nodes). Its ordering tables stay warm from one job to the next; None ends the process."""
+    sys.stdout = open(os.devnull, "w")
+    helper = ChessAI(table=table)
+    helper.helper_id = helper_id
+    helper.stop_event = stop_event
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        fen, backend, limits, (helper.null_move, helper.late_move_reductions, helper.pvs) = job
+        move = helper.get_best_move(engine.new_game_state(fen, backend), limits=limits)
+        results.put((helper_id, helper.completed_depth, move.code if move is not None else 0, helper.best_score,
+                     counter))
 
 
 # Legacy function interface for backward compatibility
@@ -510,10 +743,7 @@ def search(gs, valid_moves, depth, alpha, beta, turn_multiplier):
 
 def order_moves(moves):
     """Legacy move ordering."""
-    if not moves:
-        return []
-    ai = ChessAI()
-    return ai._order_moves_advanced(None, moves)
+    return sorted(moves, key=lambda move: capture_score(move.code), reverse=True)
 
 
 def score_board(gs):
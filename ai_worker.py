@@ -0,0 +1,159 @@
+"""Long-lived search process for the GUI.
+
+The GUI sends it commands instead of starting a process per move. The search's transposition, history
+and killer tables stay warm from move to move. Only the start position and the packed move list cross
+the process boundary, and the worker replays just the moves it hasn't seen.
+
+    worker = AIWorker()
+    worker.go(gs)           # start searching gs's position in the background
+    move = worker.poll()    # packed best move once the search has finished (0: none found), else None
+    worker.ponder(gs)       # after playing that move: search the expected reply on the opponent's time
+    worker.stop()           # abandon the search (undo, reset); its result is dropped
+    worker.new_game()
+    worker.close()
+
+While pondering, go() with the predicted move played is a ponder hit. The running search becomes the
+real one and keeps the time it has already spent. With any other move, the ponder search is cancelled;
+the table entries it filled stay.
+"""
+import queue
+from multiprocessing import Process, Queue, RawValue
+
+import ai
+import engine
+
+
+class _SearchFlag:
+    """One search's view of a shared search id, in the shape ChessAI.stop_event / ponder_hit expect:
+    set once the GUI has flagged this search or a later one."""
+
+    def __init__(self, flagged, search_id: int):
+        self.flagged = flagged
+        self.search_id = search_id
+
+    def is_set(self) -> bool:
+        return self.flagged.value >= self.search_id
+
+
+def _worker_main(commands, results, cancelled, ponder_hits, depth: int, time_limit: float):
+    """Worker process: handle commands until None arrives.
+
+    ("position", start_fen, moves)  play moves from start_fen, reusing the current game where they agree
+    ("go", search_id, ponder)       search, then put (search_id, best move, expected reply) on results as
+                                    packed moves (0 if none); a ponder search ignores the time limit
+                                    until its ponder hit
+    ("new_game",)                   forget the game and the ordering tables (the transposition table stays)
+    """
+    chess_ai = ai.ChessAI(depth=depth, time_limit=time_limit)
+    gs = None
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+
+        if command[0] == "position":
+            _, start_fen, moves = command
+            if gs is None or gs.start_fen != start_fen:
+                gs = engine.GameState(start_fen)
+            # Take back whatever the GUI undid, then play what is new
+            common = 0
+            while common < len(gs.move_log) and common < len(moves) and gs.move_log[common] == moves[common]:
+                common += 1
+            while len(gs.move_log) > common:
+                gs.undo_move()
+            for move in moves[common:]:
+                gs.make_move(move)
+
+        elif command[0] == "go":
+            _, search_id, ponder = command
+            move = None
+            reply = 0
+            if gs is not None and cancelled.value < search_id:
+                chess_ai.stop_event = _SearchFlag(cancelled, search_id)
+                chess_ai.ponder_hit = _SearchFlag(ponder_hits, search_id)
+                chess_ai.pondering = ponder
+                move = chess_ai.get_best_move(gs)
+                if move is not None:
+                    reply = chess_ai.ponder_move(gs, move)
+            results.put((search_id, move.code if move is not None else 0, reply))
+
+        elif command[0] == "new_game":
+            chess_ai = ai.ChessAI(depth=depth, time_limit=time_limit)
+            gs = None
+
+
+class AIWorker:
+    """GUI-side handle of the search process."""
+
+    def __init__(self, depth: int = ai.DEPTH, time_limit: float = 30.0):
+        self.commands = Queue()
+        self.results = Queue()
+        self.cancelled = RawValue('q', 0)  # Highest search id the GUI has cancelled
+        self.ponder_hits = RawValue('q', 0)  # Highest ponder search id whose predicted move was played
+        self.search_id = 0
+        self.best_move = 0  # Result of the last search, and the reply it expects
+        self.ponder_move = 0
+        self.pondering = None  # (search id, move list searched) while pondering
+        self.process = Process(target=_worker_main, daemon=True,
+                               args=(self.commands, self.results, self.cancelled, self.ponder_hits, depth,
+                                     time_limit))
+        self.process.start()
+
+    def go(self, gs):
+        """Start searching gs's position, or turn the ponder search into that search if it predicted it.
+        The result is collected with poll."""
+        moves = list(gs.move_log)
+        if self.pondering is not None:
+            ponder_id, ponder_moves = self.pondering
+            self.pondering = None
+            if moves == ponder_moves:
+                self.ponder_hits.value = ponder_id
+                return
+            self.cancelled.value = ponder_id
+
+        self.search_id += 1
+        self.commands.put(("position", gs.start_fen, moves))
+        self.commands.put(("go", self.search_id, False))
+
+    def ponder(self, gs):
+        """Search the reply the last search expects to the move just played in gs, on the opponent's time."""
+        if not self.ponder_move or not gs.move_log or gs.move_log[-1] != self.best_move:
+            return
+        moves = list(gs.move_log) + [self.ponder_move]
+        self.search_id += 1
+        self.pondering = (self.search_id, moves)
+        self.commands.put(("position", gs.start_fen, moves))
+        self.commands.put(("go", self.search_id, True))
+
+    def poll(self):
+        """Packed best move of the latest search once it has finished (0 if it found none), else None.
+
+        A ponder search's result waits for the ponder hit.
+        """
+        if self.pondering is not None:
+            return None
+        while True:
+            try:
+                search_id, move, reply = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if search_id == self.search_id:
+                self.best_move, self.ponder_move = move, reply
+                return move
+
+    def stop(self):
+        """Cancel the latest search or ponder search. The worker unwinds within a few thousand nodes and the
+        result is ignored."""
+        self.cancelled.value = self.search_id
+        self.pondering = None
+
+    def new_game(self):
+        self.stop()
+        self.commands.put(("new_game",))
+
+    def close(self):
+        self.stop()
+        self.commands.put(None)
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,121 @@
+"""Batched static evaluation with NumPy: score many positions at once instead of one GameState at a time.
+
+    codes = encode_fens(fens)       # (N, 64) int8 piece codes, 0 = a8 .. 63 = h1
+    scores = evaluate(codes)        # (N,) material + piece-square centipawns from white's point of view
+    planes = to_planes(codes)       # (N, 12, 64) int8 one-hot planes; evaluate(planes) gives the same scores
+
+    python batch_evaluation.py --positions 1000000    # positions/s against the per-position evaluation
+
+The scores are the same terms GameState keeps incrementally (evaluation.MATERIAL and PIECE_SQUARE), so
+evaluate(encode_game_states([gs]))[0] == gs.material_score + gs.positional_score. Like those totals they
+don't know about checkmate or stalemate, which need move generation.
+"""
+import argparse
+import sys
+import time
+from typing import Iterable, List
+
+import numpy as np
+
+import evaluation
+from mailbox_board import PIECE_CODES, SQUARE_120, WP, WN, WB, WR, WQ, WK, BP, BN, BB, BR, BQ, BK
+
+PLANE_PIECES = (WP, WN, WB, WR, WQ, WK, BP, BN, BB, BR, BQ, BK)  # Plane order of to_planes
+CHUNK_SIZE = 1 << 16  # Positions encoded and scored at a time by score_fens
+
+# Centipawns of each piece code on each square (material plus piece-square bonus), signed for white
+SCORE_TABLE = np.array([[evaluation.MATERIAL[code] + evaluation.PIECE_SQUARE[code][SQUARE_120[sq]]
+                         for sq in range(64)] for code in range(17)], dtype=np.int32)
+PLANE_SCORES = SCORE_TABLE[list(PLANE_PIECES)]
+
+# FEN letter (as a byte) to piece code; '.' is the empty square that digits expand to
+LETTER_CODES = np.zeros(256, dtype=np.int8)
+for _letter, _name in (("P", "wp"), ("N", "wN"), ("B", "wB"), ("R", "wR"), ("Q", "wQ"), ("K", "wK"),
+                       ("p", "bp"), ("n", "bN"), ("b", "bB"), ("r", "bR"), ("q", "bQ"), ("k", "bK")):
+    LETTER_CODES[ord(_letter)] = PIECE_CODES[_name]
+EXPAND_FEN = str.maketrans({**{str(n): "." * n for n in range(1, 9)}, "/": ""})
+
+
+def encode_fens(fens: Iterable[str]) -> np.ndarray:
+    """(N, 64) int8 piece codes of the board fields of FEN strings, without building GameStates."""
+    boards = [fen.split(" ", 1)[0].translate(EXPAND_FEN) for fen in fens]
+    for board in boards:
+        if len(board) != 64:
+            raise ValueError(f"bad FEN board {board!r}")
+    raw = np.frombuffer("".join(boards).encode("ascii"), dtype=np.uint8)
+    return LETTER_CODES[raw].reshape(len(boards), 64)
+
+
+def encode_game_states(states: Iterable) -> np.ndarray:
+    """(N, 64) int8 piece codes of GameStates' mailboxes."""
+    mailboxes = np.array([gs.squares for gs in states], dtype=np.int8).reshape(-1, 120)
+    return mailboxes[:, SQUARE_120]
+
+
+def to_planes(codes: np.ndarray) -> np.ndarray:
+    """(N, 12, 64) int8 one-hot planes, one per piece in PLANE_PIECES order, from (N, 64) codes."""
+    return (codes[:, None, :] == np.array(PLANE_PIECES, dtype=np.int8)[None, :, None]).astype(np.int8)
+
+
+def evaluate(positions: np.ndarray) -> np.ndarray:
+    """(N,) int32 centipawns from white's point of view for (N, 64) codes or (N, 12, 64) planes."""
+    if positions.ndim == 3:
+        return np.einsum("npk,pk->n", positions.astype(np.int32), PLANE_SCORES)
+    return SCORE_TABLE[positions, np.arange(64)].sum(axis=1, dtype=np.int32)
+
+
+def score_fens(fens: Iterable[str], chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """Scores of any number of FENs, encoded chunk_size at a time so memory stays bounded."""
+    scores: List[np.ndarray] = []
+    chunk = []
+    for fen in fens:
+        chunk.append(fen)
+        if len(chunk) == chunk_size:
+            scores.append(evaluate(encode_fens(chunk)))
+            chunk = []
+    if chunk:
+        scores.append(evaluate(encode_fens(chunk)))
+    return np.concatenate(scores) if scores else np.zeros(0, dtype=np.int32)
+
+
+def main(argv=None):
+    import random
+
+    import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=200000, help="positions to score")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # Distinct positions from random games
+    rng = random.Random(args.seed)
+    states, fens = [], []
+    while len(fens) < min(args.positions, 2000):
+        gs = engine.GameState()
+        for _ in range(rng.randint(0, 80)):
+            moves = gs.generate_legal_moves()
+            if not moves:
+                break
+            gs.make_move(rng.choice(moves))
+        states.append(gs)
+        fens.append(gs.get_fen())
+    fens = (fens * (args.positions // len(fens) + 1))[:args.positions]
+
+    start = time.perf_counter()
+    scores = score_fens(fens)
+    batched = time.perf_counter() - start
+    start = time.perf_counter()
+    one_by_one = [sum(evaluation.compute_scores(engine.GameState(fen).squares)) for fen in fens[:2000]]
+    single = (time.perf_counter() - start) / len(one_by_one) * len(fens)
+
+    expected = np.array([gs.material_score + gs.positional_score for gs in states])
+    assert (evaluate(encode_game_states(states)) == expected).all()
+    assert (scores[:len(one_by_one)] == one_by_one).all()
+    print(f"{len(fens)} positions: batched {batched:.2f}s ({len(fens) / batched:,.0f}/s), "
+          f"one GameState at a time {single:.2f}s ({len(fens) / single:,.0f}/s, estimated from 2000)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
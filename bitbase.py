@@ -0,0 +1,269 @@
+"""Endgame bitbases for king and queen, rook or pawn against a lone king, built by retrograde analysis.
+
+    python bitbase.py               # generate assets/bitbases/{kqk,krk,kpk}.bin (once, offline)
+    python bitbase.py --no-dtm      # win/draw bits only
+
+Every position is indexed by the stronger side's king, the lone king and the piece (0 = a8 .. 63 = h1,
+as in packed moves), once with each side to move. The stronger side is normalised to white by
+mirroring the ranks. A table file holds one bit per position (set: the stronger side wins) for each
+side to move, optionally followed by a byte per position with the distance to mate in plies.
+
+The tables are solved by iterating over every position at once with NumPy: a position with the
+stronger side to move mates in one ply more than its quickest successor that mates, and one with the
+lone king to move is mated in one ply more than its slowest successor, once all of them mate.
+Promotions in KPK continue in KQK and KRK, so those are generated first.
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+from mailbox_board import BOARD_SQUARES, SQ64, TYPE_MASK, COLOR_MASK, WHITE, PAWN, ROOK, QUEEN, KING
+
+BITBASE_DIR = "assets/bitbases"
+MATERIALS = {"kqk": QUEEN, "krk": ROOK, "kpk": PAWN}  # Generation order: promotions need kqk and krk
+
+FILE_MAGIC = b"CHESSBB\0"
+FILE_FORMAT_VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sIII")  # magic, format, piece type, has distance to mate
+POSITIONS = 64 * 64 * 64  # Per side to move: strong king * 4096 + weak king * 64 + piece square
+BITS_BYTES = POSITIONS // 8
+NO_MATE = 255  # Distance byte of a drawn position
+
+KING_STEPS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+SLIDES = {ROOK: ((-1, 0), (1, 0), (0, -1), (0, 1)), QUEEN: KING_STEPS}
+
+
+def position_index(strong_king: int, weak_king: int, piece: int) -> int:
+    return (strong_king << 12) | (weak_king << 6) | piece
+
+
+class Bitbase:
+    """One table: win/draw bits for each side to move, and distances to mate if the file has them."""
+
+    def __init__(self, piece_type: int, bits: Tuple[bytes, bytes], distances: Optional[Tuple[bytes, bytes]]):
+        self.piece_type = piece_type
+        self.bits = bits  # [0]: stronger side to move, [1]: lone king to move
+        self.distances = distances
+
+    @classmethod
+    def load(cls, filename: str) -> "Bitbase":
+        with open(filename, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER_STRUCT.size:
+            raise ValueError("not a bitbase file")
+        magic, file_format, piece_type, has_distances = HEADER_STRUCT.unpack_from(data)
+        expected = HEADER_STRUCT.size + 2 * BITS_BYTES + (2 * POSITIONS if has_distances else 0)
+        if magic != FILE_MAGIC or file_format != FILE_FORMAT_VERSION or len(data) != expected:
+            raise ValueError("not a bitbase file")
+        offset = HEADER_STRUCT.size
+        bits = (data[offset:offset + BITS_BYTES], data[offset + BITS_BYTES:offset + 2 * BITS_BYTES])
+        distances = None
+        if has_distances:
+            offset += 2 * BITS_BYTES
+            distances = (data[offset:offset + POSITIONS], data[offset + POSITIONS:offset + 2 * POSITIONS])
+        return cls(piece_type, bits, distances)
+
+    def probe(self, strong_to_move: bool, index: int) -> Tuple[bool, Optional[int]]:
+        """(whether the stronger side wins, plies to mate if known)."""
+        side = 0 if strong_to_move else 1
+        if not self.bits[side][index >> 3] >> (index & 7) & 1:
+            return False, None
+        return True, self.distances[side][index] if self.distances is not None else None
+
+
+class Bitbases:
+    """The tables found in a directory, probed by GameState."""
+
+    def __init__(self, tables: Dict[int, Bitbase]):
+        self.tables = tables  # By the piece type beside the kings
+
+    def __bool__(self) -> bool:
+        return bool(self.tables)
+
+    def probe(self, gs) -> Optional[Tuple[int, Optional[int]]]:
+        """(1 win / 0 draw / -1 loss for the side to move, plies to mate if known) for a position with
+        two kings and one queen, rook or pawn and no castling rights, else None."""
+        strong_king = weak_king = piece = -1
+        strong_color = None
+        for sq in BOARD_SQUARES:
+            code = gs.squares[sq]
+            if code and code & TYPE_MASK != KING:
+                piece, piece_type, strong_color = SQ64[sq], code & TYPE_MASK, code & COLOR_MASK
+                break
+        table = self.tables.get(piece_type) if strong_color is not None else None
+        rights = gs.current_castle_right
+        if table is None or rights.wks or rights.wqs or rights.bks or rights.bqs:
+            return None
+
+        white_strong = strong_color == WHITE
+        strong_king = SQ64[gs.white_king_sq if white_strong else gs.black_king_sq]
+        weak_king = SQ64[gs.black_king_sq if white_strong else gs.white_king_sq]
+        if not white_strong:  # Mirror the ranks so the stronger side plays up the board as white
+            strong_king, weak_king, piece = strong_king ^ 56, weak_king ^ 56, piece ^ 56
+        strong_to_move = gs.white_to_move == white_strong
+        wins, distance = table.probe(strong_to_move, position_index(strong_king, weak_king, piece))
+        if not wins:
+            return 0, None
+        return (1 if strong_to_move else -1), distance
+
+
+def open_bitbases(directory: Optional[str] = BITBASE_DIR) -> Bitbases:
+    """Load whichever tables exist in directory; an unreadable table is skipped."""
+    tables = {}
+    for name, piece_type in MATERIALS.items():
+        filename = os.path.join(directory, name + ".bin") if directory else None
+        if filename and os.path.exists(filename):
+            try:
+                tables[piece_type] = Bitbase.load(filename)
+            except (OSError, ValueError) as e:
+                print(f"Bitbase {filename} unavailable ({e})")
+    return Bitbases(tables)
+
+
+def solve(piece_type: int, promotions: Optional[Dict[int, Tuple]] = None):
+    """Distances to mate in plies (NO_MATE-capped, INF for draws and illegal positions) for the stronger
+    side to move and for the lone king to move, as two int arrays of POSITIONS.
+
+    promotions maps QUEEN and ROOK to their solved (strong, weak) arrays, needed for KPK.
+    """
+    import numpy as np
+
+    inf = 1 << 14
+    square = np.arange(64)
+    row, col = square >> 3, square & 7
+    adjacent = (np.abs(row[:, None] - row[None, :]) <= 1) & (np.abs(col[:, None] - col[None, :]) <= 1)
+
+    def step(sq: int, d_row: int, d_col: int) -> int:
+        r, c = (sq >> 3) + d_row, (sq & 7) + d_col
+        return r * 8 + c if 0 <= r < 8 and 0 <= c < 8 else -1
+
+    # attacks[piece square, blocker square, target]: the piece attacks target with the stronger king on blocker
+    attacks = np.zeros((64, 64, 64), dtype=bool)
+    for p in range(64):
+        if piece_type == PAWN:
+            for d_col in (-1, 1):
+                target = step(p, -1, d_col)
+                if target >= 0:
+                    attacks[p, :, target] = True
+            continue
+        for blocker in range(64):
+            for d_row, d_col in SLIDES[piece_type]:
+                target = step(p, d_row, d_col)
+                while target >= 0:
+                    attacks[p, blocker, target] = True
+                    if target == blocker:
+                        break
+                    target = step(target, d_row, d_col)
+
+    index = np.arange(POSITIONS)
+    strong_king, weak_king, piece = index >> 12, (index >> 6) & 63, index & 63
+    legal = (strong_king != weak_king) & (strong_king != piece) & (weak_king != piece) & \
+        ~adjacent[strong_king, weak_king]
+    if piece_type == PAWN:
+        legal &= (piece >> 3 != 0) & (piece >> 3 != 7)
+    weak_in_check = attacks[piece, strong_king, weak_king]
+    legal_strong = legal & ~weak_in_check  # The side not to move can't be in check
+
+    # Lone king moves: successor positions with the stronger side to move; CAPTURE: the piece is taken (draw)
+    capture, no_move = POSITIONS, POSITIONS + 1
+    weak_moves = np.full((POSITIONS, 8), no_move, dtype=np.int32)
+    for column, (d_row, d_col) in enumerate(KING_STEPS):
+        target = np.array([step(sq, d_row, d_col) for sq in range(64)])[weak_king]
+        ok = legal & (target >= 0)
+        target = np.where(ok, target, 0)
+        ok &= ~adjacent[strong_king, target]
+        takes = ok & (target == piece) & ~adjacent[strong_king, piece]
+        ok &= (target != piece) & ~attacks[piece, strong_king, target]
+        weak_moves[:, column] = np.where(ok, position_index(strong_king, target, piece),
+                                         np.where(takes, capture, no_move))
+    has_moves = (weak_moves != no_move).any(axis=1)
+
+    # Stronger side moves: successor positions with the lone king to move
+    strong_columns = []
+    for d_row, d_col in KING_STEPS:
+        target = np.array([step(sq, d_row, d_col) for sq in range(64)])[strong_king]
+        ok = legal_strong & (target >= 0)
+        target = np.where(ok, target, 0)
+        ok &= (target != piece) & ~adjacent[target, weak_king]
+        strong_columns.append(np.where(ok, position_index(target, weak_king, piece), no_move))
+    promotion = np.full(POSITIONS, inf, dtype=np.int16)
+    if piece_type == PAWN:
+        push = np.where(legal_strong, piece - 8, 0)
+        free = legal_strong & (push != strong_king) & (push != weak_king)
+        promoting = free & (push >> 3 == 0)
+        strong_columns.append(np.where(free & ~promoting, position_index(strong_king, weak_king, push), no_move))
+        double = np.where(free, push - 8, 0)
+        ok = free & (piece >> 3 == 6) & (double != strong_king) & (double != weak_king)
+        strong_columns.append(np.where(ok, position_index(strong_king, weak_king, double), no_move))
+        promoted = position_index(strong_king, weak_king, push)
+        for new_type in (QUEEN, ROOK):
+            promotion = np.where(promoting, np.minimum(promotion, promotions[new_type][1][promoted]), promotion)
+    else:
+        for d_row, d_col in SLIDES[piece_type]:
+            target = piece.copy()
+            alive = legal_strong.copy()
+            ray = np.array([step(sq, d_row, d_col) for sq in range(64)])
+            for _ in range(7):
+                target = ray[np.where(alive, target, 0)]
+                alive &= (target >= 0) & (target != strong_king) & (target != weak_king)
+                strong_columns.append(np.where(alive, position_index(strong_king, weak_king, target), no_move))
+    strong_moves = np.stack(strong_columns, axis=1).astype(np.int32)
+
+    # Iterate to the fixed point: values only fall, from inf (no mate known) to the distance to mate
+    strong = np.full(POSITIONS, inf, dtype=np.int16)
+    weak = np.full(POSITIONS, inf, dtype=np.int16)
+    draw_slots = np.array([inf, inf], dtype=np.int16)
+    strong_slots = np.array([inf, -1], dtype=np.int16)  # A capture draws; no_move never counts
+    mated = legal & weak_in_check & ~has_moves
+    weak[mated] = 0
+    while True:
+        weak_values = np.concatenate([weak, draw_slots])
+        new_strong = np.minimum(weak_values[strong_moves].min(axis=1), promotion) + 1
+        new_strong[(new_strong > inf) | ~legal_strong] = inf
+        strong_values = np.concatenate([strong, strong_slots])
+        new_weak = strong_values[weak_moves].max(axis=1) + 1
+        new_weak[(new_weak > inf) | ~has_moves] = inf
+        new_weak[mated] = 0
+        if (new_strong == strong).all() and (new_weak == weak).all():
+            return strong, weak
+        strong, weak = new_strong, new_weak
+
+
+def save(filename: str, piece_type: int, strong, weak, with_distances: bool = True):
+    import numpy as np
+
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "wb") as f:
+        f.write(HEADER_STRUCT.pack(FILE_MAGIC, FILE_FORMAT_VERSION, piece_type, int(with_distances)))
+        for values in (strong, weak):
+            f.write(np.packbits(values < NO_MATE, bitorder="little").tobytes())
+        if with_distances:
+            for values in (strong, weak):
+                f.write(np.minimum(values, NO_MATE).astype(np.uint8).tobytes())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=BITBASE_DIR, help="directory to write the tables to")
+    parser.add_argument("--no-dtm", action="store_true", help="store win/draw bits only")
+    args = parser.parse_args(argv)
+
+    solved = {}
+    for name, piece_type in MATERIALS.items():
+        start = time.perf_counter()
+        strong, weak = solve(piece_type, solved)
+        solved[piece_type] = (strong, weak)
+        filename = os.path.join(args.out, name + ".bin")
+        save(filename, piece_type, strong, weak, not args.no_dtm)
+        wins = int((strong < NO_MATE).sum()), int((weak < NO_MATE).sum())
+        longest = int(max(strong[strong < NO_MATE].max(), weak[weak < NO_MATE].max()))
+        print(f"{name}: {wins[0]} wins to move, {wins[1]} losses to move, longest mate {longest} plies, "
+              f"{time.perf_counter() - start:.1f}s -> {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""Bitboard move generation backend.
+
+BitboardGameState keeps one 64-bit board per piece code next to the mailbox and generates exactly the
+same legal moves as GameState, from attack tables instead of ray walking. Bit n is square n of the 8x8
+board in GameState row/col order (bit 0 = a8, bit 63 = h1).
+
+Checks and pins come from a few table lookups around the king instead of the mailbox's full attack
+map (update_attack_info), and pawns move as whole sets. That pays where generation dominates, but
+make_move/undo_move do the mailbox's work plus the bitboards', so it loses where they dominate.
+python perft.py --backend all, bitboard nodes/s relative to the mailbox (noisy to +-15%):
+
+    start position d5                       1.6-1.9x
+    Kiwipete d4                             1.2-1.3x
+    Kiwipete d4 --hash 64                   1.0-1.2x
+    position 3 (sparse endgame) d5          0.75-0.95x, slower
+    Kiwipete d3 --hash 16                   about 0.4x, slower: the hash answers most nodes, leaving
+                                            mostly make/undo and the generator's fixed cost per call
+"""
+from engine import GameState, ALL_MOVES, TACTICAL_MOVES, QUIET_MOVES
+from move import (TO_SHIFT, ENPASSANT_FLAG, CASTLE_FLAG, CAPTURED_SHIFT, MOVED_SHIFT, SQUARE_MASK, SHORT_MASK,
+                  PROMOTION_SHIFT, PROMOTION_MASK, PROMOTIONS)
+from mailbox_board import (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, COLOR_MASK, WP, WN, WB, WR, WQ,
+                           WK, BP, BN, BB, BR, BQ, BK, SQ64, SQUARE_120, BOARD_SQUARES, RAYS,
+                           ORTHOGONAL, DIAGONAL, KNIGHT_TARGETS, KING_TARGETS)
+
+FULL = (1 << 64) - 1
+
+
+def _bits(squares120):
+    bb = 0
+    for sq in squares120:
+        bb |= 1 << SQ64[sq]
+    return bb
+
+
+KNIGHT_ATTACKS = [_bits(KNIGHT_TARGETS[SQUARE_120[sq]]) for sq in range(64)]
+KING_ATTACKS = [_bits(KING_TARGETS[SQUARE_120[sq]]) for sq in range(64)]
+# PAWN_ATTACKS[0] are the squares a white pawn attacks, PAWN_ATTACKS[1] a black pawn's
+PAWN_ATTACKS = [[_bits(t for t in (SQUARE_120[sq] - 11, SQUARE_120[sq] - 9) if SQ64[t] >= 0) for sq in range(64)],
+                [_bits(t for t in (SQUARE_120[sq] + 9, SQUARE_120[sq] + 11) if SQ64[t] >= 0) for sq in range(64)]]
+
+# Squares strictly between two aligned squares, and the whole line through them (0 when not aligned)
+BETWEEN = [[0] * 64 for _ in range(64)]
+LINE = [[0] * 64 for _ in range(64)]
+for _sq in range(64):
+    for _d in ORTHOGONAL + DIAGONAL:
+        _ray = RAYS[SQUARE_120[_sq]][_d]
+        _full_line = (1 << _sq) | _bits(_ray) | _bits(RAYS[SQUARE_120[_sq]][-_d])
+        for _i, _target in enumerate(_ray):
+            BETWEEN[_sq][SQ64[_target]] = _bits(_ray[:_i])
+            LINE[_sq][SQ64[_target]] = _full_line
+
+
+def _slider_table(directions):
+    """Build (masks, tables) for a slider: tables[sq][occupancy & masks[sq]] -> attack set.
+
+    The relevant occupancy of a square is its rays minus the last square of each, as with magic bitboards;
+    a dict keyed by the masked occupancy plays the role of the magic multiply (a software PEXT).
+    """
+    masks = []
+    tables = []
+    for sq in range(64):
+        rays = [RAYS[SQUARE_120[sq]][d] for d in directions]
+        mask = 0
+        for ray in rays:
+            mask |= _bits(ray[:-1])
+
+        table = {}
+        occupancy = 0
+        while True:
+            attacks = 0
+            for ray in rays:
+                for target in ray:
+                    bit = 1 << SQ64[target]
+                    attacks |= bit
+                    if occupancy & bit:
+                        break
+            table[occupancy] = attacks
+            # Carry-rippler: step through every subset of mask
+            occupancy = (occupancy - mask) & mask
+            if not occupancy:
+                break
+
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+ROOK_MASKS, ROOK_TABLES = _slider_table(ORTHOGONAL)
+BISHOP_MASKS, BISHOP_TABLES = _slider_table(DIAGONAL)
+
+
+def rook_attacks(sq, occupancy):
+    return ROOK_TABLES[sq][occupancy & ROOK_MASKS[sq]]
+
+
+def bishop_attacks(sq, occupancy):
+    return BISHOP_TABLES[sq][occupancy & BISHOP_MASKS[sq]]
+
+
+WHITE_PROMOTION_RANK = 0xFF
+BLACK_PROMOTION_RANK = 0xFF << 56
+WHITE_DOUBLE_PUSH_RANK = 0xFF << 40  # Where a white pawn lands after one step from its start rank
+BLACK_DOUBLE_PUSH_RANK = 0xFF << 16
+NOT_A_FILE = FULL ^ sum(1 << (row * 8) for row in range(8))
+NOT_H_FILE = FULL ^ sum(1 << (row * 8 + 7) for row in range(8))
+
+
+class BitboardGameState(GameState):
+    """GameState whose move generation works on bitboards only.
+
+    make_move/undo_move keep the bitboards in step from the packed move's own bits; the mailbox is still
+    updated underneath because the key, the evaluation and the GUI are built on it.
+    """
+    backend = "bitboard"
+
+    def __init__(self, fen=None) -> None:
+        super().__init__(fen)
+        self.bitboards = [0] * 17
+        for sq in BOARD_SQUARES:
+            piece = self.squares[sq]
+            if piece:
+                self.bitboards[piece] |= 1 << SQ64[sq]
+
+    def _toggle(self, move):
+        """Add move to the bitboards, or take it back: every change is an XOR, so both are the same."""
+        bitboards = self.bitboards
+        start = move & SQUARE_MASK
+        end = move >> TO_SHIFT & SQUARE_MASK
+        end_bit = 1 << end
+        piece = move >> MOVED_SHIFT & 15
+        captured = move >> CAPTURED_SHIFT & 15
+        if captured:
+            if move & ENPASSANT_FLAG:
+                bitboards[captured] ^= end_bit << 8 if piece == WP else end_bit >> 8
+            else:
+                bitboards[captured] ^= end_bit
+        if move & PROMOTION_MASK:
+            bitboards[piece] ^= 1 << start
+            bitboards[(piece & COLOR_MASK) | ((move >> PROMOTION_SHIFT & 7) + 1)] ^= end_bit
+        else:
+            bitboards[piece] ^= 1 << start | end_bit
+        if move & CASTLE_FLAG:
+            bitboards[ROOK | (piece & COLOR_MASK)] ^= 0b101 << (end - 1) if end > start else 0b1001 << (end - 2)
+
+    def make_move(self, move):
+        if move.__class__ is not int:
+            move = move.code
+        super().make_move(move)
+        self._toggle(move)
+
+    def undo_move(self):
+        if self.move_log:
+            self._toggle(self.move_log[-1])
+            super().undo_move()
+
+    def generate_legal_moves(self):
+        return self._generate_moves(ALL_MOVES)
+
+    def generate_captures(self):
+        return self._generate_moves(TACTICAL_MOVES)
+
+    def generate_quiets(self):
+        return self._generate_moves(QUIET_MOVES)
+
+    def legal_move_from_code(self, code):
+        """Return the legal packed move whose short form is code, or 0, generating only the moves of the
+        piece on its from square."""
+        for move in self._generate_moves(ALL_MOVES, 1 << (code & SQUARE_MASK)):
+            if move & SHORT_MASK == code:
+                return move
+        return 0
+
+    def update_attack_info(self):
+        """Only in_check is kept here: the bitboard generator finds checks and pins itself and never reads
+        the mailbox attack maps, so they aren't built."""
+        king = self.bitboards[WK if self.white_to_move else BK]
+        self.in_check = self.enemy_attacks(king.bit_length() - 1)
+
+    def enemy_attacks(self, sq64):
+        """Whether an enemy piece attacks square sq64, from the tables (the mailbox attack map isn't built)."""
+        bb = self.bitboards
+        side, enemy = (0, BLACK) if self.white_to_move else (1, WHITE)
+        occupied = 0
+        for piece in (WP, WN, WB, WR, WQ, WK, BP, BN, BB, BR, BQ, BK):
+            occupied |= bb[piece]
+        queens = bb[QUEEN | enemy]
+        return bool(KNIGHT_ATTACKS[sq64] & bb[KNIGHT | enemy]
+                    or PAWN_ATTACKS[side][sq64] & bb[PAWN | enemy]
+                    or KING_ATTACKS[sq64] & bb[KING | enemy]
+                    or ROOK_TABLES[sq64][occupied & ROOK_MASKS[sq64]] & (bb[ROOK | enemy] | queens)
+                    or BISHOP_TABLES[sq64][occupied & BISHOP_MASKS[sq64]] & (bb[BISHOP | enemy] | queens))
+
+    def _generate_moves(self, kind, only=FULL):
+        """Legal moves of the given kind (see engine.ALL_MOVES) of the pieces on the squares in only."""
+        bb = self.bitboards
+        squares = self.squares
+        square_120 = SQUARE_120
+        knight_attacks, king_attacks = KNIGHT_ATTACKS, KING_ATTACKS
+        rook_masks, rook_tables = ROOK_MASKS, ROOK_TABLES
+        bishop_masks, bishop_tables = BISHOP_MASKS, BISHOP_TABLES
+        moves = []
+        append = moves.append
+
+        if self.white_to_move:
+            pawns, knights, bishops, rooks, queens, king = bb[WP], bb[WN], bb[WB], bb[WR], bb[WQ], bb[WK]
+            e_pawns, e_knights, e_bishops, e_rooks, e_queens, e_king = bb[BP], bb[BN], bb[BB], bb[BR], bb[BQ], bb[BK]
+            side = 0
+            color = WHITE
+            start_king_sq = 60
+            promotion_rank = WHITE_PROMOTION_RANK
+            castle_king_side = self.current_castle_right.wks
+            castle_queen_side = self.current_castle_right.wqs
+        else:
+            pawns, knights, bishops, rooks, queens, king = bb[BP], bb[BN], bb[BB], bb[BR], bb[BQ], bb[BK]
+            e_pawns, e_knights, e_bishops, e_rooks, e_queens, e_king = bb[WP], bb[WN], bb[WB], bb[WR], bb[WQ], bb[WK]
+            side = 1
+            color = BLACK
+            start_king_sq = 4
+            promotion_rank = BLACK_PROMOTION_RANK
+            castle_king_side = self.current_castle_right.bks
+            castle_queen_side = self.current_castle_right.bqs
+
+        own = pawns | knights | bishops | rooks | queens | king
+        enemy = e_pawns | e_knights | e_bishops | e_rooks | e_queens | e_king
+        occupied = own | enemy
+        empty = FULL ^ occupied
+        if kind == TACTICAL_MOVES:
+            destinations = enemy
+        elif kind == QUIET_MOVES:
+            destinations = empty
+        else:
+            destinations = FULL ^ own
+        e_rook_queens = e_rooks | e_queens
+        e_bishop_queens = e_bishops | e_queens
+        king_sq = king.bit_length() - 1
+        pawn_attacks = PAWN_ATTACKS[side]
+
+        checkers = (knight_attacks[king_sq] & e_knights | pawn_attacks[king_sq] & e_pawns
+                    | rook_tables[king_sq][occupied & rook_masks[king_sq]] & e_rook_queens
+                    | bishop_tables[king_sq][occupied & bishop_masks[king_sq]] & e_bishop_queens)
+        self.in_check = bool(checkers)
+
+        # King moves: the king is lifted off the board so it can't hide behind itself on a checking ray
+        king_move = king_sq | (KING | color) << MOVED_SHIFT
+        occupancy = occupied ^ king
+        targets = king_attacks[king_sq] & destinations if king & only else 0
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            end = bit.bit_length() - 1
+            if not (knight_attacks[end] & e_knights or king_attacks[end] & e_king or pawn_attacks[end] & e_pawns
+                    or rook_tables[end][occupancy & rook_masks[end]] & e_rook_queens
+                    or bishop_tables[end][occupancy & bishop_masks[end]] & e_bishop_queens):
+                append(king_move | end << TO_SHIFT | squares[square_120[end]] << CAPTURED_SHIFT)
+
+        if checkers & (checkers - 1):
+            return moves  # Double check: only the king can move
+
+        if checkers:
+            target_mask = BETWEEN[king_sq][checkers.bit_length() - 1] | checkers
+        else:
+            target_mask = FULL
+        if not checkers and king_sq == start_king_sq and kind != TACTICAL_MOVES and king & only:
+            # Castling: path empty, rook in its corner, king not passing through or into check
+            def attacked(sq, occupancy):
+                return (knight_attacks[sq] & e_knights or king_attacks[sq] & e_king or pawn_attacks[sq] & e_pawns
+                        or rook_tables[sq][occupancy & rook_masks[sq]] & e_rook_queens
+                        or bishop_tables[sq][occupancy & bishop_masks[sq]] & e_bishop_queens)
+
+            rook = ROOK | color
+            if castle_king_side and not occupied & (0b11 << (king_sq + 1)) and bb[rook] >> (king_sq + 3) & 1 \
+                    and not attacked(king_sq + 1, occupied) and not attacked(king_sq + 2, occupied):
+                append(king_move | (king_sq + 2) << TO_SHIFT | CASTLE_FLAG)
+            if castle_queen_side and not occupied & (0b111 << (king_sq - 3)) and bb[rook] >> (king_sq - 4) & 1 \
+                    and not attacked(king_sq - 1, occupied) and not attacked(king_sq - 2, occupied):
+                append(king_move | (king_sq - 2) << TO_SHIFT | CASTLE_FLAG)
+
+        # Pinned pieces may only move along the line through their king
+        pinned = 0
+        pin_lines = {}
+        snipers = (rook_tables[king_sq][0] & e_rook_queens) | (bishop_tables[king_sq][0] & e_bishop_queens)
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            sniper_sq = bit.bit_length() - 1
+            blockers = BETWEEN[king_sq][sniper_sq] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+                pin_lines[blockers.bit_length() - 1] = LINE[king_sq][sniper_sq]
+
+        # Piece moves: collect (move without destination, destinations) and expand them in one loop.
+        # A pinned knight can never stay on its pin line, so pinned knights are left out.
+        allowed = target_mask & destinations
+        sources = []
+        pieces = knights & only & ~pinned
+        moved = (KNIGHT | color) << MOVED_SHIFT
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            sources.append((sq | moved, knight_attacks[sq] & allowed))
+        pieces = bishops & only
+        moved = (BISHOP | color) << MOVED_SHIFT
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            targets = bishop_tables[sq][occupied & bishop_masks[sq]] & allowed
+            sources.append((sq | moved, targets & pin_lines[sq] if bit & pinned else targets))
+        pieces = rooks & only
+        moved = (ROOK | color) << MOVED_SHIFT
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            targets = rook_tables[sq][occupied & rook_masks[sq]] & allowed
+            sources.append((sq | moved, targets & pin_lines[sq] if bit & pinned else targets))
+        pieces = queens & only
+        moved = (QUEEN | color) << MOVED_SHIFT
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            targets = (rook_tables[sq][occupied & rook_masks[sq]]
+                       | bishop_tables[sq][occupied & bishop_masks[sq]]) & allowed
+            sources.append((sq | moved, targets & pin_lines[sq] if bit & pinned else targets))
+        for base, targets in sources:
+            captures = targets & enemy
+            quiets = targets ^ captures
+            while captures:
+                bit = captures & -captures
+                captures ^= bit
+                end = bit.bit_length() - 1
+                append(base | end << TO_SHIFT | squares[square_120[end]] << CAPTURED_SHIFT)
+            while quiets:
+                bit = quiets & -quiets
+                quiets ^= bit
+                append(base | (bit.bit_length() - 1) << TO_SHIFT)
+
+        # Pawns move as a set: unpinned pawns together, then each pinned pawn with its pin line as the limit.
+        # Each target set is paired with the distance back to the pawn that reaches it.
+        pawn = (PAWN | color) << MOVED_SHIFT
+        pawns &= only
+        groups = [(pawns & ~pinned, target_mask)]
+        pinned_pawns = pawns & pinned
+        while pinned_pawns:
+            bit = pinned_pawns & -pinned_pawns
+            pinned_pawns ^= bit
+            groups.append((bit, target_mask & pin_lines[bit.bit_length() - 1]))
+        for group, limit in groups:
+            if side == 0:
+                single = group >> 8 & empty
+                doubles = (single & WHITE_DOUBLE_PUSH_RANK) >> 8 & empty & limit
+                left = (group & NOT_A_FILE) >> 9 & enemy & limit
+                right = (group & NOT_H_FILE) >> 7 & enemy & limit
+                steps = (9, 7, 8, 16)
+            else:
+                single = group << 8 & empty
+                doubles = (single & BLACK_DOUBLE_PUSH_RANK) << 8 & empty & limit
+                left = (group & NOT_A_FILE) << 7 & enemy & limit
+                right = (group & NOT_H_FILE) << 9 & enemy & limit
+                steps = (-7, -9, -8, -16)
+            pushes = single & limit
+            # A push only counts as tactical when it promotes
+            if kind == TACTICAL_MOVES:
+                pushes &= promotion_rank
+                doubles = 0
+            elif kind == QUIET_MOVES:
+                pushes &= FULL ^ promotion_rank
+                left = right = 0
+            for targets, back in zip((left, right, pushes, doubles), steps):
+                while targets:
+                    bit = targets & -targets
+                    targets ^= bit
+                    end = bit.bit_length() - 1
+                    move = (end + back) | end << TO_SHIFT | pawn | squares[square_120[end]] << CAPTURED_SHIFT
+                    if bit & promotion_rank:
+                        for promotion in PROMOTIONS:
+                            append(move | promotion)
+                    else:
+                        append(move)
+
+        if self.enpassant_square and kind != QUIET_MOVES:
+            ep_sq = SQ64[self.enpassant_square]
+            ep_bit = 1 << ep_sq
+            captured_bit = ep_bit << 8 if side == 0 else ep_bit >> 8
+            enemy_pawn = PAWN | (color ^ BLACK)
+            candidates = PAWN_ATTACKS[side ^ 1][ep_sq] & pawns
+            while candidates:
+                bit = candidates & -candidates
+                candidates ^= bit
+                # Replay the capture on the occupancy and test the king directly: this covers pins, the
+                # two-pawn discovered rank check, and capturing a checking pawn in one go.
+                after = occupied ^ bit ^ captured_bit | ep_bit
+                if not (knight_attacks[king_sq] & e_knights or pawn_attacks[king_sq] & e_pawns & ~captured_bit
+                        or rook_tables[king_sq][after & rook_masks[king_sq]] & e_rook_queens
+                        or bishop_tables[king_sq][after & bishop_masks[king_sq]] & e_bishop_queens):
+                    append((bit.bit_length() - 1) | ep_sq << TO_SHIFT | pawn | ENPASSANT_FLAG
+                           | enemy_pawn << CAPTURED_SHIFT)
+
+        return moves
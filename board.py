@@ -29,15 +29,28 @@ class Board():
             'P': 'wp'
         }
         self.white_to_move = True
+        self.castling = "-"
+        self.enpassant = ()
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
         self.load_fen(fen_str)
 
     def load_fen(self, fen):
         # Split the FEN string
-        parts = fen.split(" ")
+        parts = fen.split()
         # Set the board from the first part
         self.set_board_from_fen(parts[0])
         # Set the turn
-        self.white_to_move = parts[1] == "w"
+        self.white_to_move = len(parts) < 2 or parts[1] == "w"
+        # Castling availability, e.g. "KQkq" or "-"
+        self.castling = parts[2] if len(parts) > 2 else "-"
+        # En passant target square as (row, col)
+        if len(parts) > 3 and parts[3] != "-":
+            self.enpassant = (8 - int(parts[3][1]), ord(parts[3][0]) - ord("a"))
+        # Move counters
+        if len(parts) > 5:
+            self.halfmove_clock = int(parts[4])
+            self.fullmove_number = int(parts[5])
 
     def set_board_from_fen(self, fen_board):
         rows = fen_board.split("/")
@@ -48,7 +61,6 @@ class Board():
                 if char.isdigit():
                     c += int(char)  # Skip the empty squares
                 else:
-                    print(f"Processing piece: {char}")  # Debugging line
                     if c < 8:  # Ensure column index is within bounds
                         if char in self.piece_mapping:  # Ensure the piece is recognized
                             self.board[r][c] = self.piece_mapping[char]  # Place the piece
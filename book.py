@@ -0,0 +1,208 @@
+"""Opening book: a sorted file of (position key, move, weight) entries, searched through mmap.
+
+    python book.py build games.pgn [more.pgn ...] --plies 24
+    python book.py probe "<fen>"
+
+The layout follows Polyglot: 16-byte big-endian entries (key 64, move 16, weight 16, learn 32 bits)
+sorted by key, so all moves of a position are adjacent and found by binary search. It is keyed by
+this engine's Zobrist keys rather than Polyglot's, and the move is the packed short form
+(Move.encode()), so a header records the Zobrist version the keys were made with.
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import engine
+import pgn
+import zobrist
+from move import Move, SHORT_MASK
+
+BOOK_MAGIC = b"CHESSBK\0"
+BOOK_FORMAT_VERSION = 1
+HEADER_STRUCT = struct.Struct(">8sII")  # magic, format, zobrist version
+ENTRY_STRUCT = struct.Struct(">QHHI")  # key, move, weight, learn
+KEY_STRUCT = struct.Struct(">Q")
+HEADER_BYTES = ENTRY_STRUCT.size  # The header fills one entry slot, keeping the entries aligned
+ENTRY_BYTES = ENTRY_STRUCT.size
+MAX_WEIGHT = 0xFFFF
+
+BOOK_FILE = "assets/book/book.bin"  # Where ChessAI looks for a book, and where build writes one
+
+# Weight a move earns for each game it was played in, by the result for the side that played it
+WIN_WEIGHT, DRAW_WEIGHT, LOSS_WEIGHT = 2, 1, 0
+BOOK_PLIES = 24
+
+
+class OpeningBook:
+    """Read-only view of a book file. Lookups touch only the pages the binary search visits."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        try:
+            size = os.path.getsize(filename)
+            if size < HEADER_BYTES or (size - HEADER_BYTES) % ENTRY_BYTES:
+                raise ValueError("not a book file")
+            magic, book_format, zobrist_version = HEADER_STRUCT.unpack(self._file.read(HEADER_STRUCT.size))
+            if magic != BOOK_MAGIC or book_format != BOOK_FORMAT_VERSION:
+                raise ValueError("not a book file")
+            if zobrist_version != zobrist.ZOBRIST_VERSION:
+                raise ValueError("book built with other Zobrist keys")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, struct.error):
+            self._file.close()
+            raise
+        self.size = (size - HEADER_BYTES) // ENTRY_BYTES
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _key_at(self, index: int) -> int:
+        return KEY_STRUCT.unpack_from(self._mmap, HEADER_BYTES + index * ENTRY_BYTES)[0]
+
+    def moves(self, key: int) -> List[Tuple[int, int]]:
+        """(short move, weight) pairs stored for key, heaviest first."""
+        low, high = 0, self.size
+        while low < high:  # First entry with a key >= key
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        for index in range(low, self.size):
+            entry_key, move, weight, _ = ENTRY_STRUCT.unpack_from(self._mmap, HEADER_BYTES + index * ENTRY_BYTES)
+            if entry_key != key:
+                break
+            moves.append((move, weight))
+        return moves
+
+    def pick_move(self, gs, weighted: bool = True, rng: Optional[random.Random] = None) -> int:
+        """A legal packed book move for gs, or 0 if it is out of book.
+
+        weighted picks at random in proportion to the weights (for variety), otherwise the heaviest move.
+        """
+        candidates = []
+        for move, weight in self.moves(gs.zobrist_key):
+            legal = gs.legal_move_from_code(move)  # Guards against key collisions
+            if legal and weight:
+                candidates.append((legal, weight))
+        if not candidates:
+            return 0
+        if not weighted:
+            return candidates[0][0]
+        return (rng or random).choices([move for move, _ in candidates], [weight for _, weight in candidates])[0]
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+def result_weights(result: str) -> Tuple[int, int]:
+    """Weight per move for white and for black in a game with this result."""
+    if result == "1-0":
+        return WIN_WEIGHT, LOSS_WEIGHT
+    if result == "0-1":
+        return LOSS_WEIGHT, WIN_WEIGHT
+    return DRAW_WEIGHT, DRAW_WEIGHT
+
+
+def collect(games: Iterable[Tuple[Dict[str, str], List[str]]], plies: int = BOOK_PLIES,
+            min_games: int = 1) -> Tuple[Dict[Tuple[int, int], int], int]:
+    """Total weight of each (key, short move) over the first plies of each game, and the number of games
+    read. Moves played in fewer than min_games games are dropped. A game is cut off at a move that doesn't parse.
+    """
+    weights = defaultdict(int)
+    counts = defaultdict(int)
+    games_read = 0
+    for headers, sans in games:
+        games_read += 1
+        white_weight, black_weight = result_weights(headers.get("Result", "*"))
+        gs = engine.GameState(headers.get("FEN"))
+        for san in sans[:plies]:
+            move = pgn.parse_san(gs, san)
+            if not move:
+                break
+            entry = (gs.zobrist_key, move & SHORT_MASK)
+            weights[entry] += white_weight if gs.white_to_move else black_weight
+            counts[entry] += 1
+            gs.make_move(move)
+    return {entry: weight for entry, weight in weights.items() if counts[entry] >= min_games}, games_read
+
+
+def write_book(filename: str, weights: Dict[Tuple[int, int], int]) -> int:
+    """Write the entries sorted by key (heaviest move first) and return how many were written.
+
+    Moves that never earned any weight are left out, and each position's weights are scaled down
+    together if its heaviest move doesn't fit in 16 bits.
+    """
+    by_key = defaultdict(list)
+    for (key, move), weight in weights.items():
+        if weight > 0:
+            by_key[key].append((weight, move))
+
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    written = 0
+    with open(filename, "wb") as f:
+        header = HEADER_STRUCT.pack(BOOK_MAGIC, BOOK_FORMAT_VERSION, zobrist.ZOBRIST_VERSION)
+        f.write(header.ljust(HEADER_BYTES, b"\0"))
+        for key in sorted(by_key):
+            moves = sorted(by_key[key], reverse=True)
+            scale = max(1.0, moves[0][0] / MAX_WEIGHT)
+            for weight, move in moves:
+                f.write(ENTRY_STRUCT.pack(key, move, max(1, int(weight / scale)), 0))
+                written += 1
+    return written
+
+
+def build(pgn_files: List[str], out: str, plies: int = BOOK_PLIES, min_games: int = 1) -> Tuple[int, int]:
+    """Compile PGN files into a book at out; returns (games read, entries written)."""
+    def games():
+        for path in pgn_files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield from pgn.read_games(f)
+
+    weights, games_read = collect(games(), plies, min_games)
+    return games_read, write_book(out, weights)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="compile PGN files into a book")
+    build_parser.add_argument("pgn", nargs="+")
+    build_parser.add_argument("--out", default=BOOK_FILE)
+    build_parser.add_argument("--plies", type=int, default=BOOK_PLIES, help="book depth in half-moves")
+    build_parser.add_argument("--min-games", type=int, default=1, help="drop moves played in fewer games")
+    probe_parser = commands.add_parser("probe", help="list the book moves of a position")
+    probe_parser.add_argument("fen", nargs="?", help="default: the start position")
+    probe_parser.add_argument("--book", default=BOOK_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        games_read, written = build(args.pgn, args.out, args.plies, args.min_games)
+        print(f"{games_read} games, {written} entries written to {args.out}")
+        return 0
+
+    book = OpeningBook(args.book)
+    gs = engine.GameState(args.fen)
+    moves = book.moves(gs.zobrist_key)
+    total = sum(weight for _, weight in moves) or 1
+    for move, weight in moves:
+        legal = gs.legal_move_from_code(move)
+        if legal:
+            print(f"{gs.get_san(legal):>7} {Move.from_code(legal).get_chess_notation():>6} {weight:>6} "
+                  f"{weight / total:6.1%}")
+    if not moves:
+        print("Not in book")
+    book.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,3 +13,6 @@ BLACK_PLAYER = "human"
 PLAYER1 = WHITE_PLAYER == "human"
 
 PLAYER2 = BLACK_PLAYER == "human"
+
+# Let the AI think on the human's time, searching the reply it expects
+PONDER = True
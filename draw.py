@@ -71,12 +71,12 @@ def draw_pieces(screen, board, dragger=None):
 def draw_move_log(screen, gs, font):
     move_log_rect = p.Rect(BOARD_WIDTH, 0, MOVE_LOG_PANEL_WIDTH, MOVE_LOG_PANEL_HEIGHT)
     p.draw.rect(screen, p.Color("Black"), move_log_rect)
-    move_log = gs.move_log
+    move_log = gs.get_move_log_san()
     move_texts = []
     for i in range(0, len(move_log), 2):
-        move_string = str(i // 2 + 1) + ". " + str(move_log[i]) + " " * 30
+        move_string = str(i // 2 + 1) + ". " + move_log[i] + " " * 30
         if i + 1 < len(move_log):
-            move_string += str(move_log[i + 1]) + "  "
+            move_string += move_log[i + 1] + "  "
         move_texts.append(move_string)
     padding = 5
     line_spacing = 2
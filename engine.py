@@ -1,76 +1,218 @@
 from board import Board
-from move import Move
+from move import (Move, TO_SHIFT, PROMOTION_SHIFT, ENPASSANT_FLAG, CASTLE_FLAG, CAPTURED_SHIFT, MOVED_SHIFT,
+                  SQUARE_MASK, SHORT_MASK, PROMOTION_MASK, CAPTURED_MASK, PROMOTIONS)
 from castle_rights import CastleRights
+import zobrist
+import evaluation
+from mailbox_board import (EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, TYPE_MASK, COLOR_MASK, WHITE, BLACK,
+                           WP, WN, WR, WQ, WK, BP, BN, BR, BQ, BK, NORTH, SOUTH, EAST, WEST, ORTHOGONAL, DIAGONAL,
+                           BOARD_SQUARES, SQ120, SQUARE_120, SQ64, ROW_OF, COL_OF, RAYS, KNIGHT_TARGETS,
+                           KING_TARGETS, PIECE_NAMES, PIECE_CODES, BoardView, empty_board)
+
+# (row, col) of every mailbox square, so moves can be built without arithmetic
+ROW_COL = [(ROW_OF[sq], COL_OF[sq]) for sq in range(120)]
+
+# Packed move fields of every mailbox square: FROM_BITS[sq] | TO_BITS[end] | piece << MOVED_SHIFT ...
+FROM_BITS = [max(sq64, 0) for sq64 in SQ64]
+TO_BITS = [max(sq64, 0) << TO_SHIFT for sq64 in SQ64]
+
+SLIDER_DIRECTIONS = {BISHOP: DIAGONAL, ROOK: ORTHOGONAL, QUEEN: ORTHOGONAL + DIAGONAL}
+
+# Which moves a generator produces: all of them, captures and promotions only, or the rest
+ALL_MOVES, TACTICAL_MOVES, QUIET_MOVES = 0, 1, 2
+
+# Corner and king squares whose vacating (or capture) removes castle rights
+WHITE_KING_START, BLACK_KING_START = SQ120[7][4], SQ120[0][4]
+WHITE_KING_ROOK, WHITE_QUEEN_ROOK = SQ120[7][7], SQ120[7][0]
+BLACK_KING_ROOK, BLACK_QUEEN_ROOK = SQ120[0][7], SQ120[0][0]
+CASTLE_SQUARES = frozenset((WHITE_KING_START, BLACK_KING_START, WHITE_KING_ROOK, WHITE_QUEEN_ROOK,
+                            BLACK_KING_ROOK, BLACK_QUEEN_ROOK))
 
 
 class GameState():
-    def __init__(self) -> None:
+    backend = "mailbox"
+
+    def __init__(self, fen=None) -> None:
         self.fen_string = ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
                            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
                            "4r3/4r3/4k3/8/8/8/8/4K3 w - - 0 1", "8/k7/3p4/p2P1p2/P2P1P2/8/8/K7 w - - 0 1",
                            "qrb5/rk1p1K2/p2P4/Pp6/1N2n3/6p1/5nB1/6b1 w - - 0 1",
                            "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"]
 
-        self.fen_obj = Board(self.fen_string[0])
-        self.board = self.fen_obj.board
-        self.move_functions = {'p': self.get_pawn_moves, 'R': self.get_rook_moves, 'N': self.get_knight_moves,
-                               'B': self.get_bishop_moves, 'Q': self.get_queen_moves, 'K': self.get_king_moves}
+        self.start_fen = self.fen_string[0] if fen is None else fen  # move_log is played from here
+        self.fen_obj = Board(self.start_fen)
+
+        # Flat 10x12 mailbox of piece codes; self.board is a read-only 'wN'-style view for the GUI
+        self.squares = empty_board()
+        for row in range(8):
+            for col in range(8):
+                self.squares[SQ120[row][col]] = PIECE_CODES[self.fen_obj.board[row][col]]
+        self.board = BoardView(self.squares)
+
+        self.move_functions = {PAWN: self.get_pawn_moves, ROOK: self.get_rook_moves, KNIGHT: self.get_knight_moves,
+                               BISHOP: self.get_bishop_moves, QUEEN: self.get_queen_moves, KING: self.get_king_moves}
 
         self.white_to_move = self.fen_obj.white_to_move
         self.move_log = []
-        self.classical_move_log = []
-        self.white_king_location = (7, 4)
-        self.black_king_location = (0, 4)
+        self.san_log = []  # (move, SAN) pairs, filled in on demand by get_move_log_san
+        self.white_king_sq = self.squares.index(WK)
+        self.black_king_sq = self.squares.index(BK)
         self.in_check = False
-        self.pins = []
+        self.pins = {}  # Pinned square -> direction from the king along the pin, see update_attack_info
         self.checks = []
+        self.attacked = bytearray(120)
+        self.evasion_squares = ()
+        self.enpassant_pinned = 0
+        self.attack_key = None  # Zobrist key of the position the attack information above describes
         self.checkmate = False
         self.stalemate = False
         self.three_fold_repitition = False
-        self.enpassant_possible = ()
-        self.enpassant_possible_log = [self.enpassant_possible]
-        self.current_castle_right = CastleRights(True, True, True, True)
-        self.castle_rights_log = [
-            CastleRights(self.current_castle_right.wks, self.current_castle_right.bks, self.current_castle_right.wqs,
-                         self.current_castle_right.bqs)]
+        self.enpassant_square = SQ120[self.fen_obj.enpassant[0]][self.fen_obj.enpassant[1]] \
+            if self.fen_obj.enpassant else 0
+        self.enpassant_square_log = [self.enpassant_square]
+        castling = self.fen_obj.castling
+        self.current_castle_right = CastleRights('K' in castling, 'k' in castling, 'Q' in castling, 'q' in castling)
+        self.castle_rights_log = [self.current_castle_right]
+        self.zobrist_key = zobrist.compute_key(self)
+        self.zobrist_key_log = [self.zobrist_key]
+        # Integer centipawns from white's view, updated incrementally like the Zobrist key
+        self.material_score, self.positional_score = evaluation.compute_scores(self.squares)
+        self.score_log = [(self.material_score, self.positional_score)]
+        self.piece_count = sum(1 for sq in BOARD_SQUARES if self.squares[sq])  # Kings included
+
+    @property
+    def white_king_location(self):
+        return ROW_COL[self.white_king_sq]
+
+    @property
+    def black_king_location(self):
+        return ROW_COL[self.black_king_sq]
+
+    @property
+    def classical_move_log(self):
+        return self.get_move_log_san()
+
+    @property
+    def enpassant_possible(self):
+        return ROW_COL[self.enpassant_square] if self.enpassant_square else ()
+
+    def get_fen(self):
+        fen_letters = {v: k for k, v in self.fen_obj.piece_mapping.items()}
+        fen_rows = []
+        for row in range(8):
+            fen_row = ""
+            empty_count = 0
+            for sq in SQ120[row]:
+                piece = self.squares[sq]
+                if piece == EMPTY:
+                    empty_count += 1
+                else:
+                    if empty_count:
+                        fen_row += str(empty_count)
+                        empty_count = 0
+                    fen_row += fen_letters[PIECE_NAMES[piece]]
+            if empty_count:
+                fen_row += str(empty_count)
+            fen_rows.append(fen_row)
+
+        rights = self.current_castle_right
+        castling = ("K" if rights.wks else "") + ("Q" if rights.wqs else "") + \
+                   ("k" if rights.bks else "") + ("q" if rights.bqs else "")
+        enpassant = Move.cols_to_files[COL_OF[self.enpassant_square]] + Move.rows_to_ranks[ROW_OF[
+            self.enpassant_square]] if self.enpassant_square else "-"
+
+        # Half-moves since the last pawn move or capture
+        halfmove_clock = 0
+        for move in reversed(self.move_log):
+            if move >> MOVED_SHIFT & TYPE_MASK == PAWN or move & CAPTURED_MASK:
+                break
+            halfmove_clock += 1
+        else:
+            halfmove_clock += self.fen_obj.halfmove_clock
+        fullmove_number = self.fen_obj.fullmove_number + (len(self.move_log) + (not self.fen_obj.white_to_move)) // 2
+
+        return f"{'/'.join(fen_rows)} {'w' if self.white_to_move else 'b'} {castling or '-'} {enpassant} " \
+               f"{halfmove_clock} {fullmove_number}"
 
     def make_move(self, move):
-        self.board[move.start_row][move.start_col] = "--"
-        self.board[move.end_row][move.end_col] = move.piece_moved
+        if move.__class__ is not int:
+            move = move.code  # A Move from get_valid_moves (the GUI); the search passes packed moves
+        squares = self.squares
+        piece_keys = zobrist.PIECE_SQUARE_KEYS
+        piece_square = evaluation.PIECE_SQUARE
+        start = SQUARE_120[move & SQUARE_MASK]
+        end = SQUARE_120[move >> TO_SHIFT & SQUARE_MASK]
+        piece = squares[start]
+
+        # The key is updated incrementally: XOR out every piece that leaves a square and the old
+        # en passant file, XOR in every piece that lands on a square and the new state.
+        key = self.zobrist_key ^ zobrist.SIDE_KEY
+        if self.enpassant_square:
+            key ^= zobrist.EN_PASSANT_KEYS[COL_OF[self.enpassant_square]]
+
+        material = self.material_score
+        positional = self.positional_score - piece_square[piece][start]
+
+        captured_sq = end
+        if move & ENPASSANT_FLAG:
+            captured_sq = end + SOUTH if end < start else end + NORTH
+        captured = squares[captured_sq]
+        if captured:
+            key ^= piece_keys[captured][captured_sq]
+            material -= evaluation.MATERIAL[captured]
+            positional -= piece_square[captured][captured_sq]
+            squares[captured_sq] = EMPTY
+            self.piece_count -= 1
+
+        key ^= piece_keys[piece][start]
+        squares[start] = EMPTY
+        if move & PROMOTION_MASK:
+            material -= evaluation.MATERIAL[piece]
+            piece = (piece & COLOR_MASK) | ((move >> PROMOTION_SHIFT & 7) + 1)
+            material += evaluation.MATERIAL[piece]
+        squares[end] = piece
+        key ^= piece_keys[piece][end]
+        positional += piece_square[piece][end]
+
         self.move_log.append(move)
-        self.classical_move_log.append(str(move))
         self.white_to_move = not self.white_to_move
 
-        if move.piece_moved == 'wK':
-            self.white_king_location = (move.end_row, move.end_col)
-        elif move.piece_moved == 'bK':
-            self.black_king_location = (move.end_row, move.end_col)
-
-        if move.is_pawn_promotion:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + move.promoted_piece
+        if piece == WK:
+            self.white_king_sq = end
+        elif piece == BK:
+            self.black_king_sq = end
 
-        if move.is_enpassant_move:
-            self.board[move.start_row][move.end_col] = '--'
-
-        if move.piece_moved[1] == 'p' and abs(move.start_row - move.end_row) == 2:
-            self.enpassant_possible = (int((move.start_row + move.end_row) // 2), move.start_col)
+        if piece & TYPE_MASK == PAWN and (end - start == 20 or start - end == 20):
+            self.enpassant_square = (start + end) // 2
+            key ^= zobrist.EN_PASSANT_KEYS[COL_OF[end]]
         else:
-            self.enpassant_possible = ()
+            self.enpassant_square = 0
 
-        if move.is_castle_move:
-            if move.end_col - move.start_col == 2:
-                self.board[move.end_row][move.end_col - 1] = self.board[move.end_row][move.end_col + 1]
-                self.board[move.end_row][move.end_col + 1] = '--'
+        if move & CASTLE_FLAG:
+            if end > start:
+                rook_start, rook_end = end + 1, end - 1
             else:
-                self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 2]
-                self.board[move.end_row][move.end_col - 2] = '--'
-
-        self.enpassant_possible_log.append(self.enpassant_possible)
-
-        self.update_castle_rights(move)
-        self.castle_rights_log.append(
-            CastleRights(self.current_castle_right.wks, self.current_castle_right.bks, self.current_castle_right.wqs,
-                         self.current_castle_right.bqs))
+                rook_start, rook_end = end - 2, end + 1
+            rook = squares[rook_start]
+            squares[rook_end] = rook
+            squares[rook_start] = EMPTY
+            key ^= piece_keys[rook][rook_start] ^ piece_keys[rook][rook_end]
+            positional += piece_square[rook][rook_end] - piece_square[rook][rook_start]
+
+        self.enpassant_square_log.append(self.enpassant_square)
+
+        # Logged CastleRights are never mutated, so the entry can be shared until the rights change
+        if start in CASTLE_SQUARES or end in CASTLE_SQUARES:
+            key ^= zobrist.CASTLE_KEYS[zobrist.castle_index(self.current_castle_right)]
+            self.update_castle_rights(start, end)
+            key ^= zobrist.CASTLE_KEYS[zobrist.castle_index(self.current_castle_right)]
+        self.castle_rights_log.append(self.current_castle_right)
+
+        self.zobrist_key = key
+        self.zobrist_key_log.append(key)
+        self.material_score = material
+        self.positional_score = positional
+        self.score_log.append((material, positional))
 
         if len(self.move_log) >= 10:
             if (self.move_log[-1] == self.move_log[-5] and self.move_log[-1] == self.move_log[-9] and self.move_log[
@@ -83,105 +225,109 @@ class GameState():
     def undo_move(self):
         if len(self.move_log) != 0:
             move = self.move_log.pop()
-
-            self.board[move.start_row][move.start_col] = move.piece_moved
-            self.board[move.end_row][move.end_col] = move.piece_captured
-            self.white_to_move = not self.white_to_move
-
-            if move.piece_moved == 'wK':
-                self.white_king_location = (move.start_row, move.start_col)
-            elif move.piece_moved == 'bK':
-                self.black_king_location = (move.start_row, move.start_col)
-
-            if move.is_enpassant_move:
-                self.board[move.end_row][move.end_col] = '--'
-                self.board[move.start_row][move.end_col] = move.piece_captured
-
-            self.enpassant_possible_log.pop()
-            self.enpassant_possible = self.enpassant_possible_log[-1]
-
-        if move.is_castle_move:
-            if move.end_col - move.start_col == 2:
-                self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 1]
-                self.board[move.end_row][move.end_col - 1] = '--'
+            squares = self.squares
+            start = SQUARE_120[move & SQUARE_MASK]
+            end = SQUARE_120[move >> TO_SHIFT & SQUARE_MASK]
+
+            piece = squares[end]
+            if move & PROMOTION_MASK:
+                piece = (piece & COLOR_MASK) | PAWN
+            squares[start] = piece
+            squares[end] = EMPTY
+            captured = move >> CAPTURED_SHIFT & 15
+            if move & ENPASSANT_FLAG:
+                squares[end + SOUTH if end < start else end + NORTH] = captured
             else:
-                self.board[move.end_row][move.end_col - 2] = self.board[move.end_row][move.end_col + 1]
-                self.board[move.end_row][move.end_col + 1] = '--'
-
-        self.castle_rights_log.pop()
-        self.current_castle_right = self.castle_rights_log[-1]
-
-        self.checkmate = False
-        self.stalemate = False
-
-    def update_castle_rights(self, move):
-        if move.piece_moved == 'wK':
-            self.current_castle_right.wks = False
-            self.current_castle_right.wqs = False
-        elif move.piece_moved == 'bK':
-            self.current_castle_right.bks = False
-            self.current_castle_right.bqs = False
-        elif move.piece_moved == 'wR':
-            if move.start_row == 7:
-                if move.start_col == 0:
-                    self.current_castle_right.wqs = False
-                elif move.start_col == 7:
-                    self.current_castle_right.wks = False
-        elif move.piece_moved == 'bR':
-            if move.start_row == 0:
-                if move.start_col == 0:
-                    self.current_castle_right.bqs = False
-                elif move.start_col == 7:
-                    self.current_castle_right.bks = False
+                squares[end] = captured
+            if captured:
+                self.piece_count += 1
+            self.white_to_move = not self.white_to_move
 
-    def get_valid_moves(self):
-        temp_enpassant_possible = self.enpassant_possible
-        moves = []
-        self.in_check, self.pins, self.checks = self.checks_for_pins_and_checks()
+            if piece == WK:
+                self.white_king_sq = start
+            elif piece == BK:
+                self.black_king_sq = start
 
-        if self.white_to_move:
-            king_row = self.white_king_location[0]
-            king_col = self.white_king_location[1]
-        else:
-            king_row = self.black_king_location[0]
-            king_col = self.black_king_location[1]
+            self.enpassant_square_log.pop()
+            self.enpassant_square = self.enpassant_square_log[-1]
 
-        if self.in_check:
-            self.move_log[-1].makes_check = True
+            if move & CASTLE_FLAG:
+                if end > start:
+                    rook_start, rook_end = end + 1, end - 1
+                else:
+                    rook_start, rook_end = end - 2, end + 1
+                squares[rook_start] = squares[rook_end]
+                squares[rook_end] = EMPTY
 
-            if len(self.checks) == 1:
-                moves = self.get_all_possible_moves()
+            self.castle_rights_log.pop()
+            self.current_castle_right = self.castle_rights_log[-1]
 
-                check = self.checks[0]
+            self.zobrist_key_log.pop()
+            self.zobrist_key = self.zobrist_key_log[-1]
+            self.score_log.pop()
+            self.material_score, self.positional_score = self.score_log[-1]
 
-                check_row = check[0]
-                check_col = check[1]
+            self.checkmate = False
+            self.stalemate = False
 
-                piece_checking = self.board[check_row][check_col]
-                valid_squares = []
+    def make_null_move(self):
+        """Pass the turn without moving (null-move pruning). Undo it with undo_null_move, not undo_move.
 
-                if piece_checking[1] == 'N':
-                    valid_squares = [(check_row, check_col)]
-                else:
-                    for i in range(1, 8):
-                        valid_square = (king_row + check[2] * i, king_col + check[3] * i)
-                        valid_squares.append(valid_square)
+        Only the side to move, en passant square and key change; nothing is added to move_log.
+        """
+        key = self.zobrist_key ^ zobrist.SIDE_KEY
+        if self.enpassant_square:
+            key ^= zobrist.EN_PASSANT_KEYS[COL_OF[self.enpassant_square]]
+        self.white_to_move = not self.white_to_move
+        self.enpassant_square = 0
+        self.enpassant_square_log.append(0)
+        self.zobrist_key = key
+        self.zobrist_key_log.append(key)
 
-                        if valid_square[0] == check_row and valid_square[1] == check_col:
-                            break
+    def undo_null_move(self):
+        self.white_to_move = not self.white_to_move
+        self.enpassant_square_log.pop()
+        self.enpassant_square = self.enpassant_square_log[-1]
+        self.zobrist_key_log.pop()
+        self.zobrist_key = self.zobrist_key_log[-1]
+
+    def has_non_pawn_material(self):
+        """Whether the side to move has anything besides pawns and its king (where zugzwang is rare)."""
+        low, high = (WN, WQ) if self.white_to_move else (BN, BQ)
+        squares = self.squares
+        for sq in BOARD_SQUARES:
+            if low <= squares[sq] <= high:
+                return True
+        return False
+
+    def update_castle_rights(self, start, end):
+        rights = self.current_castle_right
+        wks, bks, wqs, bqs = rights.wks, rights.bks, rights.wqs, rights.bqs
+
+        if start == WHITE_KING_START:
+            wks = wqs = False
+        elif start == BLACK_KING_START:
+            bks = bqs = False
+
+        # A rook leaving its corner, or being captured there, loses that side's right
+        for sq in (start, end):
+            if sq == WHITE_KING_ROOK:
+                wks = False
+            elif sq == WHITE_QUEEN_ROOK:
+                wqs = False
+            elif sq == BLACK_KING_ROOK:
+                bks = False
+            elif sq == BLACK_QUEEN_ROOK:
+                bqs = False
+
+        self.current_castle_right = CastleRights(wks, bks, wqs, bqs)
 
-                for i in range(len(moves) - 1, -1, -1):
-                    if moves[i].piece_moved[1] != 'K':
-                        if not (moves[i].end_row, moves[i].end_col) in valid_squares:
-                            moves.remove(moves[i])
-            else:
-                self.get_king_moves(king_row, king_col, moves)
-        else:
-            moves = self.get_all_possible_moves()
+    def get_valid_moves(self):
+        """Legal moves as Move objects, updating checkmate/stalemate (the GUI's entry point)."""
+        moves = [Move.from_code(move) for move in self.generate_legal_moves()]
 
         if len(moves) == 0:
             if self.in_check:
-                self.move_log[-1].makes_checkmate = True
                 self.checkmate = True
             else:
                 self.stalemate = True
@@ -189,413 +335,461 @@ class GameState():
             self.checkmate = False
             self.stalemate = False
 
-        self.enpassant_possible = temp_enpassant_possible
+        return moves
 
-        self.find_same_type_pieces(moves)
+    def get_san(self, move):
+        """Standard algebraic notation of a legal move in the current position.
+
+        This is display work (move log, PGN): it generates the legal moves here and after the move, so the
+        search never calls it.
+        """
+        code = move if move.__class__ is int else move.code
+        move = Move.from_code(code)
+        saved = (self.in_check, self.pins, self.checks, self.attacked, self.evasion_squares, self.enpassant_pinned,
+                 self.attack_key, self.checkmate, self.stalemate, self.three_fold_repitition)
+
+        # Name the file, else the rank, else both, if another piece of the same kind can reach the square
+        disambiguation = ""
+        if code >> MOVED_SHIFT & TYPE_MASK not in (PAWN, KING):
+            ambiguous = same_file = same_rank = False
+            for other in self.generate_legal_moves():
+                # Same moving piece and destination, different origin
+                if (other ^ code) & (15 << MOVED_SHIFT | SQUARE_MASK << TO_SHIFT) == 0 and \
+                        (other ^ code) & SQUARE_MASK:
+                    ambiguous = True
+                    same_file |= (other ^ code) & 7 == 0
+                    same_rank |= (other ^ code) & 0o70 == 0
+            if ambiguous:
+                if not same_file:
+                    disambiguation = Move.cols_to_files[move.start_col]
+                elif not same_rank:
+                    disambiguation = Move.rows_to_ranks[move.start_row]
+                else:
+                    disambiguation = move.get_rank_file(move.start_row, move.start_col)
 
+        self.make_move(code)
+        checks = ""
+        self.update_attack_info()
+        if self.in_check:
+            checks = "+" if self.generate_legal_moves() else "#"
+        self.undo_move()
+
+        (self.in_check, self.pins, self.checks, self.attacked, self.evasion_squares, self.enpassant_pinned,
+         self.attack_key, self.checkmate, self.stalemate, self.three_fold_repitition) = saved
+        return move.get_san(disambiguation, checks)
+
+    def get_move_log_san(self):
+        """SAN of every move played so far. Computed on demand and cached until the log changes under it."""
+        cache = self.san_log
+        move_log = self.move_log
+        valid = 0
+        while valid < len(cache) and valid < len(move_log) and cache[valid][0] == move_log[valid]:
+            valid += 1
+        del cache[valid:]
+
+        if valid < len(move_log):
+            # Step back to the first move without notation, then replay, naming each move before it is made
+            replay = move_log[valid:]
+            saved = (self.checkmate, self.stalemate, self.three_fold_repitition)
+            for _ in replay:
+                self.undo_move()
+            for move in replay:
+                cache.append((move, self.get_san(move)))
+                self.make_move(move)
+            self.checkmate, self.stalemate, self.three_fold_repitition = saved
+
+        return [san for _, san in cache]
+
+    def generate_legal_moves(self):
+        self.update_attack_info()
+
+        king_sq = self.white_king_sq if self.white_to_move else self.black_king_sq
+
+        if self.in_check and len(self.checks) > 1:
+            # Double check: only the king can move
+            moves = []
+            self.get_king_moves(king_sq, moves)
+            return moves
+
+        moves = self.get_all_possible_moves()
+        if self.in_check:
+            self.remove_non_evasions(moves, king_sq)
         return moves
 
-    def get_all_possible_moves(self):
+    def remove_non_evasions(self, moves, king_sq):
+        """Drop the moves that leave a single check standing (king moves are already legal)."""
+        check_sq = self.checks[0][0]
+        valid_squares = self.evasion_squares
+
+        captured_offset = SOUTH if self.white_to_move else NORTH
+        for i in range(len(moves) - 1, -1, -1):
+            move = moves[i]
+            if move >> MOVED_SHIFT & TYPE_MASK != KING:
+                end = SQUARE_120[move >> TO_SHIFT & SQUARE_MASK]
+                # An en passant capture resolves the check by removing the pawn that gave it
+                if move & ENPASSANT_FLAG and end + captured_offset == check_sq:
+                    continue
+                if end not in valid_squares:
+                    del moves[i]
+
+    def generate_captures(self):
+        """Generate only the legal captures (en passant included) and promotions, for quiescence search."""
+        return self._generate_moves(TACTICAL_MOVES)
+
+    def generate_quiets(self):
+        """Generate only the legal moves that generate_captures leaves out, for the move picker's last stages."""
+        return self._generate_moves(QUIET_MOVES)
+
+    def _generate_moves(self, kind):
+        self.update_attack_info()
+
+        king_sq = self.white_king_sq if self.white_to_move else self.black_king_sq
         moves = []
-        for r in range(len(self.board)):
-            for c in range(len(self.board[r])):
-                turn = self.board[r][c][0]
 
-                if (turn == "w" and self.white_to_move) or (turn == "b" and not self.white_to_move):
-                    piece = self.board[r][c][1]
-                    self.move_functions[piece](r, c, moves)
+        if self.in_check and len(self.checks) > 1:
+            self.get_king_moves(king_sq, moves, kind)
+            return moves
 
+        squares = self.squares
+        move_functions = self.move_functions
+        low, high = (WP, WK) if self.white_to_move else (BP, BK)
+        for sq in BOARD_SQUARES:
+            piece = squares[sq]
+            if low <= piece <= high:
+                move_functions[piece & TYPE_MASK](sq, moves, kind)
+
+        if self.in_check:
+            self.remove_non_evasions(moves, king_sq)
         return moves
 
-    def checks_for_pins_and_checks(self):
-        pins = []
-        checks = []
-        in_check = False
+    def legal_move_from_code(self, code):
+        """Return the legal packed move whose short form (Move.encode()) is code, or 0.
 
-        if self.white_to_move:
-            enemy_color = "b"
-            ally_color = "w"
-            start_row = self.white_king_location[0]
-            start_col = self.white_king_location[1]
-        else:
-            enemy_color = "w"
-            ally_color = "b"
-            start_row = self.black_king_location[0]
-            start_col = self.black_king_location[1]
-
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-
-        for j in range(len(directions)):
-            d = directions[j]
-            possible_pin = ()
-
-            for i in range(1, 8):
-                end_row = start_row + d[0] * i
-                end_col = start_col + d[1] * i
-
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] == ally_color and end_piece[1] != 'K':
-                        if possible_pin == ():
-                            possible_pin = (end_row, end_col, d[0], d[1])
-                        else:
-                            break
-                    elif end_piece[0] == enemy_color:
-                        piece_type = end_piece[1]
-
-                        if (0 <= j <= 3 and piece_type == 'R') or \
-                                (4 <= j <= 7 and piece_type == 'B') or \
-                                (i == 1 and piece_type == 'p' and ((enemy_color == 'w' and 6 <= j <= 7) or (
-                                        enemy_color == 'b' and 4 <= j <= 5))) or \
-                                (piece_type == 'Q') or (i == 1 and piece_type == 'K'):
-                            if possible_pin == ():
-                                in_check = True
-                                checks.append((end_row, end_col, d[0], d[1]))
-                                break
-                            else:
-                                pins.append(possible_pin)
-                                break
-                        else:
-                            break
-                else:
-                    break
-        knight_moves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+        Only the moves of the piece on the from square are generated, so the search can try a stored
+        hash move before (and often instead of) generating the whole list.
+        """
+        start = SQUARE_120[code & SQUARE_MASK]
+        piece = self.squares[start]
+        if not piece or piece & COLOR_MASK != (WHITE if self.white_to_move else BLACK):
+            return 0
 
-        for m in knight_moves:
-            end_row = start_row + m[0]
-            end_col = start_col + m[1]
+        self.update_attack_info()
+        if len(self.checks) > 1 and piece & TYPE_MASK != KING:
+            return 0
 
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
+        moves = []
+        self.move_functions[piece & TYPE_MASK](start, moves)
+        if self.in_check:
+            king_sq = self.white_king_sq if self.white_to_move else self.black_king_sq
+            self.remove_non_evasions(moves, king_sq)
+        for move in moves:
+            if move & SHORT_MASK == code:
+                return move
+        return 0
 
-                if end_piece[0] == enemy_color and end_piece[1] == 'N':
-                    in_check = True
-                    checks.append((end_row, end_col, m[0], m[1]))
+    def get_all_possible_moves(self):
+        moves = []
+        squares = self.squares
+        move_functions = self.move_functions
+        low, high = (WP, WK) if self.white_to_move else (BP, BK)
 
-        return in_check, pins, checks
+        for sq in BOARD_SQUARES:
+            piece = squares[sq]
+            if low <= piece <= high:
+                move_functions[piece & TYPE_MASK](sq, moves)
 
-    def get_pawn_moves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
+        return moves
 
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+    def update_attack_info(self):
+        """Work out, in one pass, everything move generation needs to know about the enemy's attacks.
+
+        in_check / checks     whether the king is attacked and the (square, direction from the king) of each checker
+        evasion_squares       with a single check, the squares that capture the checker or block its ray
+        pins                  pinned square -> direction from the king along the pin ray
+        attacked              1 on every square an enemy piece attacks, looking through our king so it can't
+                              step back along a checking ray
+        enpassant_pinned      our pawn that can't capture en passant because taking both pawns off the king's
+                              rank would uncover a rook or queen
+
+        The result is kept until the position changes, so the hash move, captures and quiet moves of one
+        node share it.
+        """
+        if self.attack_key == self.zobrist_key:
+            return
+        self.attack_key = self.zobrist_key
 
+        squares = self.squares
         if self.white_to_move:
-            move_amount = -1
-            start_row = 6
-            enemy_color = 'b'
-            ally_color = 'w'
-            king_row, king_col = self.white_king_location
+            enemy_low, enemy_high = BP, BK
+            ally_king = WK
+            ally_pawn = WP
+            pawn_directions = (NORTH + WEST, NORTH + EAST)
+            pawn_attacks = (SOUTH + WEST, SOUTH + EAST)
+            enemy_knight = BN
+            forward = NORTH
+            king_sq = self.white_king_sq
         else:
-            move_amount = 1
-            start_row = 1
-            enemy_color = 'w'
-            ally_color = 'b'
-            king_row, king_col = self.black_king_location
-
-        # if self.white_to_move:
-        if self.board[r + move_amount][c] == "--":
-            if not piece_pinned or pin_direction == (move_amount, 0):
-                moves.append(Move((r, c), (r + move_amount, c), self.board))
-                if r == start_row and self.board[r + 2 * move_amount][c] == "--":
-                    moves.append(Move((r, c), (r + 2 * move_amount, c), self.board))
-                if (ally_color == 'w' and r + move_amount == 0) or (ally_color == 'b' and r + move_amount == 7):
-                    for promoted_piece in {'Q', 'N', 'B', 'R'}:
-                        moves.append(Move((r, c), (r + move_amount, c), self.board, is_pawn_promotion=True,
-                                          promoted_piece=promoted_piece))
-
-        if c - 1 >= 0:
-            if not piece_pinned or pin_direction == (move_amount, -1):
-                if self.board[r + move_amount][c - 1][0] == enemy_color:
-                    if (ally_color == 'w' and r + move_amount == 0) or (ally_color == 'b' and r + move_amount == 7):
-                        for promoted_piece in {'Q', 'N', 'B', 'R'}:
-                            moves.append(Move((r, c), (r + move_amount, c - 1), self.board, is_pawn_promotion=True,
-                                              promoted_piece=promoted_piece))
-                    else:
-                        moves.append(Move((r, c), (r + move_amount, c - 1), self.board))
-                elif (r + move_amount, c - 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == r:
-                        if king_col < c:
-                            inside_range = range(king_col + 1, c - 1)
-                            outside_range = range(c + 1, 8)
-                        else:
-                            inside_range = range(king_col - 1, c, -1)
-                            outside_range = range(c - 2, -1, -1)
-
-                        for i in inside_range:
-                            if self.board[r][i] != "--":
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[r][i]
-
-                            if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((r, c), (r + move_amount, c - 1), self.board, is_enpassant_move=True))
-        if c + 1 <= 7:
-            if not piece_pinned or pin_direction == (move_amount, 1):
-                if self.board[r + move_amount][c + 1][0] == enemy_color:
-                    if (ally_color == 'w' and r + move_amount == 0) or (ally_color == 'b' and r + move_amount == 7):
-                        for promoted_piece in {'Q', 'N', 'B', 'R'}:
-                            moves.append(Move((r, c), (r + move_amount, c + 1), self.board, is_pawn_promotion=True,
-                                              promoted_piece=promoted_piece))
-                    else:
-                        moves.append(Move((r, c), (r + move_amount, c + 1), self.board))
-                elif (r + move_amount, c + 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == r:
-                        if king_col < c:
-                            inside_range = range(king_col + 2, c)
-                            outside_range = range(c + 2, 8)
-                        else:
-                            inside_range = range(king_col - 1, c + 1, -1)
-                            outside_range = range(c - 1, -1, -1)
-
-                        for i in inside_range:
-                            if self.board[r][i] != "--":
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[r][i]
-
-                            if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((r, c), (r + move_amount, c + 1), self.board, is_enpassant_move=True))
-
-        # else:
-        #     if self.board[r + 1][c] == "--":
-        #         if not piece_pinned or pin_direction == (1, 0):
-        #             moves.append(Move((r, c), (r + 1, c), self.board))
-        #             if r == 1 and self.board[r + 2][c] == "--":
-        #                 moves.append(Move((r, c), (r + 2, c), self.board))
-
-        #     if c - 1 >= 0:
-        #         if self.board[r + 1][c - 1][0] == "w":
-        #             if not piece_pinned or pin_direction == (1, -1):
-        #                 moves.append(Move((r, c), (r + 1, c - 1), self.board))
-        #         elif  (r + 1, c - 1) == self.enpassant_possible:
-        #             if not piece_pinned or pin_direction == (1, -1):
-        #                 moves.append(Move((r, c), (r + 1, c - 1), self.board, is_enpassant_move=True))
-        #     if c + 1 <= 7:
-        #         if self.board[r + 1][c + 1][0] == "w":
-        #             if not piece_pinned or pin_direction == (1, 1):
-        #                 moves.append(Move((r, c), (r + 1, c + 1), self.board))
-        #         elif  (r + 1, c + 1) == self.enpassant_possible:
-        #             if not piece_pinned or pin_direction == (1, 1):
-        #                 moves.append(Move((r, c), (r + 1, c - 1), self.board, is_enpassant_move=True))
-
-    def get_rook_moves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
-
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[r][c][1] != "Q":
-                    self.pins.remove(self.pins[i])
-                break
-
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))
-        enemy_color = "b" if self.white_to_move else "w"
-
-        for d in directions:
-            for i in range(1, 8):
-                end_row = r + d[0] * i
-                end_col = c + d[1] * i
-
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        end_piece = self.board[end_row][end_col]
-
-                        if end_piece == "--":
-                            moves.append(Move((r, c), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:
-                            moves.append(Move((r, c), (end_row, end_col), self.board))
-                            break
-                        else:
-                            break
+            enemy_low, enemy_high = WP, WK
+            ally_king = BK
+            ally_pawn = BP
+            pawn_directions = (SOUTH + WEST, SOUTH + EAST)
+            pawn_attacks = (NORTH + WEST, NORTH + EAST)
+            enemy_knight = WN
+            forward = SOUTH
+            king_sq = self.black_king_sq
+
+        attacked = bytearray(120)
+        for sq in BOARD_SQUARES:
+            piece = squares[sq]
+            if enemy_low <= piece <= enemy_high:
+                piece_type = piece & TYPE_MASK
+                if piece_type == PAWN:
+                    attacked[sq + pawn_attacks[0]] = 1
+                    attacked[sq + pawn_attacks[1]] = 1
+                elif piece_type == KNIGHT:
+                    for end_sq in KNIGHT_TARGETS[sq]:
+                        attacked[end_sq] = 1
+                elif piece_type == KING:
+                    for end_sq in KING_TARGETS[sq]:
+                        attacked[end_sq] = 1
                 else:
-                    break
-
-    def get_knight_moves(self, r, c, moves):
-        piece_pinned = False
-
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
-
-        knight_moves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-
-        ally_color = "w" if self.white_to_move else "b"
-
-        for m in knight_moves:
-            end_row = r + m[0]
-            end_col = c + m[1]
-
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                if not piece_pinned:
-                    end_piece = self.board[end_row][end_col]
+                    rays = RAYS[sq]
+                    for d in SLIDER_DIRECTIONS[piece_type]:
+                        for end_sq in rays[d]:
+                            attacked[end_sq] = 1
+                            end_piece = squares[end_sq]
+                            if end_piece != EMPTY and end_piece != ally_king:
+                                break
 
-                    if end_piece[0] != ally_color:
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
+        in_check = attacked[king_sq] == 1
+        pins = {}
+        checks = []
+        rays = RAYS[king_sq]
+        for slider, directions in ((ROOK, ORTHOGONAL), (BISHOP, DIAGONAL)):
+            for d in directions:
+                possible_pin = 0
+                adjacent = True
+
+                for end_sq in rays[d]:
+                    end_piece = squares[end_sq]
+                    if end_piece == EMPTY:
+                        adjacent = False
+                        continue
+                    if enemy_low <= end_piece <= enemy_high:
+                        piece_type = end_piece & TYPE_MASK
+                        if piece_type == slider or piece_type == QUEEN or (
+                                adjacent and piece_type == PAWN and d in pawn_directions):
+                            if possible_pin:
+                                pins[possible_pin] = d
+                            else:
+                                checks.append((end_sq, d))
+                        break
+                    if possible_pin:
+                        break
+                    possible_pin = end_sq
+                    adjacent = False
+
+        evasion_squares = ()
+        if in_check:
+            for end_sq in KNIGHT_TARGETS[king_sq]:
+                if squares[end_sq] == enemy_knight:
+                    checks.append((end_sq, end_sq - king_sq))
+            if len(checks) == 1:
+                check_sq, check_direction = checks[0]
+                if squares[check_sq] & TYPE_MASK == KNIGHT:
+                    evasion_squares = {check_sq}
+                else:
+                    evasion_squares = set()
+                    for end_sq in rays[check_direction]:
+                        evasion_squares.add(end_sq)
+                        if end_sq == check_sq:
+                            break
 
-    def get_bishop_moves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
+        # En passant takes two pawns off one rank at once, which the pin scan above can't see
+        enpassant_pinned = 0
+        if self.enpassant_square:
+            captured_sq = self.enpassant_square - forward
+            if ROW_OF[captured_sq] == ROW_OF[king_sq]:
+                blockers = []
+                for end_sq in rays[EAST if captured_sq > king_sq else WEST]:
+                    end_piece = squares[end_sq]
+                    if end_piece != EMPTY:
+                        blockers.append(end_sq)
+                        if len(blockers) == 3:
+                            break
+                if len(blockers) == 3 and captured_sq in blockers[:2]:
+                    pawn_sq = blockers[1] if blockers[0] == captured_sq else blockers[0]
+                    if squares[pawn_sq] == ally_pawn and squares[blockers[2]] & TYPE_MASK in (ROOK, QUEEN) and \
+                            enemy_low <= squares[blockers[2]] <= enemy_high:
+                        enpassant_pinned = pawn_sq
+
+        self.in_check = in_check
+        self.checks = checks
+        self.evasion_squares = evasion_squares
+        self.pins = pins
+        self.attacked = attacked
+        self.enpassant_pinned = enpassant_pinned
+
+    def enemy_attacks(self, sq64):
+        """Whether an enemy piece attacks (so defends, if one stands there) square sq64, 0 = a8 .. 63 = h1.
+
+        Read from the attack map of the last move generation, so only valid after generating moves in
+        this position.
+        """
+        return self.attacked[SQUARE_120[sq64]] == 1
+
+    def get_pin_direction(self, sq):
+        return self.pins.get(sq, 0)
+
+    def get_pawn_moves(self, sq, moves, kind=ALL_MOVES):
+        squares = self.squares
+        pin_direction = self.get_pin_direction(sq)
 
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-        directions = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+        if self.white_to_move:
+            forward = NORTH
+            start_row = 6
+            promotion_row = 0
+            enemy_low, enemy_high = BP, BK
+        else:
+            forward = SOUTH
+            start_row = 1
+            promotion_row = 7
+            enemy_low, enemy_high = WP, WK
+
+        base = FROM_BITS[sq] | squares[sq] << MOVED_SHIFT
+        end_sq = sq + forward
+        promotes = ROW_OF[end_sq] == promotion_row
+
+        # Promotions are tactical, other pushes quiet
+        if squares[end_sq] == EMPTY and (kind == ALL_MOVES or (kind == TACTICAL_MOVES) == promotes) and (
+                not pin_direction or pin_direction == forward or pin_direction == -forward):
+            if promotes:
+                for promotion in PROMOTIONS:
+                    moves.append(base | TO_BITS[end_sq] | promotion)
+            else:
+                moves.append(base | TO_BITS[end_sq])
+                if ROW_OF[sq] == start_row and squares[end_sq + forward] == EMPTY:
+                    moves.append(base | TO_BITS[end_sq + forward])
 
-        enemy_color = "b" if self.white_to_move else "w"
+        if kind == QUIET_MOVES:
+            return
+        for direction in (forward + WEST, forward + EAST):
+            if pin_direction and pin_direction != direction and pin_direction != -direction:
+                continue
+            end_sq = sq + direction
+            end_piece = squares[end_sq]
+            if enemy_low <= end_piece <= enemy_high:
+                move = base | TO_BITS[end_sq] | end_piece << CAPTURED_SHIFT
+                if promotes:
+                    for promotion in PROMOTIONS:
+                        moves.append(move | promotion)
+                else:
+                    moves.append(move)
+            elif end_sq == self.enpassant_square and sq != self.enpassant_pinned:
+                moves.append(base | TO_BITS[end_sq] | ENPASSANT_FLAG | squares[end_sq - forward] << CAPTURED_SHIFT)
+
+    def get_slider_moves(self, sq, moves, directions, kind=ALL_MOVES):
+        squares = self.squares
+        quiets = kind != TACTICAL_MOVES
+        captures = kind != QUIET_MOVES
+        pin_direction = self.get_pin_direction(sq)
+        enemy_low, enemy_high = (BP, BK) if self.white_to_move else (WP, WK)
+        base = FROM_BITS[sq] | squares[sq] << MOVED_SHIFT
+        rays = RAYS[sq]
 
         for d in directions:
-            for i in range(1, 8):
-                end_row = r + d[0] * i
-                end_col = c + d[1] * i
-
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        end_piece = self.board[end_row][end_col]
-
-                        if end_piece == "--":
-                            moves.append(Move((r, c), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:
-                            moves.append(Move((r, c), (end_row, end_col), self.board))
-                            break
-                        else:
-                            break
+            if pin_direction and pin_direction != d and pin_direction != -d:
+                continue
+            for end_sq in rays[d]:
+                end_piece = squares[end_sq]
+
+                if end_piece == EMPTY:
+                    if quiets:
+                        moves.append(base | TO_BITS[end_sq])
                 else:
+                    if captures and enemy_low <= end_piece <= enemy_high:
+                        moves.append(base | TO_BITS[end_sq] | end_piece << CAPTURED_SHIFT)
                     break
 
-    def get_queen_moves(self, r, c, moves):
-        self.get_rook_moves(r, c, moves)
-        self.get_bishop_moves(r, c, moves)
-
-    def get_king_moves(self, r, c, moves):
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
-
-        ally_color = "w" if self.white_to_move else "b"
-
-        for i in range(8):
-            end_row = r + row_moves[i]
-            end_col = c + col_moves[i]
-
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:  # Ensure the king doesn't move to a square occupied by its own piece
-                    # Temporarily move the king to the new square to check for checks
-                    original_king_location = (
-                        self.white_king_location if ally_color == 'w' else self.black_king_location)
-                    if ally_color == 'w':
-                        self.white_king_location = (end_row, end_col)
-                    else:
-                        self.black_king_location = (end_row, end_col)
-
-                    in_check, _, _ = self.checks_for_pins_and_checks()
+    def get_rook_moves(self, sq, moves, kind=ALL_MOVES):
+        self.get_slider_moves(sq, moves, ORTHOGONAL, kind)
 
-                    # Only add the move if it doesn't put the king in check
-                    if not in_check:
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-
-                    # Restore the original king location after the check
-                    if ally_color == 'w':
-                        self.white_king_location = original_king_location
-                    else:
-                        self.black_king_location = original_king_location
-
-        self.get_castle_moves(r, c, moves, ally_color)
+    def get_knight_moves(self, sq, moves, kind=ALL_MOVES):
+        if self.get_pin_direction(sq):
+            return
 
-    def get_castle_moves(self, r, c, moves, ally_color):
+        squares = self.squares
+        enemy_low, enemy_high = (BP, BK) if self.white_to_move else (WP, WK)
+        base = FROM_BITS[sq] | squares[sq] << MOVED_SHIFT
+        quiets = kind != TACTICAL_MOVES
+        captures = kind != QUIET_MOVES
+
+        for end_sq in KNIGHT_TARGETS[sq]:
+            end_piece = squares[end_sq]
+            if (end_piece == EMPTY and quiets) or (captures and enemy_low <= end_piece <= enemy_high):
+                moves.append(base | TO_BITS[end_sq] | end_piece << CAPTURED_SHIFT)
+
+    def get_bishop_moves(self, sq, moves, kind=ALL_MOVES):
+        self.get_slider_moves(sq, moves, DIAGONAL, kind)
+
+    def get_queen_moves(self, sq, moves, kind=ALL_MOVES):
+        self.get_slider_moves(sq, moves, ORTHOGONAL + DIAGONAL, kind)
+
+    def get_king_moves(self, sq, moves, kind=ALL_MOVES):
+        squares = self.squares
+        attacked = self.attacked
+        enemy_low, enemy_high = (BP, BK) if self.white_to_move else (WP, WK)
+        base = FROM_BITS[sq] | squares[sq] << MOVED_SHIFT
+        quiets = kind != TACTICAL_MOVES
+        captures = kind != QUIET_MOVES
+
+        for end_sq in KING_TARGETS[sq]:
+            end_piece = squares[end_sq]
+            # Ensure the king doesn't move to a square occupied by its own piece or one that is attacked
+            if not attacked[end_sq] and ((end_piece == EMPTY and quiets) or
+                                         (captures and enemy_low <= end_piece <= enemy_high)):
+                moves.append(base | TO_BITS[end_sq] | end_piece << CAPTURED_SHIFT)
+
+        if quiets:
+            self.get_castle_moves(sq, moves)
+
+    def get_castle_moves(self, sq, moves):
         if self.in_check:
             return
 
         if (self.white_to_move and self.current_castle_right.wks) or (
                 not self.white_to_move and self.current_castle_right.bks):
-            self.get_king_side_castle_moves(r, c, moves, ally_color)
+            self.get_king_side_castle_moves(sq, moves)
         if (self.white_to_move and self.current_castle_right.wqs) or (
                 not self.white_to_move and self.current_castle_right.bqs):
-            self.get_queen_side_castle_moves(r, c, moves, ally_color)
+            self.get_queen_side_castle_moves(sq, moves)
 
-    def get_king_side_castle_moves(self, r, c, moves, ally_color):
+    def get_king_side_castle_moves(self, sq, moves):
+        squares = self.squares
+        rook = WR if self.white_to_move else BR
 
-        if self.board[r][c + 1] == '--' and self.board[r][c + 2] == '--' and self.board[r][c + 3][1] == 'R':
-            if ally_color == "w":
-                original_king_location = self.white_king_location
-                self.white_king_location = (self.white_king_location[0], self.white_king_location[1] + 1)
-                in_check1, _, _ = self.checks_for_pins_and_checks()
-                self.white_king_location = (self.white_king_location[0], self.white_king_location[1] + 1)
-                in_check2, _, _ = self.checks_for_pins_and_checks()
+        if squares[sq + 1] == EMPTY and squares[sq + 2] == EMPTY and squares[sq + 3] == rook:
+            if not self.attacked[sq + 1] and not self.attacked[sq + 2]:
+                moves.append(FROM_BITS[sq] | TO_BITS[sq + 2] | CASTLE_FLAG | squares[sq] << MOVED_SHIFT)
 
-                self.white_king_location = original_king_location
+    def get_queen_side_castle_moves(self, sq, moves):
+        squares = self.squares
+        rook = WR if self.white_to_move else BR
 
-            else:
-                original_king_location = self.black_king_location
-                self.black_king_location = (self.black_king_location[0], self.black_king_location[1] + 1)
-                in_check1, _, _ = self.checks_for_pins_and_checks()
-                self.black_king_location = (self.black_king_location[0], self.black_king_location[1] + 1)
-                in_check2, _, _ = self.checks_for_pins_and_checks()
+        if squares[sq - 1] == EMPTY and squares[sq - 2] == EMPTY and squares[sq - 3] == EMPTY and \
+                squares[sq - 4] == rook:
+            if not self.attacked[sq - 1] and not self.attacked[sq - 2]:
+                moves.append(FROM_BITS[sq] | TO_BITS[sq - 2] | CASTLE_FLAG | squares[sq] << MOVED_SHIFT)
 
-                self.black_king_location = original_king_location
 
-            if not in_check1 and not in_check2:
-                moves.append(Move((r, c), (r, c + 2), self.board, is_castle_move=True))
+BACKENDS = ("mailbox", "bitboard")
 
-    def get_queen_side_castle_moves(self, r, c, moves, ally_color):
 
-        if self.board[r][c - 1] == '--' and self.board[r][c - 2] == '--' and self.board[r][c - 3] == '--' and \
-                self.board[r][c - 4][1] == 'R':
-            if ally_color == "w":
-                original_king_location = self.white_king_location
-                self.white_king_location = (self.white_king_location[0], self.white_king_location[1] - 1)
-                in_check1, _, _ = self.checks_for_pins_and_checks()
-                self.white_king_location = (self.white_king_location[0], self.white_king_location[1] - 1)
-                in_check2, _, _ = self.checks_for_pins_and_checks()
-
-                self.white_king_location = original_king_location
-
-            else:
-                original_king_location = self.black_king_location
-                self.black_king_location = (self.black_king_location[0], self.black_king_location[1] - 1)
-                in_check1, _, _ = self.checks_for_pins_and_checks()
-                self.black_king_location = (self.black_king_location[0], self.black_king_location[1] - 1)
-                in_check2, _, _ = self.checks_for_pins_and_checks()
-
-                self.black_king_location = original_king_location
-
-            if not in_check1 and not in_check2:
-                moves.append(Move((r, c), (r, c - 2), self.board, is_castle_move=True))
-
-    def find_same_type_pieces(self, valid_moves):
-        check_moves = valid_moves
-
-        for check_move in check_moves:
-            for move in valid_moves:
-                if str(check_move.get_chess_notation()) != str(move.get_chess_notation()):
-                    if str(check_move.get_chess_notation())[-1] == str(move.get_chess_notation())[-1] and \
-                            str(check_move.get_chess_notation())[-2] == str(move.get_chess_notation())[
-                        -2] and check_move.piece_moved == move.piece_moved:
-                        if str(check_move.get_chess_notation())[0] == str(move.get_chess_notation())[0]:
-                            move.same_type_pieces = str(move.get_chess_notation())[1]
-                            check_move.same_type_pieces = str(check_move.get_chess_notation())[1]
-                        else:
-                            move.same_type_pieces = str(move.get_chess_notation())[0]
-                            check_move.same_type_pieces = str(check_move.get_chess_notation())[0]
+def new_game_state(fen=None, backend="mailbox"):
+    """Create a game state that generates moves with the named backend."""
+    if backend == "bitboard":
+        from bitboard import BitboardGameState
+        return BitboardGameState(fen)
+    if backend != "mailbox":
+        raise ValueError(f"unknown move generation backend {backend!r}, expected one of {BACKENDS}")
+    return GameState(fen)
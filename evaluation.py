@@ -0,0 +1,133 @@
+"""Static evaluation terms kept incrementally on GameState.
+
+Scores are integer centipawns from white's point of view: material plus a piece-square bonus for
+where each piece stands. GameState updates both totals in make_move/undo_move, so evaluating a
+position is O(1).
+"""
+from mailbox_board import PIECE_CODES, SQ120, BOARD_SQUARES, TYPE_MASK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+PIECE_VALUES = {PAWN: 100, KNIGHT: 300, BISHOP: 300, ROOK: 500, QUEEN: 900, KING: 0}
+
+white_knight_scores = [[-50, -40, -30, -30, -30, -30, -40, -50],
+                       [-40, -20, 0, 0, 0, 0, -20, -40],
+                       [-30, 0, 10, 15, 15, 10, 0, -30],
+                       [-30, 5, 15, 20, 20, 15, 5, -30],
+                       [-30, 0, 15, 20, 20, 15, 0, -30],
+                       [-30, 5, 10, 15, 15, 10, 5, -30],
+                       [-40, -20, 0, 5, 5, 0, -20, -40],
+                       [-50, -40, -30, -30, -30, -30, -40, -50]]
+
+black_knight_scores = [[-50, -40, -30, -30, -30, -30, -40, -50],
+                       [-40, -20, 0, 5, 5, 0, -20, -40],
+                       [-30, 5, 10, 15, 15, 10, 5, -30],
+                       [-30, 0, 15, 20, 20, 15, 0, -30],
+                       [-30, 5, 15, 20, 20, 15, 5, -30],
+                       [-30, 0, 10, 15, 15, 10, 0, -30],
+                       [-40, -20, 0, 0, 0, 0, -20, -40],
+                       [-50, -40, -30, -30, -30, -30, -40, -50]]
+
+white_bishop_scores = [[-20, -10, -10, -10, -10, -10, -10, -20],
+                       [-10, 0, 0, 0, 0, 0, 0, -10],
+                       [-10, 0, 5, 10, 10, 5, 0, -10],
+                       [-10, 5, 5, 10, 10, 5, 5, -10],
+                       [-10, 0, 10, 10, 10, 10, 0, -10],
+                       [-10, 10, 10, 10, 10, 10, 10, -10],
+                       [-10, 5, 0, 0, 0, 0, 5, -10],
+                       [-20, -10, -10, -10, -10, -10, -10, -20]]
+
+black_bishop_scores = [[-20, -10, -10, -10, -10, -10, -10, -20],
+                       [-10, 5, 0, 0, 0, 0, 5, -10],
+                       [-10, 10, 10, 10, 10, 10, 10, -10],
+                       [-10, 0, 10, 10, 10, 10, 0, -10],
+                       [-10, 5, 5, 10, 10, 5, 5, -10],
+                       [-10, 0, 5, 10, 10, 5, 0, -10],
+                       [-10, 0, 0, 0, 0, 0, 0, -10],
+                       [-20, -10, -10, -10, -10, -10, -10, -20]]
+
+white_queen_scores = [[-20, -10, -10, -5, -5, -10, -10, -20],
+                      [-10, 0, 0, 0, 0, 0, 0, -10],
+                      [-10, 0, 5, 5, 5, 5, 0, -10],
+                      [-5, 0, 5, 5, 5, 5, 0, -5],
+                      [0, 0, 5, 5, 5, 5, 0, -5],
+                      [-10, 5, 5, 5, 5, 5, 0, -10],
+                      [-10, 0, 5, 0, 0, 0, 0, -10],
+                      [-20, -10, -10, -5, -5, -10, -10, -20]]
+
+black_queen_scores = [[-20, -10, -10, -5, -5, -10, -10, -20],
+                      [-10, 0, 5, 0, 0, 0, 0, -10],
+                      [-10, 5, 5, 5, 5, 5, 0, -10],
+                      [0, 0, 5, 5, 5, 5, 0, -5],
+                      [-5, 0, 5, 5, 5, 5, 0, -5],
+                      [-10, 0, 5, 5, 5, 5, 0, -10],
+                      [-10, 0, 0, 0, 0, 0, 0, -10],
+                      [-20, -10, -10, -5, -5, -10, -10, -20]]
+
+black_rook_scores = [[0, 0, 0, 5, 5, 0, 0, 0],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [5, 10, 10, 10, 10, 10, 10, 5],
+                     [0, 0, 0, 0, 0, 0, 0, 0]]
+
+white_rook_scores = [[0, 0, 0, 0, 0, 0, 0, 0],
+                     [5, 10, 10, 10, 10, 10, 10, 5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [-5, 0, 0, 0, 0, 0, 0, -5],
+                     [0, 0, 0, 5, 5, 0, 0, 0]]
+
+white_pawn_scores = [[0, 0, 0, 0, 0, 0, 0, 0],
+                     [50, 50, 50, 50, 50, 50, 50, 50],
+                     [10, 10, 20, 30, 30, 20, 10, 10],
+                     [5, 5, 10, 25, 25, 10, 5, 5],
+                     [0, 0, 0, 20, 20, 0, 0, 0],
+                     [5, -5, -10, 0, 0, -10, -5, 5],
+                     [5, 10, 10, -20, -20, 10, 10, 5],
+                     [0, 0, 0, 0, 0, 0, 0, 0]]
+
+black_pawn_scores = [[0, 0, 0, 0, 0, 0, 0, 0],
+                     [5, 10, 10, -20, -20, 10, 10, 5],
+                     [5, -5, -10, 0, 0, -10, -5, 5],
+                     [0, 0, 0, 20, 20, 0, 0, 0],
+                     [5, 5, 10, 25, 25, 10, 5, 5],
+                     [10, 10, 20, 30, 30, 20, 10, 10],
+                     [50, 50, 50, 50, 50, 50, 50, 50],
+                     [0, 0, 0, 0, 0, 0, 0, 0]]
+
+piece_position_scores = {
+    "w": {"p": white_pawn_scores, "N": white_knight_scores, "B": white_bishop_scores,
+          "R": white_rook_scores, "Q": white_queen_scores},
+    "b": {"p": black_pawn_scores, "N": black_knight_scores, "B": black_bishop_scores,
+          "R": black_rook_scores, "Q": black_queen_scores}
+}
+
+
+# Signed material value of every piece code, and its piece-square bonus on every mailbox square
+MATERIAL = [0] * 17
+PIECE_SQUARE = [[0] * 120 for _ in range(17)]
+for _piece, _code in PIECE_CODES.items():
+    if _piece == "--":
+        continue
+    _color, _piece_type = _piece
+    _sign = 1 if _color == "w" else -1
+    MATERIAL[_code] = _sign * PIECE_VALUES[_code & TYPE_MASK]
+    if _piece_type in piece_position_scores[_color]:
+        for _row in range(8):
+            for _col in range(8):
+                PIECE_SQUARE[_code][SQ120[_row][_col]] = _sign * piece_position_scores[_color][_piece_type][_row][_col]
+
+
+def compute_scores(squares):
+    """Compute the (material, piece-square) totals of a mailbox from scratch."""
+    material = 0
+    positional = 0
+    for sq in BOARD_SQUARES:
+        piece = squares[sq]
+        if piece:
+            material += MATERIAL[piece]
+            positional += PIECE_SQUARE[piece][sq]
+    return material, positional
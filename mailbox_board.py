@@ -0,0 +1,93 @@
+# 10x12 mailbox: the 8x8 board sits inside a two-square border of OFFBOARD sentinels, so a piece
+# stepping off the edge always lands on a sentinel and no row/column bounds checks are needed.
+# Square index = 21 + 10 * row + col, with row 0 being the eighth rank (the same orientation as
+# GameState.board).
+
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+WHITE = 0
+BLACK = 8
+OFFBOARD = 16
+
+TYPE_MASK = 7
+COLOR_MASK = 8
+
+WP, WN, WB, WR, WQ, WK = PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+BP, BN, BB, BR, BQ, BK = (BLACK | t for t in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING))
+
+PIECE_NAMES = ["--"] * 17
+PIECE_CODES = {"--": EMPTY}
+for _code, _name in ((WP, "wp"), (WN, "wN"), (WB, "wB"), (WR, "wR"), (WQ, "wQ"), (WK, "wK"),
+                     (BP, "bp"), (BN, "bN"), (BB, "bB"), (BR, "bR"), (BQ, "bQ"), (BK, "bK")):
+    PIECE_NAMES[_code] = _name
+    PIECE_CODES[_name] = _code
+
+TYPE_LETTERS = {PAWN: "p", KNIGHT: "N", BISHOP: "B", ROOK: "R", QUEEN: "Q", KING: "K"}
+LETTER_TYPES = {v: k for k, v in TYPE_LETTERS.items()}
+
+NORTH, SOUTH, EAST, WEST = -10, 10, 1, -1
+ORTHOGONAL = (NORTH, WEST, SOUTH, EAST)
+DIAGONAL = (NORTH + WEST, NORTH + EAST, SOUTH + WEST, SOUTH + EAST)
+KING_DIRECTIONS = ORTHOGONAL + DIAGONAL
+KNIGHT_OFFSETS = (-21, -19, -12, -8, 8, 12, 19, 21)
+
+BOARD_SQUARES = tuple(21 + 10 * row + col for row in range(8) for col in range(8))
+
+SQ120 = [[21 + 10 * row + col for col in range(8)] for row in range(8)]
+SQUARE_120 = [SQ120[sq // 8][sq % 8] for sq in range(64)]  # 0..63 (GameState row/col order) to mailbox
+SQ64 = [-1] * 120
+ROW_OF = [-1] * 120
+COL_OF = [-1] * 120
+for _sq in BOARD_SQUARES:
+    SQ64[_sq] = 8 * ((_sq - 21) // 10) + (_sq - 21) % 10
+    ROW_OF[_sq] = (_sq - 21) // 10
+    COL_OF[_sq] = (_sq - 21) % 10
+
+# Rays from every square, stopping before the border: RAYS[sq][direction] = (sq + d, sq + 2d, ...)
+RAYS = [{} for _ in range(120)]
+for _sq in BOARD_SQUARES:
+    for _d in KING_DIRECTIONS:
+        _ray = []
+        _target = _sq + _d
+        while SQ64[_target] >= 0:
+            _ray.append(_target)
+            _target += _d
+        RAYS[_sq][_d] = tuple(_ray)
+
+KNIGHT_TARGETS = [tuple(_sq + o for o in KNIGHT_OFFSETS if SQ64[_sq + o] >= 0) if SQ64[_sq] >= 0 else ()
+                  for _sq in range(120)]
+KING_TARGETS = [tuple(_sq + d for d in KING_DIRECTIONS if SQ64[_sq + d] >= 0) if SQ64[_sq] >= 0 else ()
+                for _sq in range(120)]
+
+
+def empty_board():
+    squares = [OFFBOARD] * 120
+    for sq in BOARD_SQUARES:
+        squares[sq] = EMPTY
+    return squares
+
+
+class BoardView:
+    """Read-only rows-of-strings view over the mailbox (board[row][col] == 'wN'), for the GUI."""
+
+    def __init__(self, squares):
+        self.squares = squares
+
+    def _row(self, row):
+        start = 21 + 10 * row
+        return [PIECE_NAMES[p] for p in self.squares[start:start + 8]]
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._row(r) for r in range(8)[row]]
+        if row < 0:
+            row += 8
+        if not 0 <= row < 8:
+            raise IndexError("board row out of range")
+        return self._row(row)
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        return (self._row(r) for r in range(8))
@@ -1,6 +1,6 @@
 import pygame as p
 import engine, ai as ai
-from multiprocessing import Process, Queue
+from ai_worker import AIWorker
 from draw import *
 from config import *
 from dragger import Dragger
@@ -34,7 +34,7 @@ def main():
     game_over = False
 
     AIThinking = False
-    move_finder_process = None
+    ai_worker = AIWorker()  # One search process for the whole session, so its tables stay warm
     move_undone = False
 
     while running:
@@ -92,9 +92,8 @@ def main():
                     move_made = True
                     animate = False
                     game_over = False
-                    if AIThinking:
-                        move_finder_process.terminate()
-                        AIThinking = False
+                    ai_worker.stop()  # Whether it is thinking or pondering
+                    AIThinking = False
                     move_undone = True
                 if e.key == p.K_r:
                     gs = engine.GameState()
@@ -104,33 +103,33 @@ def main():
                     move_made = False
                     animate = False
                     game_over = False
-                    if AIThinking:
-                        move_finder_process.terminate()
-                        AIThinking = False
+                    ai_worker.new_game()  # Also cancels a search in progress
+                    AIThinking = False
                     move_undone = True
 
         if not game_over and not human_turn and not move_undone:
             if not AIThinking:
                 AIThinking = True
                 print("thinking...")
-                returnQueue = Queue()
-                move_finder_process = Process(target=ai.find_best_move, args=(gs, valid_moves, returnQueue))
-                move_finder_process.start()
+                ai_worker.go(gs)
 
-            if not move_finder_process.is_alive():
+            AIMove = ai_worker.poll()
+            if AIMove is not None:
                 print("done thinking!")
-                AIMove = returnQueue.get()
+                AIMove = next((move for move in valid_moves if move.code == AIMove), None)
                 if AIMove is None:
                     print("x")
                     AIMove = ai.find_random_move(valid_moves)
                 gs.make_move(AIMove)
+                if PONDER:
+                    ai_worker.ponder(gs)
                 move_made = True
                 animate = True
                 AIThinking = False
 
         if move_made:
             if animate:
-                animate_move(gs.move_log[-1], screen, gs.board, clock)
+                animate_move(engine.Move.from_code(gs.move_log[-1]), screen, gs.board, clock)
             valid_moves = gs.get_valid_moves()
             move_made = False
             animate = False
@@ -162,6 +161,8 @@ def main():
         clock.tick(MAX_FPS)
         p.display.flip()
 
+    ai_worker.close()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
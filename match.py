@@ -0,0 +1,313 @@
+"""Self-play match: ChessAI configuration A against configuration B, to measure a change in strength.
+
+    python match.py --engine-a null_move=False --games 200 --tc 10+0.1
+    python match.py --engine-b pvs=False --depth 4 --concurrency 4
+    python match.py --openings openings.txt --nodes 20000 --elo0 0 --elo1 20
+
+Each opening (a FEN per line in --openings, else OPENINGS) is played twice with the colours swapped.
+Once every opening has been played, later pairs start RANDOM_PLIES random moves into their opening
+(chosen from --seed and the pair's number), so a fixed --depth or --nodes match longer than two games an
+opening doesn't replay the same games.
+Games run concurrently in a process pool and are adjudicated on checkmate, stalemate, threefold
+repetition, the fifty-move rule, insufficient material and --max-plies. Results are printed as they
+arrive with A's Elo and its 95% error bar, and the match stops early once a sequential probability ratio
+test between Elo elo0 and elo1 accepts either.
+"""
+import argparse
+import ast
+import contextlib
+import io
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import ai
+import engine
+from mailbox_board import BOARD_SQUARES, TYPE_MASK, KNIGHT, BISHOP, KING
+from time_manager import SearchLimits
+from transposition_table import TranspositionTable
+
+# Balanced positions a few moves into well-known openings, white to move
+OPENINGS: List[str] = [
+    "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",  # Italian
+    "r1bqkbnr/1ppp1ppp/p1n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 0 4",  # Ruy Lopez
+    "rnbqkb1r/1p2pppp/p2p1n2/8/3NP3/2N5/PPP2PPP/R1BQKB1R w KQkq - 0 6",  # Sicilian Najdorf
+    "rnbqkb1r/ppp2ppp/4pn2/3p4/3PP3/2N5/PPP2PPP/R1BQKBNR w KQkq - 2 4",  # French
+    "rn1qkbnr/pp2pppp/2p5/3pPb2/3P4/8/PPP2PPP/RNBQKBNR w KQkq - 1 4",  # Caro-Kann
+    "rnb1kbnr/ppp1pppp/8/q7/8/2N5/PPPP1PPP/R1BQKBNR w KQkq - 2 4",  # Scandinavian
+    "rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4",  # Queen's Gambit Declined
+    "rnbqkb1r/pp2pppp/2p2n2/3p4/2PP4/5N2/PP2PPPP/RNBQKB1R w KQkq - 2 4",  # Slav
+    "rnbqk2r/ppp1ppbp/3p1np1/8/2PPP3/2N5/PP3PPP/R1BQKBNR w KQkq - 0 5",  # King's Indian
+    "rnbqk2r/pppp1ppp/4pn2/8/1bPP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4",  # Nimzo-Indian
+    "rnbqkb1r/ppp2ppp/5n2/3pp3/2P5/2N3P1/PP1PPP1P/R1BQKBNR w KQkq - 0 4",  # English
+    "rnbqkb1r/pp2pppp/5n2/2pp4/3P1B2/4P3/PPP2PPP/RN1QKBNR w KQkq - 0 4",  # London
+]
+
+# ChessAI arguments an engine configuration may set. The search limits are the match's, and workers is left
+# out because pool processes can't have children.
+ENGINE_OPTIONS = ("backend", "null_move", "late_move_reductions", "pvs")
+HASH_MB = 16  # Per engine and game, so concurrent games don't compete for one big table
+MAX_PLIES = 400
+RANDOM_PLIES = 2  # Random moves added to an opening from its second pair of games on
+MIN_CLOCK = 0.01  # Clocks don't flag; a player out of time still gets this much per move
+
+SCORES = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+def parse_engine(options: List[str]) -> Dict:
+    """ChessAI keyword arguments from KEY=VALUE strings (Python literals, else plain strings)."""
+    config = {}
+    for option in options:
+        key, _, text = option.partition("=")
+        if key not in ENGINE_OPTIONS:
+            raise argparse.ArgumentTypeError(f"unknown engine option {key!r} "
+                                             f"(choose from {', '.join(ENGINE_OPTIONS)})")
+        try:
+            config[key] = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            config[key] = text
+    return config
+
+
+def parse_time_control(text: str) -> Tuple[float, float]:
+    """'base+increment' in seconds, e.g. 10+0.1, as (base, increment)."""
+    base, _, increment = text.partition("+")
+    return float(base), float(increment or 0)
+
+
+def insufficient_material(gs) -> bool:
+    """Only kings left, plus at most one knight or bishop: neither side can mate."""
+    minors = 0
+    for sq in BOARD_SQUARES:
+        piece_type = gs.squares[sq] & TYPE_MASK
+        if not piece_type or piece_type == KING:
+            continue
+        if piece_type not in (KNIGHT, BISHOP) or minors:
+            return False
+        minors += 1
+    return True
+
+
+def adjudicate(gs, has_moves: bool, max_plies: int) -> Optional[Tuple[str, str]]:
+    """(result, reason) if the game is over in gs, else None."""
+    if not has_moves:
+        if gs.in_check:
+            return ("0-1" if gs.white_to_move else "1-0"), "checkmate"
+        return "1/2-1/2", "stalemate"
+    if gs.zobrist_key_log.count(gs.zobrist_key) >= 3:
+        return "1/2-1/2", "repetition"
+    if int(gs.get_fen().split()[4]) >= 100:
+        return "1/2-1/2", "fifty-move rule"
+    if insufficient_material(gs):
+        return "1/2-1/2", "insufficient material"
+    if len(gs.move_log) >= max_plies:
+        return "1/2-1/2", "move limit"
+    return None
+
+
+def opening_position(openings: List[str], pair: int, seed: int) -> str:
+    """FEN the pair-th pair of games starts from: its opening, plus random moves after the first pass."""
+    fen = openings[pair % len(openings)]
+    if pair < len(openings):
+        return fen
+    rng = random.Random(seed * 1000003 + pair)
+    gs = engine.GameState(fen)
+    for _ in range(RANDOM_PLIES):
+        moves = gs.generate_legal_moves()
+        if not moves:
+            break
+        gs.make_move(rng.choice(moves))
+    return gs.get_fen() if gs.generate_legal_moves() else fen
+
+
+def play_game(job: Tuple) -> Tuple:
+    """Process pool worker: play one game and return (game number, result, reason, plies, seconds).
+
+    job is (game number, opening FEN, white's ChessAI arguments, black's, search limits or None,
+    time control or None, max plies). Each player gets a fresh ChessAI and table.
+    """
+    number, fen, white, black, limits, time_control, max_plies = job
+    players = [ai.ChessAI(table=TranspositionTable(HASH_MB), **config) for config in (white, black)]
+    clocks = [time_control[0], time_control[0]] if time_control else None
+    gs = engine.new_game_state(fen)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            outcome = adjudicate(gs, bool(gs.generate_legal_moves()), max_plies)
+            if outcome is not None:
+                break
+            side = 0 if gs.white_to_move else 1
+            if clocks is not None:
+                increment = time_control[1]
+                limits = SearchLimits(wtime=max(clocks[0], MIN_CLOCK), btime=max(clocks[1], MIN_CLOCK),
+                                      winc=increment, binc=increment)
+            move_start = time.perf_counter()
+            move = players[side].get_best_move(gs, limits=limits)
+            if clocks is not None:
+                clocks[side] += time_control[1] - (time.perf_counter() - move_start)
+            gs.make_move(move)
+    for player in players:
+        player.tt.close()
+    return (number,) + outcome + (len(gs.move_log), time.perf_counter() - start)
+
+
+def elo(score: float) -> float:
+    """Logistic Elo difference for an expected score."""
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def expected_score(elo_difference: float) -> float:
+    return 1 / (1 + 10 ** (-elo_difference / 400))
+
+
+class MatchStats:
+    """A's wins, draws and losses, with its Elo estimate and a sequential probability ratio test."""
+
+    def __init__(self, elo0: float, elo1: float, alpha: float, beta: float):
+        self.wins = self.draws = self.losses = 0
+        self.elo0, self.elo1 = elo0, elo1
+        # Accept H1 (A is elo1 stronger) at or above the upper bound, H0 (elo0) at or below the lower one
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def add(self, score: float):
+        if score == 1.0:
+            self.wins += 1
+        elif score == 0.0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games
+
+    def variance(self) -> float:
+        """Variance of a single game's score."""
+        score = self.score()
+        return (self.wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2 + self.losses * score ** 2) / \
+            self.games
+
+    def elo(self) -> Tuple[float, float]:
+        """A's Elo difference and the half width of its 95% confidence interval."""
+        score = self.score()
+        margin = 1.96 * math.sqrt(self.variance() / self.games)
+        return elo(score), (elo(min(score + margin, 1.0)) - elo(max(score - margin, 0.0))) / 2
+
+    def llr(self) -> float:
+        """Log-likelihood ratio of elo1 against elo0, in the usual normal approximation of the
+        trinomial (win/draw/loss) model. 0 until the results vary."""
+        variance = self.variance() if self.games else 0.0
+        if variance == 0.0:
+            return 0.0
+        score0, score1 = expected_score(self.elo0), expected_score(self.elo1)
+        return self.games * (score1 - score0) * (2 * self.score() - score0 - score1) / (2 * variance)
+
+    def sprt(self) -> Optional[str]:
+        """'H1' or 'H0' once the test accepts one, else None."""
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def summary(self) -> str:
+        elo_difference, error = self.elo()
+        return f"+{self.wins} ={self.draws} -{self.losses}  Elo {elo_difference:+.1f} +/- {error:.1f}  " \
+               f"LLR {self.llr():+.2f} ({self.lower:.2f}, {self.upper:.2f})"
+
+
+def run_match(engine_a: Dict, engine_b: Dict, openings: List[str], games: int, concurrency: int,
+              limits: Optional[SearchLimits], time_control: Optional[Tuple[float, float]], max_plies: int,
+              stats: MatchStats, seed: int = 0) -> Optional[str]:
+    """Play up to games games, printing each result, and return the SPRT decision if it stops the match."""
+    jobs = []
+    for number in range(games):
+        if number % 2 == 0:
+            fen = opening_position(openings, number // 2, seed)
+        white, black = (engine_a, engine_b) if number % 2 == 0 else (engine_b, engine_a)
+        jobs.append((number, fen, white, black, limits, time_control, max_plies))
+
+    decision = None
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(play_game, job) for job in jobs]
+        for future in as_completed(futures):
+            number, result, reason, plies, seconds = future.result()
+            a_white = number % 2 == 0
+            stats.add(SCORES[result] if a_white else 1 - SCORES[result])
+            print(f"Game {number + 1:>4} (A {'white' if a_white else 'black'}): {result:<7} {reason:<21} "
+                  f"{plies:>3} plies {seconds:6.1f}s  {stats.summary()}", flush=True)
+            decision = stats.sprt()
+            if decision is not None:
+                for pending in futures:
+                    pending.cancel()
+                break
+    return decision
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine-a", nargs="*", default=[], metavar="KEY=VALUE",
+                        help=f"ChessAI arguments of A ({', '.join(ENGINE_OPTIONS)})")
+    parser.add_argument("--engine-b", nargs="*", default=[], metavar="KEY=VALUE", help="... and of B")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=1, help="games played at the same time")
+    parser.add_argument("--openings", help="file with one opening FEN per line (default: built-in set)")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument("--tc", default="10+0.1", help="time control base+increment in seconds (default 10+0.1)")
+    limit.add_argument("--movetime", type=float, help="seconds per move")
+    limit.add_argument("--depth", type=int, help="fixed search depth")
+    limit.add_argument("--nodes", type=int, help="nodes per move")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="adjudicate a draw after this many plies")
+    parser.add_argument("--elo0", type=float, default=0.0, help="SPRT null hypothesis: A is this much stronger")
+    parser.add_argument("--elo1", type=float, default=10.0, help="SPRT alternative hypothesis")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random moves added to repeated openings")
+    args = parser.parse_args(argv)
+
+    try:
+        engine_a, engine_b = parse_engine(args.engine_a), parse_engine(args.engine_b)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    openings = OPENINGS
+    if args.openings:
+        with open(args.openings) as f:
+            openings = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    limits, time_control = None, None
+    if args.movetime is not None or args.depth is not None or args.nodes is not None:
+        limits = SearchLimits(depth=args.depth, nodes=args.nodes, movetime=args.movetime)
+    else:
+        time_control = parse_time_control(args.tc)
+
+    print(f"A: {engine_a or 'defaults'}  B: {engine_b or 'defaults'}  "
+          f"({limits if limits is not None else f'tc {args.tc}'}, {len(openings)} openings)")
+    stats = MatchStats(args.elo0, args.elo1, args.alpha, args.beta)
+    decision = run_match(engine_a, engine_b, openings, args.games, args.concurrency, limits, time_control,
+                         args.max_plies, stats, args.seed)
+    if not stats.games:
+        return 0
+    print(f"{stats.games} games: {stats.summary()}")
+    if decision == "H1":
+        print(f"SPRT: A is stronger (H1, Elo >= {args.elo1:g} accepted)")
+    elif decision == "H0":
+        print(f"SPRT: A is not stronger (H0, Elo <= {args.elo0:g} accepted)")
+    else:
+        print("SPRT: inconclusive")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,143 @@
+from mailbox_board import PIECE_NAMES, PIECE_CODES
+
+# The engine and search work on moves packed into a single int (low to high bits):
+#   from square 6, to square 6 (0 = a8 .. 63 = h1, GameState row/col order), promotion piece 3, spare 1,
+#   en passant flag 1, castle flag 1, captured piece code 4, moved piece code 4.
+# The low 16 bits are the short form stored in the transposition table (Move.encode()).
+TO_SHIFT = 6
+PROMOTION_SHIFT = 12
+ENPASSANT_FLAG = 1 << 16
+CASTLE_FLAG = 1 << 17
+CAPTURED_SHIFT = 18
+MOVED_SHIFT = 22
+
+SQUARE_MASK = 63
+SHORT_MASK = 0xFFFF
+PROMOTION_MASK = 7 << PROMOTION_SHIFT
+CAPTURED_MASK = 15 << CAPTURED_SHIFT
+TACTICAL_MASK = PROMOTION_MASK | CAPTURED_MASK  # Captures and promotions; a quiet move has none of these bits
+
+# Promotion field values; the promoted piece type is the value + 1 (knight 2 .. queen 5)
+PROMOTION_CODES = {"N": 1, "B": 2, "R": 3, "Q": 4}
+PROMOTION_LETTERS = ("", "N", "B", "R", "Q")
+PROMOTIONS = tuple(PROMOTION_CODES[piece] << PROMOTION_SHIFT for piece in "QRBN")  # Generation order
+
+
 class Move():
+    """Thin wrapper over a packed move for the GUI and the move log display.
+
+    Everything is derived from the single code slot, so moves are cheap to create, compare and hash.
+    """
+    __slots__ = ("code",)
+
     ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rows_to_ranks = {v: k for k, v in ranks_to_rows.items()}
 
     files_to_cols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h":7}
     cols_to_files = {v: k for k, v in files_to_cols.items()}
 
-    def __init__(self, start_sq, end_sq, board, is_pawn_promotion = None, promoted_piece = 'Q', is_enpassant_move = False, is_castle_move = False) -> None:
-        self.start_row = start_sq[0]
-        self.start_col = start_sq[1]
-        self.start_sq = start_sq
-        self.end_row = end_sq[0]
-        self.end_col = end_sq[1]
-        self.end_sq = end_sq
-        self.piece_moved = board[self.start_row][self.start_col]
-        self.piece_captured = board[self.end_row][self.end_col]
-
-        self.is_pawn_promotion = (self.piece_moved == 'wp' and self.end_row == 0) or (self.piece_moved == 'bp' and self.end_row == 7) if is_pawn_promotion == None else is_pawn_promotion
-        self.is_enpassant_move = is_enpassant_move
-
-        if self.is_enpassant_move:
-            self.piece_captured = 'wp' if self.piece_moved == 'bp' else 'bp'
-
-        self.is_capture = self.piece_captured != "--"
-
-        self.promoted_piece = promoted_piece
-
-        self.is_castle_move = is_castle_move
-
-        self.move_ID = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
-
-        self.same_type_pieces = ""
-
-        self.makes_check = False
-
-        self.makes_checkmate = False
+    promotion_codes = PROMOTION_CODES
+
+    def __init__(self, start_sq, end_sq, board, is_pawn_promotion = None, promoted_piece = 'Q', is_enpassant_move = False, is_castle_move = False, piece_moved = None, piece_captured = "--") -> None:
+        start_row, start_col = start_sq
+        end_row, end_col = end_sq
+        # The GUI reads the pieces off the board; otherwise they are passed in
+        if board is not None:
+            piece_moved = board[start_row][start_col]
+            piece_captured = board[end_row][end_col]
+
+        if is_pawn_promotion is None:
+            is_pawn_promotion = (piece_moved == 'wp' and end_row == 0) or (piece_moved == 'bp' and end_row == 7)
+
+        code = (start_row * 8 + start_col) | ((end_row * 8 + end_col) << TO_SHIFT) | (PIECE_CODES[piece_moved] << MOVED_SHIFT)
+        if is_pawn_promotion:
+            code |= PROMOTION_CODES[promoted_piece] << PROMOTION_SHIFT
+        if is_enpassant_move:
+            code |= ENPASSANT_FLAG
+            piece_captured = 'wp' if piece_moved == 'bp' else 'bp'
+        if is_castle_move:
+            code |= CASTLE_FLAG
+        self.code = code | (PIECE_CODES[piece_captured] << CAPTURED_SHIFT)
+
+    @classmethod
+    def from_code(cls, code):
+        move = cls.__new__(cls)
+        move.code = code
+        return move
+
+    @property
+    def start_row(self):
+        return (self.code & SQUARE_MASK) >> 3
+
+    @property
+    def start_col(self):
+        return self.code & 7
+
+    @property
+    def end_row(self):
+        return (self.code >> TO_SHIFT & SQUARE_MASK) >> 3
+
+    @property
+    def end_col(self):
+        return self.code >> TO_SHIFT & 7
+
+    @property
+    def start_sq(self):
+        return self.start_row, self.start_col
+
+    @property
+    def end_sq(self):
+        return self.end_row, self.end_col
+
+    @property
+    def piece_moved(self):
+        return PIECE_NAMES[self.code >> MOVED_SHIFT & 15]
+
+    @property
+    def piece_captured(self):
+        return PIECE_NAMES[self.code >> CAPTURED_SHIFT & 15]
+
+    @property
+    def is_capture(self):
+        return bool(self.code & CAPTURED_MASK)
+
+    @property
+    def is_pawn_promotion(self):
+        return bool(self.code & PROMOTION_MASK)
+
+    @property
+    def promoted_piece(self):
+        return PROMOTION_LETTERS[self.code >> PROMOTION_SHIFT & 7] or 'Q'
+
+    @promoted_piece.setter
+    def promoted_piece(self, piece):
+        # Set from user input in the GUI; anything that isn't a promotion piece leaves the move unpromoted
+        if self.is_pawn_promotion:
+            self.code = (self.code & ~PROMOTION_MASK) | (PROMOTION_CODES.get(piece.upper(), 0) << PROMOTION_SHIFT)
+
+    @property
+    def is_enpassant_move(self):
+        return bool(self.code & ENPASSANT_FLAG)
+
+    @property
+    def is_castle_move(self):
+        return bool(self.code & CASTLE_FLAG)
+
+    @property
+    def move_ID(self):
+        return self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
 
     def __eq__(self, value: object) -> bool:
         if isinstance(value, Move):
-            return self.move_ID == value.move_ID
+            return self.code == value.code
         return False
 
+    def __hash__(self) -> int:
+        return hash(self.code)
+
+    def encode(self):
+        # 16-bit form used by the transposition table: from square, to square, promotion piece
+        return self.code & SHORT_MASK
 
     def get_chess_notation(self):
         return self.get_rank_file(self.start_row, self.start_col) + self.get_rank_file(self.end_row, self.end_col) if not self.is_pawn_promotion else self.get_rank_file(self.start_row, self.start_col) + self.get_rank_file(self.end_row, self.end_col) + self.promoted_piece.lower()
@@ -51,19 +149,17 @@ class Move():
         return f'{self.get_chess_notation()}'
 
     def __str__(self) -> str:
+        return self.get_san()
+
+    def get_san(self, disambiguation="", checks=""):
+        # The position supplies the disambiguation and the check suffix, see GameState.get_san
         if self.is_castle_move:
-            return "O-O" if self.end_col == 6 else "O-O-O"
+            return ("O-O" if self.end_col == 6 else "O-O-O") + checks
 
         end_square = self.get_rank_file(self.end_row, self.end_col)
 
         promotion = ""
 
-        checks = ""
-        if self.makes_checkmate:
-            checks = "#"
-        elif self.makes_check:
-            checks = "+"
-
         if self.piece_moved[1] == 'p':
             if self.is_pawn_promotion == True:
                 promotion = "=" + self.promoted_piece
@@ -72,8 +168,8 @@ class Move():
             else:
                 return end_square + promotion + checks
 
-        move_string = self.piece_moved[1] + self.same_type_pieces
+        move_string = self.piece_moved[1] + disambiguation
         if self.is_capture:
             move_string += 'x'
 
-        return move_string + end_square + checks
\ No newline at end of file
+        return move_string + end_square + checks
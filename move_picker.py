@@ -0,0 +1,109 @@
+"""Staged move picker for the search.
+
+Moves come out in the order most likely to cause a beta cutoff, and each stage is only generated
+once the earlier ones have failed to produce one:
+
+    1. the hash move, verified on its own square without generating the full move list
+    2. captures and promotions that don't obviously lose material (good_capture), most valuable
+       victim / least valuable attacker first
+    3. killer moves (quiet moves that caused a cutoff at the same ply elsewhere in the tree) and the
+       counter-move to the opponent's last move
+    4. the remaining quiet moves, by history score
+    5. the captures held back from stage 2, such as a queen taking a defended pawn
+
+The quiet moves of stages 3 and 4 are generated on their own (generate_quiets), so reaching them
+doesn't repeat the capture generation of stage 2.
+"""
+from move import (SHORT_MASK, PROMOTION_MASK, CAPTURED_MASK, CAPTURED_SHIFT, MOVED_SHIFT, ENPASSANT_FLAG, TO_SHIFT,
+                  SQUARE_MASK)
+from mailbox_board import TYPE_MASK
+
+HASH_MOVE, CAPTURES, KILLERS, QUIETS, BAD_CAPTURES = range(5)
+STAGE_NAMES = ("hash", "captures", "killers", "quiets", "bad captures")
+
+# Indexed by piece type (pawn .. king); the king is cheapest as an attacker since it can't be lost
+MVV_LVA_VALUES = (0, 1, 3, 3, 5, 9, 0)
+
+
+def capture_score(move: int) -> int:
+    """MVV-LVA score of a packed capture and/or promotion (0 for a quiet move)."""
+    score = 0
+    if move & CAPTURED_MASK:
+        victim = MVV_LVA_VALUES[move >> CAPTURED_SHIFT & TYPE_MASK]
+        attacker = MVV_LVA_VALUES[move >> MOVED_SHIFT & TYPE_MASK]
+        score += 1000 + victim * 10 - attacker
+    if move & PROMOTION_MASK:
+        score += 900
+    return score
+
+
+def good_capture(gs, move: int) -> bool:
+    """Cheap exchange test of a packed capture in gs: it can't lose material if the victim is worth at
+    least the attacker or nothing defends the victim's square. Promotions and en passant always pass.
+
+    gs's moves must have just been generated (see GameState.enemy_attacks).
+    """
+    if move & (PROMOTION_MASK | ENPASSANT_FLAG) or not move & CAPTURED_MASK:
+        return True
+    if MVV_LVA_VALUES[move >> CAPTURED_SHIFT & TYPE_MASK] >= MVV_LVA_VALUES[move >> MOVED_SHIFT & TYPE_MASK]:
+        return True
+    return not gs.enemy_attacks(move >> TO_SHIFT & SQUARE_MASK)
+
+
+class MovePicker:
+    """Iterates over the legal (packed) moves of a position, best guesses first.
+
+    Later stages are generated from gs when they are reached, so the position must be back where it
+    started (every make_move undone) each time the next move is requested. stage tells the caller
+    which stage the last move came from.
+    """
+
+    def __init__(self, gs, hash_move: int = 0, killers=(), counter_move: int = 0, history=None):
+        self.gs = gs
+        self.hash_move = hash_move
+        self.killers = killers
+        self.counter_move = counter_move
+        self.history = history  # Butterfly table indexed by the from/to bits of a move
+        self.stage = HASH_MOVE
+
+    def __iter__(self):
+        gs = self.gs
+        hash_move = self.hash_move
+
+        if hash_move:
+            move = gs.legal_move_from_code(hash_move)
+            if move:
+                yield move
+
+        self.stage = CAPTURES
+        captures = gs.generate_captures()
+        captures.sort(key=capture_score, reverse=True)
+        # Sorted out before the first one is searched, which rebuilds gs's attack information
+        good_captures, bad_captures = [], []
+        for move in captures:
+            if move & SHORT_MASK != hash_move:
+                (good_captures if good_capture(gs, move) else bad_captures).append(move)
+        yield from good_captures
+
+        self.stage = KILLERS
+        quiets = gs.generate_quiets()
+        killers = [killer for killer in self.killers if killer and killer != hash_move]
+        if self.counter_move and self.counter_move != hash_move and self.counter_move not in killers:
+            killers.append(self.counter_move)
+        for killer in killers:
+            for move in quiets:
+                if move & SHORT_MASK == killer:
+                    yield move
+                    break
+
+        self.stage = QUIETS
+        history = self.history
+        if history is not None:
+            quiets.sort(key=lambda move: history[move & 0xFFF], reverse=True)
+        for move in quiets:
+            code = move & SHORT_MASK
+            if code != hash_move and code not in killers:
+                yield move
+
+        self.stage = BAD_CAPTURES
+        yield from bad_captures
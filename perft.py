@@ -0,0 +1,166 @@
+"""Perft: count the leaf nodes of the legal move tree to check and time move generation.
+
+    python perft.py                          # reference suite to depth 3 on the default backend
+    python perft.py --depth 4 --backend all  # ... on every backend, which must agree
+    python perft.py --position 1 --depth 4 --divide
+    python perft.py --fen "<fen>" --depth 5 --workers 4 --hash 64
+"""
+import argparse
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import engine
+from move import Move
+
+# Reference leaf counts by depth (index 0 is depth 1). The first six are GameState.fen_string.
+REFERENCE_COUNTS: Dict[str, List[int]] = {
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": [20, 400, 8902, 197281, 4865609, 119060324],
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1": [48, 2039, 97862, 4085603, 193690690],
+    "4r3/4r3/4k3/8/8/8/8/4K3 w - - 0 1": [5, 105, 598, 16841, 91055],
+    "8/k7/3p4/p2P1p2/P2P1P2/8/8/K7 w - - 0 1": [3, 15, 90, 396, 2090],
+    "qrb5/rk1p1K2/p2P4/Pp6/1N2n3/6p1/5nB1/6b1 w - - 0 1": [17, 140, 2253, 29785, 468767],
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8": [44, 1486, 62379, 2103487, 89941194],
+    # The usual "position 3" and "position 4" test positions
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1": [14, 191, 2812, 43238, 674624, 11030083],
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1": [6, 264, 9467, 422333, 15833292],
+}
+
+MASK64 = (1 << 64) - 1
+DEPTH_MIX = 0x9E3779B97F4A7C15
+
+
+class PerftHash:
+    """Always-replace cache of subtree counts keyed by (Zobrist key, depth)."""
+
+    def __init__(self, size_mb: int):
+        self.size = max(1, size_mb * 1024 * 1024 // 16)
+        self.keys = array('Q', bytes(8 * self.size))
+        self.counts = array('Q', bytes(8 * self.size))
+        self.hits = 0
+
+    def probe(self, key: int, depth: int) -> int:
+        key = (key + depth * DEPTH_MIX) & MASK64 or 1
+        index = key % self.size
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.counts[index]
+        return 0
+
+    def store(self, key: int, depth: int, nodes: int):
+        key = (key + depth * DEPTH_MIX) & MASK64 or 1
+        index = key % self.size
+        self.keys[index] = key
+        self.counts[index] = nodes
+
+
+def perft(gs, depth: int, table: Optional[PerftHash] = None) -> int:
+    """Count leaf nodes depth plies below gs (bulk counting at the last ply)."""
+    if depth == 0:
+        return 1
+    if table is not None:
+        nodes = table.probe(gs.zobrist_key, depth)
+        if nodes:
+            return nodes
+
+    moves = gs.generate_legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        gs.make_move(move)
+        nodes += perft(gs, depth - 1, table)
+        gs.undo_move()
+
+    if table is not None:
+        table.store(gs.zobrist_key, depth, nodes)
+    return nodes
+
+
+def _perft_root_move(args: Tuple[str, int, int, str, int]) -> Tuple[str, int]:
+    """Process pool worker: perft below one (packed) root move."""
+    fen, move, depth, backend, hash_mb = args
+    gs = engine.new_game_state(fen, backend)
+    gs.make_move(move)
+    return Move.from_code(move).get_chess_notation(), perft(gs, depth - 1, PerftHash(hash_mb) if hash_mb else None)
+
+
+def divide(fen: str, depth: int, backend: str = "mailbox", hash_mb: int = 0,
+           workers: int = 1) -> List[Tuple[str, int]]:
+    """Return (root move, leaf count) pairs, optionally splitting the root moves across processes."""
+    gs = engine.new_game_state(fen, backend)
+    if workers > 1:
+        jobs = [(fen, move, depth, backend, hash_mb) for move in gs.generate_legal_moves()]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_perft_root_move, jobs))
+    table = PerftHash(hash_mb) if hash_mb else None
+    results = []
+    for move in gs.generate_legal_moves():
+        gs.make_move(move)
+        results.append((Move.from_code(move).get_chess_notation(), perft(gs, depth - 1, table)))
+        gs.undo_move()
+    return results
+
+
+def run(fen: str, depth: int, backend: str, hash_mb: int, workers: int, show_divide: bool) -> Tuple[int, float]:
+    """Run one perft, print the per-move split if asked, and return (nodes, seconds)."""
+    start = time.perf_counter()
+    if depth >= 2 and (show_divide or workers > 1):
+        results = divide(fen, depth, backend, hash_mb, workers)
+        nodes = sum(count for _, count in results)
+        if show_divide:
+            for notation, count in sorted(results):
+                print(f"{notation}: {count}")
+    else:
+        nodes = perft(engine.new_game_state(fen, backend), depth, PerftHash(hash_mb) if hash_mb else None)
+    return nodes, time.perf_counter() - start
+
+
+def run_suite(depth: int, backends: List[str], hash_mb: int, workers: int) -> bool:
+    """Check every reference position up to depth; return True if all counts match."""
+    ok = True
+    for fen, counts in REFERENCE_COUNTS.items():
+        d = min(depth, len(counts))
+        for backend in backends:
+            nodes, elapsed = run(fen, d, backend, hash_mb, workers, False)
+            status = "ok" if nodes == counts[d - 1] else f"FAIL (expected {counts[d - 1]})"
+            ok &= nodes == counts[d - 1]
+            print(f"{backend:>8} d{d} {nodes:>11} {nodes / elapsed:>10.0f} nodes/s  {status:<6} {fen}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--fen", help="position to count from")
+    target.add_argument("--position", type=int, help="index into GameState.fen_string")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    parser.add_argument("--backend", default="mailbox", choices=engine.BACKENDS + ("all",))
+    parser.add_argument("--hash", type=int, default=0, metavar="MB", help="hashed perft with a table of MB megabytes")
+    parser.add_argument("--workers", type=int, default=1, help="split root moves across this many processes")
+    args = parser.parse_args(argv)
+
+    backends = list(engine.BACKENDS) if args.backend == "all" else [args.backend]
+
+    if args.fen is None and args.position is None:
+        return 0 if run_suite(args.depth, backends, args.hash, args.workers) else 1
+
+    fen = args.fen if args.fen is not None else engine.GameState().fen_string[args.position]
+    expected = REFERENCE_COUNTS.get(fen, [])
+    ok = True
+    for backend in backends:
+        nodes, elapsed = run(fen, args.depth, backend, args.hash, args.workers, args.divide)
+        line = f"{backend}: {nodes} nodes in {elapsed:.2f}s ({nodes / elapsed:.0f} nodes/s)"
+        if args.depth <= len(expected):
+            ok &= nodes == expected[args.depth - 1]
+            line += " ok" if nodes == expected[args.depth - 1] else f" FAIL (expected {expected[args.depth - 1]})"
+        print(line)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""PGN reading and writing: games as tag pairs plus their main line in SAN, SAN to packed moves,
+and GameStates back to PGN.
+
+    for headers, gs in replay_games(open("games.pgn")):   # gs.move_log holds the packed moves
+        ...
+    write_game(sys.stdout, gs, {"White": "Engine", "Result": "1-0"})
+
+    python pgn.py bench games.pgn [more.pgn ...]   # games/s read, and replayed into GameState
+    python pgn.py bench --generate 500             # same on random games written by write_game
+
+Files are read line by line, so memory doesn't grow with their size. Comments, NAGs and variations
+are skipped, so only the main line is returned.
+"""
+import argparse
+import io
+import random
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+import engine
+
+from mailbox_board import PAWN, TYPE_MASK, LETTER_TYPES
+from move import TO_SHIFT, MOVED_SHIFT, PROMOTION_SHIFT, PROMOTION_MASK, CASTLE_FLAG, SQUARE_MASK, PROMOTION_CODES
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+TAG_PATTERN = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Movetext tokens: comment/variation delimiters, NAGs, results, move numbers, then anything else (a move)
+TOKEN_PATTERN = re.compile(r'[{};()]|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s{};()$]+')
+SAN_PATTERN = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h])([1-8])(?:=?([NBRQ]))?")
+CASTLES = {"O-O": 6, "0-0": 6, "O-O-O": 2, "0-0-0": 2}  # Destination column of the king
+
+FILES = "abcdefgh"
+RANKS = "87654321"  # Index = GameState row
+
+# The Seven Tag Roster, written first and in this order, with the standard's values for unknowns
+ROSTER = (("Event", "?"), ("Site", "?"), ("Date", "????.??.??"), ("Round", "?"), ("White", "?"), ("Black", "?"),
+          ("Result", "*"))
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+LINE_LENGTH = 79  # Movetext lines stay under the standard's 80 columns
+
+
+def read_games(stream: TextIO) -> Iterator[Tuple[Dict[str, str], List[str]]]:
+    """Yield (tags, main line SAN moves) for each game in stream, reading it line by line.
+
+    A game ends at its result token, or at the next tag section if the result is missing.
+    """
+    headers, moves = {}, []
+    comment = False  # Inside a {...} comment, which may span lines
+    variation_depth = 0
+    for line in stream:
+        if not comment and variation_depth == 0:
+            stripped = line.lstrip()
+            if stripped.startswith("["):
+                if moves:
+                    yield headers, moves
+                    headers, moves = {}, []
+                match = TAG_PATTERN.match(stripped)
+                if match:
+                    headers[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+                continue
+            if stripped.startswith("%"):
+                continue  # Escaped line
+
+        pos = 0
+        while True:
+            if comment:
+                end = line.find("}", pos)
+                if end < 0:
+                    break
+                comment = False
+                pos = end + 1
+            match = TOKEN_PATTERN.search(line, pos)
+            if match is None:
+                break
+            token = match.group()
+            pos = match.end()
+            if token == "{":
+                comment = True
+            elif token == ";":
+                break  # Rest-of-line comment
+            elif token == "(":
+                variation_depth += 1
+            elif token == ")":
+                variation_depth = max(variation_depth - 1, 0)
+            elif variation_depth or token[0] == "$" or token[-1] == ".":
+                continue
+            elif token in RESULTS:
+                headers.setdefault("Result", token)
+                yield headers, moves
+                headers, moves = {}, []
+            else:
+                moves.append(token)
+
+    if moves or headers:
+        yield headers, moves
+
+
+def parse_san(gs, san: str) -> int:
+    """The legal packed move in gs written as san (check marks and annotations allowed), or 0 if there is
+    none or it is ambiguous."""
+    san = san.rstrip("+#!?")
+    if san in CASTLES:
+        column = CASTLES[san]
+        for move in gs.generate_legal_moves():
+            if move & CASTLE_FLAG and (move >> TO_SHIFT) & 7 == column:
+                return move
+        return 0
+
+    match = SAN_PATTERN.fullmatch(san)
+    if match is None:
+        return 0
+    piece, from_file, from_rank, to_file, to_rank, promotion = match.groups()
+    piece_type = LETTER_TYPES[piece] if piece else PAWN
+    to = RANKS.index(to_rank) * 8 + FILES.index(to_file)
+    promotion_bits = PROMOTION_CODES[promotion] << PROMOTION_SHIFT if promotion else 0
+
+    found = 0
+    for move in gs.generate_legal_moves():
+        if (move >> TO_SHIFT) & SQUARE_MASK != to or (move >> MOVED_SHIFT) & TYPE_MASK != piece_type or \
+                move & PROMOTION_MASK != promotion_bits:
+            continue
+        start = move & SQUARE_MASK
+        if from_file and start & 7 != FILES.index(from_file) or from_rank and start >> 3 != RANKS.index(from_rank):
+            continue
+        if found:
+            return 0
+        found = move
+    return found
+
+
+def replay_games(stream: TextIO, skip_errors: bool = False) -> Iterator[Tuple[Dict[str, str], engine.GameState]]:
+    """Yield (tags, GameState after the main line) for each game in stream; the state's move_log holds the
+    packed moves, played from the FEN tag if there is one.
+
+    A move that doesn't resolve to exactly one legal move raises ValueError, or skips that game if skip_errors.
+    """
+    for number, (headers, sans) in enumerate(read_games(stream), 1):
+        gs = engine.GameState(headers.get("FEN"))
+        for san in sans:
+            move = parse_san(gs, san)
+            if not move:
+                break
+            gs.make_move(move)
+        else:
+            yield headers, gs
+            continue
+        if not skip_errors:
+            raise ValueError(f"game {number}: illegal or ambiguous move {san!r} after {len(gs.move_log)} plies")
+
+
+def _tag(name: str, value: str) -> str:
+    return '[%s "%s"]' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def format_game(gs, headers: Optional[Dict[str, str]] = None) -> str:
+    """gs's moves (classical_move_log) from its start position as a PGN game, with headers as tags.
+
+    The Seven Tag Roster comes first, filled with "?" where headers have no value, and SetUp/FEN are
+    added when the game didn't start from the initial position.
+    """
+    headers = dict(headers or {})
+    result = headers.get("Result", "*")
+    lines = [_tag(name, headers.pop(name, default)) for name, default in ROSTER]
+    headers.pop("SetUp", None)
+    headers.pop("FEN", None)
+    if gs.start_fen != START_FEN:
+        lines += [_tag("SetUp", "1"), _tag("FEN", gs.start_fen)]
+    lines += [_tag(name, value) for name, value in headers.items()]
+    lines.append("")
+
+    # Move numbers before white's moves, and before a first move by black as "N..."
+    number = gs.fen_obj.fullmove_number
+    white = gs.fen_obj.white_to_move
+    tokens = []
+    for san in gs.classical_move_log:
+        if white:
+            tokens.append(f"{number}.")
+        elif not tokens:
+            tokens.append(f"{number}...")
+        tokens.append(san)
+        number += not white
+        white = not white
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def write_game(stream: TextIO, gs, headers: Optional[Dict[str, str]] = None):
+    """Append gs as a PGN game to stream, see format_game."""
+    stream.write(format_game(gs, headers))
+
+
+def random_games(count: int, seed: int = 1, max_plies: int = 200) -> str:
+    """count random legal games as PGN text, for the benchmark."""
+    rng = random.Random(seed)
+    out = io.StringIO()
+    for number in range(1, count + 1):
+        gs = engine.GameState()
+        for _ in range(rng.randint(1, max_plies)):
+            moves = gs.generate_legal_moves()
+            if not moves:
+                break
+            gs.make_move(rng.choice(moves))
+        write_game(out, gs, {"Event": "Random games", "Round": str(number)})
+    return out.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench_parser = commands.add_parser("bench", help="games/s of reading and of replaying into GameState")
+    bench_parser.add_argument("pgn", nargs="*")
+    bench_parser.add_argument("--generate", type=int, default=200, help="random games to use without PGN files")
+    bench_parser.add_argument("--limit", type=int, help="stop after this many games per file")
+    args = parser.parse_args(argv)
+
+    generated = "" if args.pgn else random_games(args.generate)  # Made before the clock starts
+
+    def sources():
+        if not args.pgn:
+            yield io.StringIO(generated)
+        for path in args.pgn:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield f
+
+    def timed(games, game_plies):
+        count = plies = 0
+        start = time.perf_counter()
+        for source in sources():
+            for count_in_file, (_, game) in enumerate(games(source), 1):
+                count += 1
+                plies += game_plies(game)
+                if args.limit and count_in_file >= args.limit:
+                    break
+        return count, plies, time.perf_counter() - start
+
+    for name, games, game_plies in (("read", read_games, len),
+                                    ("replay", lambda source: replay_games(source, skip_errors=True),
+                                     lambda gs: len(gs.move_log))):
+        count, plies, elapsed = timed(games, game_plies)
+        elapsed = max(elapsed, 1e-9)
+        print(f"{name:>6}: {count} games, {plies} plies in {elapsed:.2f}s "
+              f"({count / elapsed:,.1f} games/s, {plies / elapsed:,.0f} plies/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Search benchmark: nodes and time to a fixed depth on a fixed position set, per search feature.
+
+    python search_bench.py                  # depth 5, every feature on, then each one switched off
+    python search_bench.py --depth 6 --features pvs
+    python search_bench.py --backend bitboard
+    python search_bench.py --scaling 4      # nodes/s and time to depth with 1 .. 4 worker processes
+    python search_bench.py --check-stop     # a stopped search must not write to the table
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import ai
+import engine
+from time_manager import SearchLimits
+
+POSITIONS: List[str] = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r2q1rk1/ppp2ppp/2np1n2/2b1p1B1/2B1P1b1/2NP1N2/PPP2PPP/R2Q1RK1 w - - 6 8",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+]
+
+FEATURES = ("null_move", "late_move_reductions", "pvs")
+
+
+def search(fen: str, depth: int, backend: str, features: Dict[str, bool], workers: int = 1) -> Tuple[str, int, float]:
+    """Search fen to depth with fresh tables and return (best move, nodes, seconds).
+
+    With several workers the nodes of every process are counted.
+    """
+    ai.shared_table().clear()
+    gs = engine.new_game_state(fen, backend)
+    chess_ai = ai.ChessAI(depth=depth, time_limit=float("inf"), workers=workers, **features)
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            move = chess_ai.get_best_move(gs)
+        elapsed = time.perf_counter() - start
+    finally:
+        chess_ai.close()
+    return str(move), ai.counter + chess_ai.helper_nodes, elapsed
+
+
+def run(depth: int, backend: str, features: Dict[str, bool], workers: int = 1) -> Tuple[int, float]:
+    """Search every position and return the total (nodes, seconds)."""
+    label = ", ".join(name for name in FEATURES if features[name]) or "plain alpha-beta"
+    print(f"{label} (depth {depth}, {backend}, {workers} worker{'s' if workers > 1 else ''})")
+    total_nodes, total_time = 0, 0.0
+    for fen in POSITIONS:
+        move, nodes, elapsed = search(fen, depth, backend, features, workers)
+        total_nodes += nodes
+        total_time += elapsed
+        print(f"  {move:>7} {nodes:>9} nodes {elapsed:7.2f}s  {fen}")
+    print(f"  total   {total_nodes:>9} nodes {total_time:7.2f}s")
+    return total_nodes, total_time
+
+
+def scaling(depth: int, backend: str, max_workers: int):
+    """Lazy SMP scaling: total nodes/s and time to depth from 1 to max_workers processes."""
+    features = {name: True for name in FEATURES}
+    base_nodes, base_time = run(depth, backend, features, 1)
+    rows = [(1, base_nodes, base_time)]
+    for workers in range(2, max_workers + 1):
+        rows.append((workers,) + run(depth, backend, features, workers))
+    print("workers   nodes/s  nps scaling  time-to-depth speedup")
+    for workers, nodes, elapsed in rows:
+        print(f"{workers:>7} {nodes / elapsed:>9.0f} {nodes / elapsed / (base_nodes / base_time):>12.2f}x "
+              f"{base_time / elapsed:>22.2f}x")
+
+
+def check_stop(nodes: int = 150000) -> bool:
+    """Stop searches with a node limit and check that nothing was stored in the table after the stop,
+    where only unfinished, meaningless scores are left to store."""
+    ok = True
+    for fen in POSITIONS:
+        table = ai.shared_table()
+        table.clear()
+        chess_ai = ai.ChessAI()
+        late_stores = []
+        store = table.store
+
+        def checked_store(*args):
+            if chess_ai.stopped:
+                late_stores.append(args)
+            store(*args)
+
+        table.store = checked_store
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                chess_ai.get_best_move(engine.GameState(fen), limits=SearchLimits(nodes=nodes))
+        finally:
+            del table.store
+        stopped = chess_ai.stopped
+        ok &= not late_stores
+        status = "ok" if not late_stores else f"FAIL: {len(late_stores)} stores after the stop, e.g. {late_stores[:3]}"
+        print(f"  {'stopped' if stopped else 'finished':>8} at depth {chess_ai.completed_depth}  {status}  {fen}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--backend", default="mailbox", choices=engine.BACKENDS)
+    parser.add_argument("--features", nargs="*", choices=FEATURES,
+                        help="search with only these features on (default: all on, then each one off)")
+    parser.add_argument("--workers", type=int, default=1, help="search with this many processes (Lazy SMP)")
+    parser.add_argument("--scaling", type=int, metavar="N", help="compare 1 to N worker processes")
+    parser.add_argument("--check-stop", action="store_true",
+                        help="check that searches stopped by a node limit leave the table alone")
+    args = parser.parse_args(argv)
+
+    # Keep the benchmark away from the persistent table the GUI uses
+    ai.tt = ai.open_transposition_table(None)
+
+    if args.check_stop:
+        return 0 if check_stop() else 1
+
+    if args.scaling:
+        scaling(args.depth, args.backend, args.scaling)
+        return 0
+
+    if args.features is not None:
+        run(args.depth, args.backend, {name: name in args.features for name in FEATURES}, args.workers)
+        return 0
+
+    baseline_nodes, baseline_time = run(args.depth, args.backend, {name: True for name in FEATURES}, args.workers)
+    for off in FEATURES:
+        nodes, elapsed = run(args.depth, args.backend, {name: name != off for name in FEATURES}, args.workers)
+        print(f"  without {off}: {nodes / baseline_nodes:.2f}x nodes, {elapsed / baseline_time:.2f}x time")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Search limits and time allocation.
+
+SearchLimits holds what a search may use, the same limits as a UCI "go" command (times in seconds).
+TimeManager turns them into two deadlines for one search:
+
+    soft  checked between iterations: don't start another depth after it. In clock modes it is scaled
+          by how many iterations the best move has survived, so a stable answer is played sooner.
+    hard  checked during the search: stop at once and fall back on the last completed iteration.
+"""
+import time
+from typing import Optional
+
+MOVE_OVERHEAD = 0.05  # Seconds kept back each move for GUI / protocol latency
+DEFAULT_MOVES_TO_GO = 30  # Moves the remaining clock is spread over when movestogo isn't given
+INCREMENT_SHARE = 0.75  # Part of the increment spent on the current move
+HARD_LIMIT_FACTOR = 4  # The hard deadline may run this many times past the soft one ...
+MAX_CLOCK_SHARE = 0.5  # ... but never past this share of the remaining clock (unless it is the last move)
+MOVETIME_SOFT_SHARE = 0.8  # With a fixed move time, no new iteration after this share of it
+# Soft deadline scale by the number of completed iterations the best move has stayed the same for
+STABILITY_SCALE = (1.5, 1.0, 0.75, 0.6)
+
+
+class SearchLimits:
+    """What a search may use; None means no limit of that kind.
+
+    wtime/btime are the clocks, winc/binc the increments per move and movestogo the moves to the next
+    time control. movetime fixes the time for this move. infinite searches until stopped.
+    """
+
+    def __init__(self, depth: Optional[int] = None, nodes: Optional[int] = None, movetime: Optional[float] = None,
+                 wtime: Optional[float] = None, btime: Optional[float] = None, winc: float = 0.0, binc: float = 0.0,
+                 movestogo: Optional[int] = None, infinite: bool = False):
+        self.depth = depth
+        self.nodes = nodes
+        self.movetime = movetime
+        self.wtime = wtime
+        self.btime = btime
+        self.winc = winc
+        self.binc = binc
+        self.movestogo = movestogo
+        self.infinite = infinite
+
+    def __repr__(self) -> str:
+        limits = [f"{name}={value}" for name, value in vars(self).items() if value not in (None, 0.0, False)]
+        return f"SearchLimits({', '.join(limits)})"
+
+
+class TimeManager:
+    """Deadlines of one search, measured from start_time (default: now)."""
+
+    def __init__(self, limits: SearchLimits, white_to_move: bool, start_time: Optional[float] = None):
+        self.limits = limits
+        self.start_time = time.time() if start_time is None else start_time
+        self.soft_limit = None  # Seconds from start_time; None: no deadline
+        self.hard_limit = None
+        self.flexible = False  # Whether the soft deadline moves with best move stability
+
+        clock = limits.wtime if white_to_move else limits.btime
+        if limits.infinite:
+            pass
+        elif limits.movetime is not None:
+            self.hard_limit = max(limits.movetime - MOVE_OVERHEAD, 0.0)
+            self.soft_limit = self.hard_limit * MOVETIME_SOFT_SHARE
+        elif clock is not None:
+            moves_to_go = limits.movestogo or DEFAULT_MOVES_TO_GO
+            increment = limits.winc if white_to_move else limits.binc
+            available = max(clock - MOVE_OVERHEAD, 0.0)
+            self.soft_limit = available / moves_to_go + increment * INCREMENT_SHARE
+            self.hard_limit = min(self.soft_limit * HARD_LIMIT_FACTOR,
+                                  available * (MAX_CLOCK_SHARE if moves_to_go > 1 else 1.0))
+            self.soft_limit = min(self.soft_limit, self.hard_limit)
+            self.flexible = True
+
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    def max_depth(self, default: int) -> int:
+        """The depth limit, else default."""
+        return self.limits.depth if self.limits.depth is not None else default
+
+    def hard_stop(self, nodes: int) -> bool:
+        """Whether the search must stop now."""
+        if self.limits.nodes is not None and nodes >= self.limits.nodes:
+            return True
+        return self.hard_limit is not None and self.elapsed() >= self.hard_limit
+
+    def soft_stop(self, nodes: int, stable_iterations: int) -> bool:
+        """Whether to play the current best move rather than start another iteration."""
+        if self.hard_stop(nodes):
+            return True
+        if self.soft_limit is None:
+            return False
+        limit = self.soft_limit
+        if self.flexible:
+            limit *= STABILITY_SCALE[min(stable_iterations, len(STABILITY_SCALE) - 1)]
+        return self.elapsed() >= limit
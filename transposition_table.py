@@ -0,0 +1,281 @@
+import mmap
+import os
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import zobrist
+
+# Each entry is two 64-bit words: the position key XOR-ed with the data word, then the data word.
+# Storing key ^ data means a torn entry (key and data from different writes) simply fails verification.
+ENTRY_WORDS = 2
+ENTRY_BYTES = ENTRY_WORDS * 8
+BUCKET_SIZE = 4
+
+# Data word layout (low to high bits): move 16, score 32, depth 8, flag 2, generation 6.
+SCORE_SHIFT = 16
+SCORE_OFFSET = 1 << 31
+DEPTH_SHIFT = 48
+FLAG_SHIFT = 56
+GENERATION_SHIFT = 58
+GENERATION_MASK = 0x3F
+
+FLAG_CODES = {"EXACT": 1, "ALPHA": 2, "BETA": 3}
+FLAG_NAMES = (None, "EXACT", "ALPHA", "BETA")
+
+EMPTY_SLOT_VALUE = -(1 << 16)  # Lower than any depth/age replacement value, so empty slots fill first
+
+
+def pack_data(score: int, depth: int, flag: int, move: int, generation: int) -> int:
+    """Pack one entry's payload into a single 64-bit word."""
+    return ((move & 0xFFFF) | ((score + SCORE_OFFSET) << SCORE_SHIFT) | (depth << DEPTH_SHIFT)
+            | (flag << FLAG_SHIFT) | (generation << GENERATION_SHIFT))
+
+
+def buckets_for_size(size_mb: int) -> int:
+    return max(1, (size_mb * 1024 * 1024) // (BUCKET_SIZE * ENTRY_BYTES))
+
+
+class TranspositionTable:
+    """Preallocated, bucketed transposition table stored in a flat buffer of 64-bit words."""
+
+    def __init__(self, size_mb: int = 64, buffer=None):
+        self.num_buckets = buckets_for_size(size_mb)
+        self.capacity = self.num_buckets * BUCKET_SIZE
+        if buffer is None:
+            buffer = bytearray(self.capacity * ENTRY_BYTES)
+        self._bytes = memoryview(buffer)[:self.capacity * ENTRY_BYTES]
+        self.words = self._bytes.cast('Q')
+        self.generation = 0
+        self.used = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes actually held by the entry buffer."""
+        return self._bytes.nbytes
+
+    def new_search(self):
+        """Advance the generation so entries from earlier searches age out first."""
+        self.generation = (self.generation + 1) & GENERATION_MASK
+
+    def _probe(self, key: int) -> Tuple[int, int]:
+        """Return (word index, data) of the entry for key, or (-1, 0) if absent."""
+        words = self.words
+        start = (key % self.num_buckets) * BUCKET_SIZE * ENTRY_WORDS
+        for i in range(start, start + BUCKET_SIZE * ENTRY_WORDS, ENTRY_WORDS):
+            data = words[i + 1]
+            if data and words[i] ^ data == key:
+                return i, data
+        return -1, 0
+
+    def lookup(self, key: int, depth: int) -> Optional[Tuple[int, str, int]]:
+        """Return (score, flag, move) if key is stored at least as deep as depth."""
+        self.probes += 1
+        _, data = self._probe(key)
+        if data and (data >> DEPTH_SHIFT) & 0xFF >= depth:
+            self.hits += 1
+            score = ((data >> SCORE_SHIFT) & 0xFFFFFFFF) - SCORE_OFFSET
+            return score, FLAG_NAMES[(data >> FLAG_SHIFT) & 0x3], data & 0xFFFF
+        return None
+
+    def best_move(self, key: int) -> int:
+        """Return the stored move for key regardless of depth (0 if none)."""
+        return self._probe(key)[1] & 0xFFFF
+
+    def store(self, key: int, score: int, depth: int, flag: str, best_move: int = 0):
+        words = self.words
+        start = (key % self.num_buckets) * BUCKET_SIZE * ENTRY_WORDS
+        generation = self.generation
+
+        victim = -1
+        victim_value = 0
+        for i in range(start, start + BUCKET_SIZE * ENTRY_WORDS, ENTRY_WORDS):
+            data = words[i + 1]
+            if data and words[i] ^ data == key:
+                if not best_move:
+                    best_move = data & 0xFFFF
+                victim = i
+                break
+            if not data:
+                value = EMPTY_SLOT_VALUE
+            else:
+                # Prefer evicting shallow entries and entries left over from older searches.
+                age = (generation - (data >> GENERATION_SHIFT)) & GENERATION_MASK
+                value = ((data >> DEPTH_SHIFT) & 0xFF) - 8 * age
+            if victim < 0 or value < victim_value:
+                victim, victim_value = i, value
+
+        old_data = words[victim + 1]
+        if not old_data:
+            self.used += 1
+        elif words[victim] ^ old_data != key:
+            self.collisions += 1
+
+        data = pack_data(score, depth, FLAG_CODES[flag], best_move, generation)
+        words[victim] = key ^ data
+        words[victim + 1] = data
+        self.stores += 1
+
+    def occupancy(self) -> float:
+        """Fraction of entries in use."""
+        return self.used / self.capacity
+
+    def hashfull(self) -> int:
+        """Permille of the first 1000 entries in use by the current generation (UCI style)."""
+        words = self.words
+        sample = min(1000, self.capacity)
+        used = 0
+        for i in range(0, sample * ENTRY_WORDS, ENTRY_WORDS):
+            data = words[i + 1]
+            if data and (data >> GENERATION_SHIFT) == self.generation:
+                used += 1
+        return used * 1000 // sample
+
+    def stats(self) -> dict:
+        return {"probes": self.probes, "hits": self.hits, "stores": self.stores, "collisions": self.collisions,
+                "occupancy": self.occupancy(), "memory_bytes": self.memory_bytes}
+
+    def maybe_checkpoint(self):
+        """Persist the table if the checkpoint policy says so (no-op in memory)."""
+
+    def end_search(self):
+        """Called once a search finishes (no-op in memory)."""
+
+    def clear(self):
+        self._bytes[:] = bytes(self._bytes.nbytes)
+        self.generation = 0
+        self.used = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def close(self):
+        self.words.release()
+        self._bytes.release()
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """Transposition table in a multiprocessing.shared_memory block, shared by parallel search processes.
+
+    Processes write entries without locking: a torn entry fails its key ^ data check and reads as a miss.
+    The creating process (name=None) owns the block and unlinks it on close. Other processes attach by
+    name, which is what unpickling does, so the table can be passed to a worker process as an argument.
+    used and the statistics are counted per process.
+    """
+
+    def __init__(self, size_mb: int = 64, name: Optional[str] = None):
+        self.size_mb = size_mb
+        self.owner = name is None
+        if self.owner:
+            size = buckets_for_size(size_mb) * BUCKET_SIZE * ENTRY_BYTES
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shared_memory = shared_memory.SharedMemory(name=name)
+        super().__init__(size_mb, self.shared_memory.buf)
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    def __reduce__(self):
+        return SharedTranspositionTable, (self.size_mb, self.name)
+
+    def close(self):
+        super().close()
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
+
+
+# On-disk layout: a fixed header followed by the raw entry buffer, so the file can be mapped as-is.
+FILE_MAGIC = b"CHESSTT\0"
+FILE_FORMAT_VERSION = 3  # 2: scores in search centipawns; 3: mate scores counted from the entry's node
+HEADER_STRUCT = struct.Struct("<8sIIQIQ")  # magic, format, zobrist version, buckets, generation, used
+HEADER_BYTES = 64  # Header plus CRC, padded so the entries stay 8-byte aligned
+
+
+class PersistentTranspositionTable(TranspositionTable):
+    """Transposition table living in a memory-mapped file.
+
+    Pages are only read from disk when touched, and every process that opens the same file shares them.
+    The file is flushed on a checkpoint policy rather than on every store: at the end of a search and/or
+    every checkpoint_interval seconds.
+    """
+
+    def __init__(self, filename: str, size_mb: int = 64, checkpoint_interval: Optional[float] = 30.0,
+                 checkpoint_on_search_end: bool = True):
+        num_buckets = buckets_for_size(size_mb)
+        self.filename = filename
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_on_search_end = checkpoint_on_search_end
+        self._file = self._open_file(filename, num_buckets)
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE)
+        self._view = memoryview(self._mmap)
+        super().__init__(size_mb, self._view[HEADER_BYTES:])
+        self.generation, self.used = self._read_header(self._mmap[:HEADER_BYTES], num_buckets)
+        self.last_checkpoint = time.time()
+
+    @staticmethod
+    def _read_header(header: bytes, num_buckets: int) -> Tuple[int, int]:
+        """Return (generation, used) from a header, or raise ValueError if it does not match this build."""
+        fields = header[:HEADER_STRUCT.size]
+        crc, = struct.unpack_from("<I", header, HEADER_STRUCT.size)
+        if zlib.crc32(fields) != crc:
+            raise ValueError("corrupt header")
+        magic, file_format, zobrist_version, buckets, generation, used = HEADER_STRUCT.unpack(fields)
+        if magic != FILE_MAGIC or file_format != FILE_FORMAT_VERSION or zobrist_version != zobrist.ZOBRIST_VERSION:
+            raise ValueError("stale transposition table file")
+        if buckets != num_buckets:
+            raise ValueError("transposition table size changed")
+        return generation, used
+
+    @staticmethod
+    def _pack_header(num_buckets: int, generation: int, used: int) -> bytes:
+        fields = HEADER_STRUCT.pack(FILE_MAGIC, FILE_FORMAT_VERSION, zobrist.ZOBRIST_VERSION, num_buckets,
+                                    generation, used)
+        return (fields + struct.pack("<I", zlib.crc32(fields))).ljust(HEADER_BYTES, b"\0")
+
+    def _open_file(self, filename: str, num_buckets: int):
+        file_size = HEADER_BYTES + num_buckets * BUCKET_SIZE * ENTRY_BYTES
+        if os.path.exists(filename) and os.path.getsize(filename) == file_size:
+            f = open(filename, "r+b")
+            try:
+                self._read_header(f.read(HEADER_BYTES), num_buckets)
+                return f
+            except ValueError:
+                f.close()
+
+        # Missing, stale or corrupt: start fresh. truncate() leaves the entries sparse and zeroed.
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        f = open(filename, "w+b")
+        f.write(self._pack_header(num_buckets, 0, 0))
+        f.truncate(file_size)
+        f.flush()
+        return f
+
+    def checkpoint(self):
+        self._mmap[:HEADER_BYTES] = self._pack_header(self.num_buckets, self.generation, self.used)
+        self._mmap.flush()
+        self.last_checkpoint = time.time()
+
+    def maybe_checkpoint(self):
+        if self.checkpoint_interval is not None and time.time() - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def end_search(self):
+        if self.checkpoint_on_search_end:
+            self.checkpoint()
+
+    def close(self):
+        self.checkpoint()
+        super().close()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
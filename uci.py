@@ -0,0 +1,260 @@
+"""UCI front-end: drive ChessAI over stdin/stdout, without pygame, for GUIs and match tools.
+
+    python uci.py
+
+Supported: uci, isready, setoption (Hash, Threads), ucinewgame, position startpos|fen ... [moves ...],
+go [wtime btime winc binc movestogo movetime depth nodes infinite ponder], stop, ponderhit, quit.
+Each completed iteration is reported as an info line (depth, score, nodes, nps, hashfull, time, pv).
+The search's own progress messages go to stderr so they don't mix with the protocol.
+"""
+import multiprocessing
+import sys
+import threading
+from typing import List, Optional, TextIO
+
+import ai
+import engine
+from move import Move, TO_SHIFT, PROMOTION_SHIFT, PROMOTION_CODES
+from time_manager import SearchLimits
+from transposition_table import TranspositionTable, SharedTranspositionTable
+
+ENGINE_NAME = "Chess"
+ENGINE_AUTHOR = "the Chess authors"
+HASH_MIN_MB, HASH_MAX_MB = 1, 1024
+MAX_THREADS = 64
+MATE_THRESHOLD = ai.CHECKMATE - 1000  # Scores beyond this are mates, CHECKMATE - plies to mate
+
+# go parameters by value type; times are in milliseconds
+GO_TIMES = ("wtime", "btime", "winc", "binc", "movetime")
+GO_COUNTS = ("movestogo", "depth", "nodes")
+
+
+def parse_move(gs, text: str) -> int:
+    """The legal packed move for coordinate notation like e2e4 or e7e8q in gs, or 0."""
+    files, ranks = "abcdefgh", "87654321"
+    if len(text) not in (4, 5) or text[0] not in files or text[2] not in files or \
+            text[1] not in ranks or text[3] not in ranks:
+        return 0
+    code = (ranks.index(text[1]) * 8 + files.index(text[0])) | \
+        ((ranks.index(text[3]) * 8 + files.index(text[2])) << TO_SHIFT)
+    if len(text) == 5:
+        promotion = PROMOTION_CODES.get(text[4].upper())
+        if promotion is None:
+            return 0
+        code |= promotion << PROMOTION_SHIFT
+    return gs.legal_move_from_code(code)
+
+
+def parse_go(tokens: List[str]) -> SearchLimits:
+    """SearchLimits for the arguments of a go command (unknown ones, like searchmoves, are ignored)."""
+    limits = SearchLimits()
+    i = 0
+    while i < len(tokens):
+        name = tokens[i]
+        if name == "infinite":
+            limits.infinite = True
+        elif (name in GO_TIMES or name in GO_COUNTS) and i + 1 < len(tokens):
+            try:
+                value = int(tokens[i + 1])
+            except ValueError:
+                value = None
+            if value is not None:
+                setattr(limits, name, value / 1000 if name in GO_TIMES else value)
+            i += 1
+        i += 1
+    return limits
+
+
+def format_score(score: int) -> str:
+    """A side-to-move score as UCI: 'cp N', or 'mate N' in moves (negative when getting mated)."""
+    if abs(score) > MATE_THRESHOLD:
+        moves = (ai.CHECKMATE - abs(score) + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+class UCIEngine:
+    """State of one UCI session: the options, the position and the search running in a thread."""
+
+    def __init__(self, output: TextIO):
+        self.output = output
+        self.output_lock = threading.Lock()  # info lines come from the search thread
+        self.hash_mb = ai.TT_SIZE_MB
+        self.threads = 1
+        self.chess_ai = None
+        self.table = None
+        self.gs = engine.GameState()
+        self.search_thread = None
+        self.stop_event = threading.Event()  # stop: end the search (or stop waiting) and send bestmove
+        self.ponder_hit = threading.Event()
+
+    def send(self, line: str):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def engine_ai(self) -> ai.ChessAI:
+        """The ChessAI for the current options, created on first use and kept from search to search."""
+        if self.chess_ai is None:
+            if self.threads > 1:
+                self.table = SharedTranspositionTable(self.hash_mb)
+            else:
+                self.table = TranspositionTable(self.hash_mb)
+            self.chess_ai = ai.ChessAI(workers=self.threads, table=self.table)
+            self.chess_ai.on_iteration = self.send_info
+        return self.chess_ai
+
+    def release_ai(self):
+        """Free the ChessAI and its table, so the next search uses the options as they are now."""
+        if self.chess_ai is not None:
+            self.chess_ai.close()
+            if not isinstance(self.table, SharedTranspositionTable):
+                self.table.close()
+        self.chess_ai = None
+        self.table = None
+
+    def handle(self, line: str) -> bool:
+        """Handle one command line; False once the session should end."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {ai.TT_SIZE_MB} min {HASH_MIN_MB} max {HASH_MAX_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.wait_for_search()
+            self.release_ai()  # Fresh tables for the new game
+        elif command == "position":
+            self.wait_for_search()
+            self.set_position(args)
+        elif command == "go":
+            self.wait_for_search()
+            self.go(args)
+        elif command == "stop":
+            self.stop_event.set()
+            self.wait_for_search()
+        elif command == "ponderhit":
+            self.ponder_hit.set()
+        elif command == "quit":
+            self.stop_event.set()
+            self.wait_for_search()
+            self.release_ai()
+            return False
+        return True
+
+    def set_option(self, args: List[str]):
+        """setoption name <name> value <value>; changing Hash or Threads takes effect at the next search."""
+        if "name" not in args:
+            return
+        value_at = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:value_at]).lower()
+        value = " ".join(args[value_at + 1:])
+        try:
+            if name == "hash":
+                hash_mb = min(max(int(value), HASH_MIN_MB), HASH_MAX_MB)
+                if hash_mb != self.hash_mb:
+                    self.wait_for_search()
+                    self.release_ai()
+                    self.hash_mb = hash_mb
+            elif name == "threads":
+                threads = min(max(int(value), 1), MAX_THREADS)
+                if threads != self.threads:
+                    self.wait_for_search()
+                    self.release_ai()
+                    self.threads = threads
+        except ValueError:
+            self.send(f"info string invalid value for {name}: {value}")
+
+    def set_position(self, args: List[str]):
+        """position startpos|fen <fen> [moves <move> ...]; stops at the first illegal move."""
+        moves_at = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            fen = " ".join(args[1:moves_at])
+        else:
+            fen = None
+        gs = engine.GameState(fen)
+        for text in args[moves_at + 1:]:
+            move = parse_move(gs, text)
+            if not move:
+                self.send(f"info string illegal move {text}")
+                break
+            gs.make_move(move)
+        self.gs = gs
+
+    def go(self, args: List[str]):
+        """Start searching the current position in a thread; it answers with bestmove when done."""
+        limits = parse_go(args)
+        chess_ai = self.engine_ai()
+        self.stop_event.clear()
+        self.ponder_hit.clear()
+        chess_ai.stop_event = self.stop_event
+        chess_ai.ponder_hit = self.ponder_hit
+        chess_ai.pondering = "ponder" in args
+        self.search_thread = threading.Thread(target=self.search, args=(chess_ai, self.gs, limits), daemon=True)
+        self.search_thread.start()
+
+    def search(self, chess_ai: ai.ChessAI, gs, limits: SearchLimits):
+        """Search thread: run the search, then send bestmove (with the expected reply when there is one).
+
+        After an infinite or ponder search, bestmove waits for stop (or ponderhit) as the protocol asks.
+        """
+        pondering = chess_ai.pondering
+        move = chess_ai.get_best_move(gs, limits=limits)
+        if limits.infinite or pondering:
+            while not self.stop_event.is_set() and not (pondering and self.ponder_hit.is_set()):
+                self.stop_event.wait(0.05)
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        reply = chess_ai.ponder_move(gs, move)
+        if reply:
+            self.send(f"bestmove {move.get_chess_notation()} ponder {Move.from_code(reply).get_chess_notation()}")
+        else:
+            self.send(f"bestmove {move.get_chess_notation()}")
+
+    def wait_for_search(self):
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def send_info(self, depth: int, score: int, seconds: float):
+        """ChessAI.on_iteration hook: report a completed iteration."""
+        chess_ai = self.chess_ai
+        nodes = chess_ai.nodes_searched
+        pv = " ".join(chess_ai.principal_variation())
+        self.send(f"info depth {depth} score {format_score(score)} nodes {nodes} "
+                  f"nps {int(nodes / seconds) if seconds > 0 else 0} hashfull {chess_ai.tt.hashfull()} "
+                  f"time {int(seconds * 1000)} pv {pv}")
+
+
+def main(input_stream: Optional[TextIO] = None, output: Optional[TextIO] = None) -> int:
+    # Helper processes (Threads > 1) are started from the search thread while this one blocks reading stdin;
+    # a forked child would inherit the locked stdin and hang closing it, so start them fresh instead
+    multiprocessing.set_start_method("spawn", force=True)
+    input_stream = input_stream or sys.stdin
+    output = output or sys.stdout
+    # Everything ChessAI prints is diagnostics, not protocol
+    sys.stdout = sys.stderr
+    session = UCIEngine(output)
+    try:
+        for line in input_stream:
+            if not session.handle(line):
+                break
+        else:
+            session.handle("quit")
+    finally:
+        sys.stdout = output
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import random
+
+from mailbox_board import PIECE_CODES, SQ120, BOARD_SQUARES, COL_OF
+
+# Bump whenever the tables below change, so keys persisted by older builds are rejected.
+ZOBRIST_VERSION = 1
+ZOBRIST_SEED = 0x2C4E55
+
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+
+# A private, explicitly seeded generator keeps keys identical across processes and runs
+# (unlike the built-in hash(), which is salted per interpreter).
+_rng = random.Random(ZOBRIST_SEED)
+
+PIECE_KEYS = {piece: [[_rng.getrandbits(64) for _ in range(8)] for _ in range(8)] for piece in PIECES}
+SIDE_KEY = _rng.getrandbits(64)
+CASTLE_KEYS = [_rng.getrandbits(64) for _ in range(16)]
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+
+# The same piece keys indexed by mailbox piece code and square, for the make/undo hot path.
+PIECE_SQUARE_KEYS = [[0] * 120 for _ in range(17)]
+for _piece in PIECES:
+    for _row in range(8):
+        for _col in range(8):
+            PIECE_SQUARE_KEYS[PIECE_CODES[_piece]][SQ120[_row][_col]] = PIECE_KEYS[_piece][_row][_col]
+
+
+def castle_index(castle_rights) -> int:
+    """Pack castle rights into a 4-bit index into CASTLE_KEYS."""
+    return castle_rights.wks | (castle_rights.bks << 1) | (castle_rights.wqs << 2) | (castle_rights.bqs << 3)
+
+
+def compute_key(gs) -> int:
+    """Compute the Zobrist key of a position from scratch."""
+    key = 0
+    for sq in BOARD_SQUARES:
+        key ^= PIECE_SQUARE_KEYS[gs.squares[sq]][sq]
+
+    if not gs.white_to_move:
+        key ^= SIDE_KEY
+    key ^= CASTLE_KEYS[castle_index(gs.current_castle_right)]
+    if gs.enpassant_square:
+        key ^= EN_PASSANT_KEYS[COL_OF[gs.enpassant_square]]
+    return key